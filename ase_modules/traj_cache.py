@@ -0,0 +1,505 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Shared access to the trajectories of job folders.
+
+Author: Raul A. Flores
+
+Every trajectory (out.traj, out_opt.traj, OUTCAR, ...) is read once and its
+frames kept in a small in-memory cache shared by all the DFT_Methods columns
+of a job, so asking for the final frame, the first frame or all of them
+doesn't deserialize the file again:
+
+    traj_cache = TrajectoryCache()
+    traj_cache.last_frame("job_dir/out_opt.traj")
+    traj_cache.read_frames("job_dir/out_opt.traj")  # Same read
+
+For finished jobs (.FINISHED marker next to the trajectory) all frames are
+read at once and written to a compact sidecar (.<file name>.frames.npz:
+positions, cell, pbc, per atom arrays like tags and initial magnetic
+moments, constraints, info and all the calculator results), which is used
+instead of the trajectory until the trajectory's size or mtime change.
+Frames rebuilt from the sidecar are the same as the ones read from the
+trajectory; trajectories whose frames can't be stored exactly get no
+sidecar and are always read from the file.
+
+Unfinished jobs get the single frame fast path of io.read (index=-1 or 0).
+
+read_frames returns copies of the cached frames (with a copy of their
+calculator results), so callers can modify them freely.
+"""
+
+#| - Import Modules
+import os
+import copy
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+from ase import io
+from ase import Atoms
+from ase.constraints import dict2constraint
+from ase.calculators.singlepoint import SinglePointCalculator
+#__|
+
+#| - Module Variables
+SIDECAR_VERSION = 2
+
+FINISHED_MARKERS = [".FINISHED", ".FINISHED.new"]
+#__|
+
+#| - Methods
+
+def sidecar_file_name(file_name):
+    """Return path of the frames sidecar of file_name.
+
+    Args:
+        file_name:
+    """
+    #| - sidecar_file_name
+    dir_name, base_name = os.path.split(os.path.abspath(file_name))
+
+    return(os.path.join(dir_name, "." + base_name + ".frames.npz"))
+    #__|
+
+def __json_default__(obj):
+    """json.dumps default for the numpy values of constraint dicts."""
+    #| - __json_default__
+    if isinstance(obj, np.ndarray):
+        return(obj.tolist())
+    elif isinstance(obj, np.integer):
+        return(int(obj))
+    elif isinstance(obj, np.floating):
+        return(float(obj))
+    elif isinstance(obj, np.bool_):
+        return(bool(obj))
+
+    raise TypeError("Not JSON serializable: " + str(type(obj)))
+    #__|
+
+def __results_arrays__(frames):
+    """Return {name: (values, present mask)} of the calculator results.
+
+    None if a result can't be stacked (non numeric, shape changes) or a frame
+    has another calculator than a SinglePointCalculator.
+    """
+    #| - __results_arrays__
+    results_list = []
+    for atoms in frames:
+        if atoms.calc is None:
+            results_list.append({})
+        elif isinstance(atoms.calc, SinglePointCalculator):
+            results_list.append(atoms.calc.results)
+        else:
+            return(None)
+
+    names = set()
+    for results in results_list:
+        names.update(results.keys())
+
+    out = {}
+    for name in sorted(names):
+        values = [
+            np.asarray(results[name]) if name in results else None
+            for results in results_list
+            ]
+
+        shapes = set([i.shape for i in values if i is not None])
+        dtypes = [i.dtype for i in values if i is not None]
+        if len(shapes) != 1 or any([i.kind not in "biuf" for i in dtypes]):
+            return(None)
+
+        shape = shapes.pop()
+        dtype = np.result_type(*dtypes)
+
+        present = np.array([i is not None for i in values])
+        stacked = np.zeros((len(frames), ) + shape, dtype=dtype)
+        for i_cnt, value in enumerate(values):
+            if value is not None:
+                stacked[i_cnt] = value
+
+        out[name] = (stacked, present)
+
+    return(out)
+    #__|
+
+def frames_to_arrays(frames):
+    """Return dict of stacked arrays of frames, None if not stackable.
+
+    All frames must have the same atoms (numbers) and per atom arrays, as in
+    a relaxation. Everything Atoms objects read from a trajectory carry is
+    stored: positions, cell, pbc, the per atom arrays (tags, initial
+    magnetic moments/charges, momenta...), constraints, info and the
+    SinglePointCalculator results (energy, forces, stress, magmoms,
+    charges...). Frames that can't be stored exactly (constraints without
+    todict, non JSON info, non numeric results) give None.
+
+    Args:
+        frames:
+    """
+    #| - frames_to_arrays
+    if len(frames) == 0:
+        return(None)
+
+    skip_keys = ["numbers", "positions"]
+
+    numbers = frames[0].get_atomic_numbers()
+    array_keys = sorted([i for i in frames[0].arrays if i not in skip_keys])
+    for atoms in frames:
+        if not np.array_equal(atoms.get_atomic_numbers(), numbers):
+            return(None)
+
+        keys_i = sorted([i for i in atoms.arrays if i not in skip_keys])
+        if keys_i != array_keys:
+            return(None)
+
+    arrays = {
+        "version": np.array(SIDECAR_VERSION),
+        "numbers": numbers,
+        "pbc": np.array([atoms.get_pbc() for atoms in frames]),
+        "positions": np.array([atoms.get_positions() for atoms in frames]),
+        "cell": np.array([np.array(atoms.get_cell()) for atoms in frames]),
+        }
+
+    for key in array_keys:
+        values = np.array([atoms.arrays[key] for atoms in frames])
+        if values.dtype.kind not in "biuf":
+            return(None)
+        arrays["arrays_" + key] = values
+
+    # Constraints and info as JSON strings, one per frame
+    try:
+        constraints = []
+        info = []
+        for atoms in frames:
+            constraints.append(json.dumps(
+                [i.todict() for i in atoms.constraints],
+                default=__json_default__,
+                ))
+
+            info_i = json.dumps(atoms.info)
+            if json.loads(info_i) != atoms.info:
+                return(None)
+            info.append(info_i)
+
+    except (AttributeError, TypeError, ValueError):
+        return(None)
+
+    arrays["constraints"] = np.array(constraints)
+    arrays["info"] = np.array(info)
+
+    results = __results_arrays__(frames)
+    if results is None:
+        return(None)
+
+    for name, (values, present) in results.items():
+        arrays["results_" + name] = values
+        arrays["present_" + name] = present
+
+    return(arrays)
+    #__|
+
+def arrays_to_atoms(arrays, index):
+    """Return Atoms of single frame of frames_to_arrays dict.
+
+    Args:
+        arrays:
+        index:
+    """
+    #| - arrays_to_atoms
+    atoms = Atoms(
+        numbers=arrays["numbers"],
+        positions=arrays["positions"][index],
+        cell=arrays["cell"][index],
+        pbc=arrays["pbc"][index],
+        )
+
+    results = {}
+    for key in arrays:
+        if key.startswith("arrays_"):
+            atoms.set_array(key[len("arrays_"):], arrays[key][index].copy())
+
+        elif key.startswith("results_"):
+            name = key[len("results_"):]
+            if arrays["present_" + name][index]:
+                value = arrays[key][index]
+                if value.ndim == 0:
+                    value = value.item()
+                else:
+                    value = value.copy()
+                results[name] = value
+
+    constraints = json.loads(str(arrays["constraints"][index]))
+    if len(constraints) > 0:
+        atoms.set_constraint([dict2constraint(i) for i in constraints])
+
+    atoms.info = json.loads(str(arrays["info"][index]))
+
+    if len(results) > 0:
+        atoms.calc = SinglePointCalculator(atoms, **results)
+
+    return(atoms)
+    #__|
+
+def arrays_to_frames(arrays):
+    """Return list of Atoms from frames_to_arrays dict.
+
+    Args:
+        arrays:
+    """
+    #| - arrays_to_frames
+    frames = []
+    for i_cnt in range(len(arrays["positions"])):
+        frames.append(arrays_to_atoms(arrays, i_cnt))
+
+    return(frames)
+    #__|
+
+def copy_atoms(atoms):
+    """Return copy of atoms, including a copy of its calculator results.
+
+    Atoms.copy drops the calculator, which holds the energies and forces read
+    from the trajectory.
+
+    Args:
+        atoms:
+    """
+    #| - copy_atoms
+    atoms_copy = atoms.copy()
+
+    calc = atoms.calc
+    if calc is not None:
+        calc_copy = copy.copy(calc)
+        calc_copy.results = copy.deepcopy(calc.results)
+        if getattr(calc, "atoms", None) is not None:
+            calc_copy.atoms = calc.atoms.copy()
+        atoms_copy.calc = calc_copy
+
+    return(atoms_copy)
+    #__|
+
+def __select__(frames, index):
+    """Return frames[index], the whole list for index=":"."""
+    #| - __select__
+    if index == ":":
+        return(frames)
+
+    return(frames[index])
+    #__|
+
+#__|
+
+
+class TrajectoryCache():
+    """Per file cache of trajectory frames with npz sidecars."""
+
+    #| - TrajectoryCache ******************************************************
+    def __init__(self,
+        max_files=16,
+        sidecar=True,
+        finished_markers=FINISHED_MARKERS,
+        ):
+        """Initialize TrajectoryCache instance.
+
+        Args:
+            max_files:
+                Number of trajectories kept in memory
+            sidecar:
+                Read/write .frames.npz sidecars of finished jobs
+            finished_markers:
+                Marker files (next to the trajectory) of finished jobs
+        """
+        #| - __init__
+        self.max_files = max_files
+        self.sidecar = sidecar
+        self.finished_markers = finished_markers
+
+        # key -> {"stamp": ..., "frames": list, "arrays": sidecar arrays,
+        #     "single": {index: Atoms}}
+        self.cache = OrderedDict()
+
+        self.num_reads = 0
+        #__|
+
+    def __entry__(self, file_name):
+        """Return cache entry of file, a new one if missing or outdated."""
+        #| - __entry__
+        key = os.path.abspath(file_name)
+
+        stat = os.stat(file_name)
+        stamp = (stat.st_size, stat.st_mtime)
+
+        entry = self.cache.pop(key, None)
+        if entry is None or entry["stamp"] != stamp:
+            entry = {
+                "stamp": stamp,
+                "frames": None,
+                "arrays": None,
+                "single": {},
+                }
+
+        # Reinserted as most recently used (no OrderedDict.move_to_end in
+        # python 2)
+        self.cache[key] = entry
+        while len(self.cache) > self.max_files:
+            self.cache.popitem(last=False)
+
+        return(entry)
+        #__|
+
+    def __finished__(self, file_name):
+        """Return True if the job folder of file has a finished marker."""
+        #| - __finished__
+        dir_name = os.path.dirname(os.path.abspath(file_name))
+        for marker in self.finished_markers:
+            if os.path.isfile(os.path.join(dir_name, marker)):
+                return(True)
+
+        return(False)
+        #__|
+
+    def __load_sidecar__(self, file_name, stamp):
+        """Return arrays of valid sidecar, None otherwise."""
+        #| - __load_sidecar__
+        sidecar_file = sidecar_file_name(file_name)
+        if not os.path.isfile(sidecar_file):
+            return(None)
+
+        try:
+            with np.load(sidecar_file) as data:
+                arrays = {key: data[key] for key in data.files}
+        except (IOError, OSError, ValueError, KeyError):
+            return(None)
+
+        valid = (
+            int(arrays.get("version", -1)) == SIDECAR_VERSION and
+            tuple(arrays.get("stamp", [])) == stamp
+            )
+        if not valid:
+            return(None)
+
+        return(arrays)
+        #__|
+
+    def __write_sidecar__(self, file_name, frames, stamp):
+        """Write frames to sidecar (skipped if the frames can't be stacked)."""
+        #| - __write_sidecar__
+        arrays = frames_to_arrays(frames)
+        if arrays is None:
+            return(None)
+        arrays["stamp"] = np.array(stamp, dtype=float)
+
+        sidecar_file = sidecar_file_name(file_name)
+        tmp_file = sidecar_file + "." + str(os.getpid()) + ".tmp"
+        try:
+            with open(tmp_file, "wb") as fle:
+                np.savez(fle, **arrays)
+            os.rename(tmp_file, sidecar_file)
+        except (IOError, OSError):
+            if os.path.isfile(tmp_file):
+                os.remove(tmp_file)
+        #__|
+
+    def read_frames(self, file_name, index=":"):
+        """Return frames of trajectory, like io.read(file_name, index).
+
+        The frames are copies, the cached ones are never handed out.
+
+        Args:
+            file_name:
+            index:
+                ":" for all frames (list), or frame number (-1 last frame)
+        """
+        #| - read_frames
+        frames = self.__read_cached__(file_name, index=index)
+
+        if index == ":":
+            return([copy_atoms(atoms) for atoms in frames])
+
+        return(copy_atoms(frames))
+        #__|
+
+    def __read_cached__(self, file_name, index=":"):
+        """Return cached frames of trajectory (read them if needed).
+
+        Args:
+            file_name:
+            index:
+        """
+        #| - __read_cached__
+        entry = self.__entry__(file_name)
+
+        if entry["frames"] is not None:
+            return(__select__(entry["frames"], index))
+
+        if index != ":" and index in entry["single"]:
+            return(entry["single"][index])
+
+        finished = self.__finished__(file_name)
+
+        if entry["arrays"] is None and finished and self.sidecar:
+            entry["arrays"] = self.__load_sidecar__(file_name, entry["stamp"])
+
+        # Only the requested frame is built from the sidecar arrays
+        if entry["arrays"] is not None:
+            if index == ":":
+                entry["frames"] = arrays_to_frames(entry["arrays"])
+                return(entry["frames"])
+
+            atoms = arrays_to_atoms(entry["arrays"], index)
+            entry["single"][index] = atoms
+
+            return(atoms)
+
+        if index == ":" or finished:
+            self.num_reads += 1
+            frames = io.read(file_name, index=":")
+            entry["frames"] = frames
+
+            if finished and self.sidecar:
+                self.__write_sidecar__(file_name, frames, entry["stamp"])
+
+            return(__select__(frames, index))
+
+        # Single frame of unfinished job
+        self.num_reads += 1
+        atoms = io.read(file_name, index=index)
+        entry["single"][index] = atoms
+
+        return(atoms)
+        #__|
+
+    def last_frame(self, file_name):
+        """Return final frame of trajectory.
+
+        Args:
+            file_name:
+        """
+        #| - last_frame
+        return(self.read_frames(file_name, index=-1))
+        #__|
+
+    def first_frame(self, file_name):
+        """Return first frame of trajectory.
+
+        Args:
+            file_name:
+        """
+        #| - first_frame
+        return(self.read_frames(file_name, index=0))
+        #__|
+
+    def clear(self):
+        """Empty the in-memory cache."""
+        #| - clear
+        self.cache.clear()
+        #__|
+
+    #__| **********************************************************************
+
+
+#| - Module Variables
+# Shared by the DFT_Methods instances
+default_cache = TrajectoryCache()
+#__|
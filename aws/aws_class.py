@@ -17,6 +17,10 @@ import shutil
 import pandas as pd
 
 import boto3
+
+from aws.batch_status import get_batch_client, job_queue_dicts_bulk
+from dft_job_automat.job_control import terminate_batch_jobs
+from dft_job_automat.job_registry import JobRegistry
 #__|
 
 
@@ -24,7 +28,7 @@ def force_symlink(file1, file2):
     #| - force_symlink
     try:
         os.symlink(file1, file2)
-    except OSError, e:
+    except OSError as e:
         if e.errno == errno.EEXIST:
             os.unlink(file2)
             os.symlink(file1, file2)
@@ -52,40 +56,36 @@ class AWS_Queues():
         """
         """
         #| - job_info_batch
-        batch = boto3.client("batch")
-        job_descriptions = batch.describe_jobs(jobs=[job_id])
+        job_queue_dicts = job_queue_dicts_bulk([job_id])
 
         #| - Checking if Job is in AWS Batch
-        if len(job_descriptions["jobs"]) == 0:
+        if job_id not in job_queue_dicts:
             return("job not in batch system")
         else:
-            job_info = job_descriptions["jobs"][0]
+            job_queue_dict = job_queue_dicts[job_id]
         #__|
 
-        job_status = job_info["status"]
-        job_path = job_info["parameters"]["model"]
-        job_ram = job_info["parameters"]["ram"]
-        job_cpus = job_info["parameters"]["cpus"]
-        job_name = job_info["jobName"]
-
-        job_queue_str = job_info["jobQueue"]
-        if "small" in job_queue_str:
-            job_queue = "small"
-        elif "medium" in job_queue_str:
-            job_queue = "medium"
-        elif "large" in job_queue_str:
-            job_queue = "large"
-        elif "test" in job_queue_str:
-            job_queue = "test"
-
-        job_queue_dict = {"job_status": job_status, "job_path": job_path,
-                          "job_id": job_id, "job_ram": job_ram,
-                          "job_queue": job_queue, "job_cpus": job_cpus,
-                          "job_name": job_name}
-
         return(job_queue_dict)
         #__|
 
+    def job_info_batch_bulk(self, job_id_list, max_workers=8):
+        """Return {job_id: job queue dict} for all jobs in job_id_list.
+
+        Uses the shared batch client and 100 job ids per describe_jobs call.
+
+        Args:
+            job_id_list:
+            max_workers:
+        """
+        #| - job_info_batch_bulk
+        job_queue_dicts = job_queue_dicts_bulk(
+            job_id_list,
+            max_workers=max_workers,
+            )
+
+        return(job_queue_dicts)
+        #__|
+
     def cancel_job(self, job_id, reason="N/A"):
         """
         """
@@ -98,12 +98,25 @@ class AWS_Queues():
 
         #__|
 
-    def cancel_jobs(self, job_id_list):
+    def cancel_jobs(self, job_id_list, reason="N/A", max_workers=8):
         """Cancels all jobs in a given job id list
+
+        Jobs are terminated with concurrent AWS Batch calls (max_workers at a
+        time), returns one result dict per job (see job_control).
+
+        Args:
+            job_id_list:
+            reason:
+            max_workers:
         """
         #| - cancel_jobs
-        for job in job_id_list:
-            self.cancel_job(job)
+        results = terminate_batch_jobs(
+            job_id_list,
+            reason=reason,
+            max_workers=max_workers,
+            )
+
+        return(results)
         #__|
 
     def list_jobs(self, queue="small"):
@@ -113,7 +126,7 @@ class AWS_Queues():
         FAILED states.
         """
         #| - list_jobs
-        batch = boto3.client("batch")
+        batch = get_batch_client()
         job_status_opt = ["SUBMITTED", "PENDING", "RUNNABLE",
                           "STARTING", "RUNNING", "SUCCEEDED", "FAILED"]
 
@@ -131,7 +144,7 @@ class AWS_Queues():
 
 
             #| - Retreiving Job ID's From AWS
-            job_ids_split = [job_ids[x:x+100] for x in xrange(0, len(job_ids), 100)]
+            job_ids_split = [job_ids[x:x+100] for x in range(0, len(job_ids), 100)]
             for j in range(len(job_ids_split)):
                 job_descriptions = batch.describe_jobs(jobs=job_ids_split[j])
                 for i in job_descriptions["jobs"]:
@@ -202,10 +215,15 @@ class AWS_Queues():
 
 
             try:
-                output = subprocess.check_output(bash_command, shell=True)
+                output = subprocess.check_output(
+                    bash_command,
+                    shell=True,
+                    universal_newlines=True,
+                    )
                 sub_time = datetime.datetime.now().isoformat()
-            except subprocess.CalledProcessError, e:
-                print "Ping stdout output:\n", e.output
+            # except subprocess.CalledProcessError, e:
+            except subprocess.CalledProcessError as e:
+                print("Ping stdout output:\n", e.output)
 
                 os.chdir(root_dir)
                 print("JOB SKIPPED: ")
@@ -233,18 +251,21 @@ class AWS_Queues():
 
         #| - Querying AWS For Job Info
         job_queue_dict = self.job_info_batch(jobId)
+        if not isinstance(job_queue_dict, dict):
+            # "job not in batch system", not visible in AWS Batch yet
+            print(job_queue_dict)
+            job_queue_dict = {"job_id": jobId, "job_path": path}
         job_queue_dict["submit_time"] = sub_time
 
-        jobs_file_path = self.job_queue_dir + "/jobs.csv"
-
-        df_new = pd.DataFrame([job_queue_dict])
-        if os.path.isfile(jobs_file_path):
-            df = pd.read_csv(jobs_file_path)
-            df = df.append(df_new)
-        else:
-            df = df_new
-
-        df.to_csv(jobs_file_path, index=False)
+        # JobRegistry of the job queue dir, like AWSCluster (the jobs.csv
+        # file is imported into it once and written by export_csv)
+        registry = JobRegistry(
+            os.path.join(self.job_queue_dir, JobRegistry.db_fle),
+            )
+        try:
+            registry.add_job(job_queue_dict)
+        finally:
+            registry.close()
         #__|
 
         return job_queue_dict
@@ -367,7 +388,7 @@ class AWS_Class(DFT_Jobs_Setup):
             #| - force_symlink
             try:
                 os.symlink(file1, file2)
-            except OSError, e:
+            except OSError as e:
                 if e.errno == errno.EEXIST:
                     os.unlink(file2)
                     os.symlink(file1, file2)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+"""Bulk AWS Batch job status lookups with a shared boto3 client.
+
+Author: Raul A. Flores
+
+One boto3 batch client is created per process and reused by every lookup.
+Job ids are grouped into the 100-per-call batches allowed by describe_jobs and
+the calls are overlapped with a bounded thread pool (boto3 clients are thread
+safe).
+
+Development Notes:
+    set_batch_client can be used to swap in a botocore Stubber wrapped client
+    or a local fake of the Batch endpoint
+"""
+
+#| - Import Modules
+import threading
+from concurrent.futures import ThreadPoolExecutor
+#__|
+
+#| - Shared Client
+BATCH_CLIENT = None
+CLIENT_LOCK = threading.Lock()
+
+# Max number of job ids accepted by a single describe_jobs call
+DESCRIBE_JOBS_MAX = 100
+
+def get_batch_client():
+    """Return the process wide boto3 batch client, created on first use."""
+    #| - get_batch_client
+    global BATCH_CLIENT
+
+    with CLIENT_LOCK:
+        if BATCH_CLIENT is None:
+            import boto3
+            BATCH_CLIENT = boto3.client("batch")
+
+    return(BATCH_CLIENT)
+    #__|
+
+def set_batch_client(client):
+    """Replace the process wide batch client (ex. with a stubbed client).
+
+    Args:
+        client:
+            Object implementing describe_jobs, pass None to reset
+    """
+    #| - set_batch_client
+    global BATCH_CLIENT
+
+    with CLIENT_LOCK:
+        BATCH_CLIENT = client
+    #__|
+
+#__|
+
+#| - Methods
+
+def describe_jobs_bulk(
+    job_id_list,
+    batch_client=None,
+    batch_size=DESCRIBE_JOBS_MAX,
+    max_workers=8,
+    ):
+    """Return AWS Batch job descriptions for all jobs in job_id_list.
+
+    Returns a dictionary with the job id as key and the describe_jobs job
+    description as the value. Job ids unknown to AWS Batch are absent.
+
+    Args:
+        job_id_list:
+            List of AWS job ids, None entries are ignored
+        batch_client:
+            boto3 batch client, the shared client is used by default
+        batch_size:
+            Number of job ids per describe_jobs call (max 100)
+        max_workers:
+            Max number of describe_jobs calls in flight at once
+    """
+    #| - describe_jobs_bulk
+    if batch_client is None:
+        batch_client = get_batch_client()
+
+    batch_size = min(batch_size, DESCRIBE_JOBS_MAX)
+
+    job_id_list = list(set([str(i) for i in job_id_list if i is not None]))
+    job_id_list.sort()
+
+    chunks = [
+        job_id_list[i:i + batch_size]
+        for i in range(0, len(job_id_list), batch_size)
+        ]
+
+    def describe_chunk(chunk_i):
+        #| - describe_chunk
+        job_descriptions = batch_client.describe_jobs(jobs=chunk_i)
+        return(job_descriptions["jobs"])
+        #__|
+
+    descriptions = {}
+    if len(chunks) == 0:
+        return(descriptions)
+
+    num_workers = max(1, min(max_workers, len(chunks)))
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        for job_list_i in executor.map(describe_chunk, chunks):
+            for job_info in job_list_i:
+                descriptions[job_info["jobId"]] = job_info
+
+    return(descriptions)
+    #__|
+
+def job_queue_dict_from_description(job_info):
+    """Reduce a describe_jobs job description to the job queue dict.
+
+    Same format as the one returned by AWSCluster.job_info_batch and written
+    to the jobs.csv file.
+
+    Args:
+        job_info:
+    """
+    #| - job_queue_dict_from_description
+    job_status = job_info["status"]
+    job_path = job_info["parameters"]["model"]
+    job_ram = job_info["parameters"]["ram"]
+    job_cpus = job_info["parameters"]["cpus"]
+    job_name = job_info["jobName"]
+
+    job_queue_str = job_info["jobQueue"]
+
+    job_queue = None
+    if "small" in job_queue_str:
+        job_queue = "small"
+    elif "medium" in job_queue_str:
+        job_queue = "medium"
+    elif "large" in job_queue_str:
+        job_queue = "large"
+    elif "test" in job_queue_str:
+        job_queue = "test"
+
+    job_queue_dict = {"job_status": job_status, "job_path": job_path,
+                      "job_id": job_info["jobId"], "job_ram": job_ram,
+                      "job_queue": job_queue, "job_cpus": job_cpus,
+                      "job_name": job_name}
+
+    return(job_queue_dict)
+    #__|
+
+def job_queue_dicts_bulk(job_id_list, **kwargs):
+    """Return {job_id: job queue dict} for all jobs found in AWS Batch.
+
+    Args:
+        job_id_list:
+        **kwargs:
+            Passed to describe_jobs_bulk
+    """
+    #| - job_queue_dicts_bulk
+    descriptions = describe_jobs_bulk(job_id_list, **kwargs)
+
+    job_queue_dicts = {}
+    for job_id, job_info in descriptions.items():
+        job_queue_dicts[job_id] = job_queue_dict_from_description(job_info)
+
+    return(job_queue_dicts)
+    #__|
+
+#__|
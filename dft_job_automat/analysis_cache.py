@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Cache of job folder analysis results keyed on job folder fingerprints.
+
+Author: Raul A. Flores
+
+Results of the methods run by DFT_Jobs_Analysis.add_data_column are stored
+per method in jobs_bin/analysis_cache/<method>.pickle as
+
+    {job_path: (fingerprint, value)}
+
+The fingerprint of a job folder is built from the name, size and mtime of the
+files in it (or of a user supplied list of files), optionally together with a
+hash of the file contents. A cached value is reused as long as the
+fingerprint of the job folder is unchanged.
+
+Hidden files (markers like .QUEUESTATE and the sidecars written next to the
+job files, ex. .OUTCAR.index.json) are left out of the default fingerprint,
+they are rewritten on every refresh. Failed calls (NaN) are never cached.
+"""
+
+#| - Import Modules
+import os
+import sys
+import math
+import pickle
+import hashlib
+#__|
+
+class AnalysisCache():
+    """Per method results cache stored in a jobs_bin subfolder."""
+
+    #| - AnalysisCache ********************************************************
+
+    #| - Class Variables
+    # Bytes read at a time when hashing file contents
+    hash_block_size = 2 ** 20
+    #__|
+
+    def __init__(self,
+        cache_dir,
+        hash_contents=False,
+        ):
+        """Initialize AnalysisCache instance.
+
+        Args:
+            cache_dir:
+                Folder where the cache files are stored
+                (ex. jobs_bin/analysis_cache)
+            hash_contents:
+                If True, the contents of the files are hashed in addition to
+                their size and mtime (slower but robust to files rewritten
+                within the file system timestamp resolution)
+        """
+        #| - __init__
+        self.cache_dir = cache_dir
+        self.hash_contents = hash_contents
+
+        self.cache = {}
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        #__|
+
+    def __cache_file__(self, method_name):
+        """Return path of cache file for method_name."""
+        #| - __cache_file__
+        fle_name = "".join(
+            [i if i.isalnum() or i in "-_." else "_" for i in method_name]
+            )
+
+        file_path = os.path.join(self.cache_dir, fle_name + ".pickle")
+
+        return(file_path)
+        #__|
+
+    def __load__(self, method_name):
+        """Load cache of method_name from file (once per instance)."""
+        #| - __load__
+        if method_name in self.cache:
+            return(self.cache[method_name])
+
+        file_path = self.__cache_file__(method_name)
+
+        method_cache = {}
+        if os.path.isfile(file_path):
+            try:
+                with open(file_path, "rb") as fle:
+                    if sys.version_info.major > 2:
+                        method_cache = pickle.load(fle, encoding="latin1")
+                    else:
+                        method_cache = pickle.load(fle)
+            except Exception:
+                print("Couldn't read analysis cache of " + method_name)
+                method_cache = {}
+
+        self.cache[method_name] = method_cache
+
+        return(method_cache)
+        #__|
+
+    def __hash_file__(self, file_path):
+        """Return sha1 hex digest of file contents."""
+        #| - __hash_file__
+        sha = hashlib.sha1()
+        with open(file_path, "rb") as fle:
+            while True:
+                block = fle.read(AnalysisCache.hash_block_size)
+                if not block:
+                    break
+                sha.update(block)
+
+        return(sha.hexdigest())
+        #__|
+
+    def fingerprint(self, path_i, file_list=None):
+        """Return fingerprint of job folder path_i.
+
+        Returns None if path_i doesn't exist (results won't be cached).
+
+        Args:
+            path_i:
+                Job folder
+            file_list:
+                Names of the files that determine the result, by default all
+                non hidden files at the top level of path_i are used
+        """
+        #| - fingerprint
+        if not os.path.isdir(path_i):
+            return(None)
+
+        if file_list is None:
+            file_list = [
+                i for i in os.listdir(path_i)
+                if not i.startswith(".") and
+                os.path.isfile(os.path.join(path_i, i))
+                ]
+
+        fingerprint = []
+        for file_i in sorted(file_list):
+            file_path = os.path.join(path_i, file_i)
+
+            if not os.path.isfile(file_path):
+                fingerprint.append((file_i, None))
+                continue
+
+            stat_i = os.stat(file_path)
+            entry = (file_i, stat_i.st_size, stat_i.st_mtime)
+            if self.hash_contents:
+                entry += (self.__hash_file__(file_path), )
+
+            fingerprint.append(entry)
+
+        return(tuple(fingerprint))
+        #__|
+
+    def lookup(self, method_name, path_i, fingerprint):
+        """Return (True, value) if an up to date value is cached.
+
+        (False, None) is returned otherwise.
+
+        Args:
+            method_name:
+            path_i:
+            fingerprint:
+        """
+        #| - lookup
+        if fingerprint is None:
+            return(False, None)
+
+        method_cache = self.__load__(method_name)
+
+        entry = method_cache.get(path_i, None)
+        if entry is not None and entry[0] == fingerprint:
+            return(True, entry[1])
+
+        return(False, None)
+        #__|
+
+    def store(self, method_name, path_i, fingerprint, value):
+        """Store value of method_name for job folder path_i.
+
+        NaN values (failed calls of map_timed) aren't stored, so the call is
+        retried next time.
+
+        Args:
+            method_name:
+            path_i:
+            fingerprint:
+            value:
+        """
+        #| - store
+        if fingerprint is None:
+            return(None)
+
+        if isinstance(value, float) and math.isnan(value):
+            return(None)
+
+        method_cache = self.__load__(method_name)
+        method_cache[path_i] = (fingerprint, value)
+        #__|
+
+    def save(self, method_name):
+        """Write cache of method_name to file.
+
+        Args:
+            method_name:
+        """
+        #| - save
+        if method_name not in self.cache:
+            return(None)
+
+        file_path = self.__cache_file__(method_name)
+        tmp_file = file_path + ".tmp"
+
+        with open(tmp_file, "wb") as fle:
+            pickle.dump(self.cache[method_name], fle)
+        os.rename(tmp_file, file_path)
+        #__|
+
+    def clear(self, method_name=None):
+        """Delete cache of method_name (all methods if None).
+
+        Args:
+            method_name:
+        """
+        #| - clear
+        if method_name is None:
+            method_list = [
+                i[:-len(".pickle")] for i in os.listdir(self.cache_dir)
+                if i.endswith(".pickle")
+                ]
+        else:
+            method_list = [method_name]
+
+        for method_i in method_list:
+            self.cache.pop(method_i, None)
+
+            file_path = self.__cache_file__(method_i)
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+        #__|
+
+    #__| **********************************************************************
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark staging of PythonModules/PythonPackages into AWS job folders.
+
+Author: Raul A. Flores
+
+Compares the per job copytree done by
+AWSCluster.__copy_pyth_mods_packs_to_job_dir__ with the shared code bundles
+(CodeBundleStore.link_bundle), reporting the time per job and the bytes
+written.
+
+    python bench_code_bundle.py --num_jobs 50 --num_files 2000 --file_size 8000
+"""
+
+#| - Import Modules
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+
+from dft_job_automat.compute_env import AWSCluster
+from dft_job_automat.code_bundle import CodeBundleStore
+#__|
+
+#| - Methods
+
+def make_code_tree(root, num_files, file_size, files_per_dir=50):
+    """Write synthetic code tree of num_files files of file_size bytes.
+
+    Args:
+        root:
+        num_files:
+        file_size:
+        files_per_dir:
+    """
+    #| - make_code_tree
+    for i_file in range(num_files):
+        dir_i = os.path.join(root, "pkg_" + str(i_file // files_per_dir))
+        if not os.path.exists(dir_i):
+            os.makedirs(dir_i)
+
+        with open(os.path.join(dir_i, "mod_" + str(i_file) + ".py"), "w") as fle:
+            fle.write(("# " + str(i_file) + "\n") * (file_size // 8))
+    #__|
+
+def disk_usage(path_i):
+    """Return bytes of regular files under path_i (symlinks not followed)."""
+    #| - disk_usage
+    total = 0
+    for dir_name, subdir_list, file_list in os.walk(path_i):
+        for fle_name in file_list:
+            file_path = os.path.join(dir_name, fle_name)
+            if not os.path.islink(file_path):
+                total += os.path.getsize(file_path)
+
+    return(total)
+    #__|
+
+def make_job_dirs(root, num_jobs):
+    """Create empty job folders."""
+    #| - make_job_dirs
+    job_dirs = []
+    for i_job in range(num_jobs):
+        job_dir = os.path.join(root, "job_" + str(i_job), "_1")
+        os.makedirs(job_dir)
+        job_dirs.append(job_dir)
+
+    return(job_dirs)
+    #__|
+
+#__|
+
+if __name__ == "__main__":
+    #| - Main
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_jobs", type=int, default=50)
+    parser.add_argument("--num_files", type=int, default=2000)
+    parser.add_argument("--file_size", type=int, default=8000)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        os.environ["PYTHONMODULES"] = os.path.join(tmp_dir, "PythonModules")
+        os.environ["PYTHONPACKAGES"] = os.path.join(tmp_dir, "PythonPackages")
+
+        make_code_tree(os.environ["PYTHONMODULES"], args.num_files,
+            args.file_size)
+        make_code_tree(os.environ["PYTHONPACKAGES"], args.num_files // 4,
+            args.file_size)
+
+        #| - copytree
+        job_dirs = make_job_dirs(os.path.join(tmp_dir, "copy"), args.num_jobs)
+
+        t_start = time.time()
+        for job_dir in job_dirs:
+            # Doesn't use instance attributes
+            AWSCluster.__copy_pyth_mods_packs_to_job_dir__(None, job_dir)
+        t_copy = time.time() - t_start
+
+        bytes_copy = disk_usage(os.path.join(tmp_dir, "copy"))
+        #__|
+
+        #| - Code bundles
+        job_dirs = make_job_dirs(os.path.join(tmp_dir, "bundle"),
+            args.num_jobs)
+        store = CodeBundleStore(os.path.join(tmp_dir, "code_bundles"))
+
+        t_start = time.time()
+        t_first = None
+        for job_dir in job_dirs:
+            store.link_bundle(os.environ["PYTHONMODULES"], "PythonModules",
+                job_dir)
+            store.link_bundle(os.environ["PYTHONPACKAGES"], "PythonPackages",
+                job_dir)
+
+            if t_first is None:
+                t_first = time.time() - t_start
+        t_bundle = time.time() - t_start
+
+        bytes_bundle = disk_usage(os.path.join(tmp_dir, "bundle")) + \
+            disk_usage(os.path.join(tmp_dir, "code_bundles"))
+        #__|
+
+        #| - Report
+        print(str(args.num_jobs) + " jobs")
+        print(
+            "copytree | " + str(round(t_copy / args.num_jobs * 1000, 2)) +
+            " ms/job | " + str(bytes_copy) + " bytes written"
+            )
+        print(
+            "bundle   | " + str(round(t_bundle / args.num_jobs * 1000, 2)) +
+            " ms/job (first job incl. snapshot: " +
+            str(round(t_first * 1000, 2)) + " ms, following jobs: " +
+            str(round(
+                (t_bundle - t_first) / max(args.num_jobs - 1, 1) * 1000, 3)) +
+            " ms/job) | " + str(bytes_bundle) + " bytes written"
+            )
+        #__|
+
+    finally:
+        shutil.rmtree(tmp_dir)
+    #__|
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark merging of jobs_bin/data_columns .col files into the dataframe.
+
+Author: Raul A. Flores
+
+Compares the keyed join used by DFT_Jobs_Analysis.add_all_columns_from_file
+with the previous nested row/entry loop (O(N*M) per column file) and checks
+that both produce the same dataframe.
+
+    python bench_col_merge.py --num_jobs 20000 --num_files 20
+
+The nested loop is only timed on --legacy_jobs jobs (it takes minutes at
+20k jobs), the scaling is quadratic in the number of jobs.
+"""
+
+#| - Import Modules
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+
+from dft_job_automat.job_analysis import DFT_Jobs_Analysis
+#__|
+
+#| - Methods
+
+def legacy_add_data_column_from_file(df, column_file, col_name):
+    """Previous implementation of __add_data_column_from_file__.
+
+    Args:
+        df:
+        column_file:
+        col_name:
+    """
+    #| - legacy_add_data_column_from_file
+    with open(column_file, "r") as fle:
+        content = fle.readlines()
+
+    content = [x.strip().split("|") for x in content]
+
+    content_new = []
+    for line in content:
+        line_new = {}
+        line_new["value"] = line[0].strip()
+        line_new["revision"] = line[1].strip()
+        line_new["path"] = line[2].strip()
+
+        content_new.append(line_new)
+
+    df["full_path"] = df["path"].astype(str) + "_" + \
+        df["revision_number"].astype(str)
+
+    column_data_list = []
+    for i_ind, (index, row) in enumerate(df.iterrows()):
+
+        row_has_entry = False
+        for entry in content_new:
+
+            entry_fullpath = entry["path"] + "_" + entry["revision"]
+            if entry_fullpath == row["full_path"]:
+                column_data_list.append(entry["value"])
+                row_has_entry = True
+                continue
+
+        if not row_has_entry:
+            column_data_list.append(np.nan)
+
+    df[col_name] = column_data_list
+    #__|
+
+def make_study(working_dir, num_jobs, num_files, fill_fraction=0.8):
+    """Write .col files and return the matching job dataframe.
+
+    Args:
+        working_dir:
+        num_jobs:
+        num_files:
+        fill_fraction:
+            Fraction of the jobs present in each .col file
+    """
+    #| - make_study
+    col_dir = os.path.join(working_dir, "jobs_bin/data_columns")
+    os.makedirs(col_dir)
+
+    np.random.seed(0)
+
+    path_list = ["data/" + "%06d" % i + "/" for i in range(num_jobs)]
+    rev_list = list(np.random.randint(1, 4, size=num_jobs))
+
+    df = pd.DataFrame({"path": path_list, "revision_number": rev_list})
+
+    for file_i in range(num_files):
+        num_entries = int(num_jobs * fill_fraction)
+        rows = np.random.permutation(num_jobs)[0:num_entries]
+
+        with open(os.path.join(col_dir, "col_%02d.col" % file_i), "w") as fle:
+            for row in rows:
+                fle.write(
+                    "%.6f | %d | %s\n" %
+                    (np.random.rand(), rev_list[row], path_list[row])
+                    )
+
+    return(df)
+    #__|
+
+def time_new(df, working_dir):
+    """Time DFT_Jobs_Analysis.add_all_columns_from_file."""
+    #| - time_new
+    inst = object.__new__(DFT_Jobs_Analysis)
+    inst.working_dir = working_dir
+    inst.data_frame = df.copy()
+
+    t_start = time.time()
+    inst.add_all_columns_from_file()
+    t_elapsed = time.time() - t_start
+
+    return(inst.data_frame, t_elapsed)
+    #__|
+
+def time_legacy(df, working_dir):
+    """Time previous nested loop implementation."""
+    #| - time_legacy
+    df = df.copy()
+
+    col_dir = os.path.join(working_dir, "jobs_bin/data_columns")
+
+    t_start = time.time()
+    for file_name in os.listdir(col_dir):
+        legacy_add_data_column_from_file(
+            df,
+            os.path.join(col_dir, file_name),
+            file_name.split(".")[0],
+            )
+    t_elapsed = time.time() - t_start
+
+    return(df, t_elapsed)
+    #__|
+
+#__|
+
+if __name__ == "__main__":
+    #| - Main
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_jobs", type=int, default=20000)
+    parser.add_argument("--num_files", type=int, default=20)
+    parser.add_argument("--legacy_jobs", type=int, default=1000)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        #| - Keyed join on full study
+        work_dir = os.path.join(tmp_dir, "full")
+        df = make_study(work_dir, args.num_jobs, args.num_files)
+
+        df_new, t_new = time_new(df, work_dir)
+        print(
+            "keyed join  | " + str(args.num_jobs) + " jobs x " +
+            str(args.num_files) + " files: " + str(round(t_new, 3)) + " s"
+            )
+        #__|
+
+        #| - Both implementations on legacy sized study
+        work_dir = os.path.join(tmp_dir, "legacy")
+        df = make_study(work_dir, args.legacy_jobs, args.num_files)
+
+        df_new, t_new = time_new(df, work_dir)
+        df_old, t_old = time_legacy(df, work_dir)
+
+        df_old = df_old[df_new.columns]
+        identical = df_new.equals(df_old)
+
+        print(
+            "legacy loop | " + str(args.legacy_jobs) + " jobs x " +
+            str(args.num_files) + " files: " + str(round(t_old, 3)) + " s" +
+            " (keyed join: " + str(round(t_new, 3)) + " s)"
+            )
+        print("identical dataframes: " + str(identical))
+        #__|
+
+    finally:
+        shutil.rmtree(tmp_dir)
+    #__|
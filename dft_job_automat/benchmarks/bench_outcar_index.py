@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark the OUTCAR section index against scanning from the top.
+
+Author: Raul A. Flores
+
+Writes a synthetic OUTCAR (--size_mb) with many ionic steps, a dielectric
+tensor and a phonon eigenvector section at the end, and times
+num_of_atoms_OUTCAR_tmp, get_epsilon_from_OUTCAR and get_modes_from_OUTCAR:
+
+    legacy | Every function scanning the file from the top (previous code)
+    cold   | Index built in one mmap pass, then seeks (first call on a file)
+    warm   | Index loaded from the .OUTCAR.index.json sidecar
+
+and checks that all return the same results. Peak RSS of the index build is
+measured in a forked child.
+
+    python bench_outcar_index.py --size_mb 500 --num_atoms 64
+"""
+
+#| - Import Modules
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import resource
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+
+from vasp.outcar_index import OutcarIndex, index_file_name
+from vasp.vasp_methods import num_of_atoms_OUTCAR_tmp
+from raman_dft.vasp_raman_job_methods import (
+    get_modes_from_OUTCAR,
+    get_epsilon_from_OUTCAR,
+    )
+#__|
+
+#| - Methods
+
+def write_outcar(file_name, size_mb, num_atoms=64, seed=0):
+    """Write synthetic OUTCAR of roughly size_mb MB.
+
+    Args:
+        file_name:
+        size_mb:
+        num_atoms:
+        seed:
+    """
+    #| - write_outcar
+    np.random.seed(seed)
+
+    size_max = size_mb * 1024 ** 2
+    with open(file_name, "w") as fle:
+        fle.write(" vasp.5.4.4 (build Jan 01 2018) complex\n\n")
+        fle.write(
+            "   number of dos      NEDOS =    301   number of ions     "
+            "NIONS = %6d\n\n" % num_atoms
+            )
+
+        fle.write(" ion  position               nearest neighbor table\n")
+        for atom_i in range(num_atoms):
+            fle.write("%4d  %.3f  %.3f  %.3f-\n" % (
+                (atom_i + 1,) + tuple(np.random.rand(3))))
+        fle.write("\n")
+
+        ionic_step = 0
+        while fle.tell() < size_max:
+            ionic_step += 1
+            for elec_step in range(1, 11):
+                fle.write(
+                    "----------------------------------------- Iteration "
+                    "%4d(%4d)  ---------------------------------------\n\n"
+                    % (ionic_step, elec_step)
+                    )
+                fle.write("  free energy    TOTEN  =   %.8f eV\n\n" % (
+                    -100. - np.random.rand()))
+                for line_i in range(40):
+                    fle.write("  eigenvalue-ish line %4d %12.6f %12.6f\n" % (
+                        line_i, np.random.rand(), np.random.rand()))
+
+            fle.write(" POSITION                                       "
+                "TOTAL-FORCE (eV/Angst)\n")
+            fle.write(" " + "-" * 83 + "\n")
+            for atom_i in range(num_atoms):
+                fle.write(
+                    "%13.5f%13.5f%13.5f%15.6f%14.6f%14.6f\n"
+                    % tuple(np.random.rand(6))
+                    )
+            fle.write(" " + "-" * 83 + "\n\n")
+
+            fle.write("  FREE ENERGIE OF THE ION-ELECTRON SYSTEM (eV)\n")
+            fle.write("  ---------------------------------------------------\n")
+            fle.write("  free  energy   TOTEN  =      %.8f eV\n\n" % (
+                -100. - np.random.rand()))
+
+        fle.write(" MACROSCOPIC STATIC DIELECTRIC TENSOR (including local "
+            "field effects in DFT)\n")
+        fle.write(" " + "-" * 54 + "\n")
+        for row in np.eye(3) * 5.:
+            fle.write("  %12.6f %12.6f %12.6f\n" % tuple(row))
+        fle.write(" " + "-" * 54 + "\n\n")
+
+        fle.write(" Eigenvectors after division by SQRT(mass)\n\n")
+        fle.write(" Eigenvectors and eigenvalues of the dynamical matrix\n")
+        fle.write(" ----------------------------------------------------\n\n")
+        for mode_i in range(3 * num_atoms):
+            fle.write("\n%4d f  =   10.000000 THz    62.831853 2PiTHz  "
+                "%10.6f cm-1    41.356676 meV\n" % (mode_i + 1, 300. + mode_i))
+            fle.write("             X         Y         Z           dx"
+                "          dy          dz\n")
+            for atom_i in range(num_atoms):
+                fle.write("  %9.6f %9.6f %9.6f  %11.6f %11.6f %11.6f\n" %
+                    tuple(np.random.rand(6)))
+    #__|
+
+def legacy_scan_all(file_name, num_atoms):
+    """Previous behaviour, every reader scanning from the top.
+
+    Args:
+        file_name:
+        num_atoms:
+    """
+    #| - legacy_scan_all
+    def legacy_num_atoms(fle):
+        fle.seek(0)
+        num = 0
+        for line in fle:
+            if "ion  position" in line:
+                for next_line in fle:
+                    if next_line == "\n":
+                        break
+                    num += 1
+        return(num)
+
+    def scan_to(fle, marker):
+        fle.seek(0)
+        while True:
+            line = fle.readline()
+            if not line or marker in line:
+                return(fle.tell())
+
+    with open(file_name, "r") as fle:
+        num = legacy_num_atoms(fle)
+        scan_to(fle, "MACROSCOPIC STATIC DIELECTRIC TENSOR")
+        scan_to(fle, "Eigenvectors after division by SQRT(mass)")
+
+    return(num)
+    #__|
+
+def indexed_read_all(file_name, num_atoms):
+    """Readers using the index.
+
+    Args:
+        file_name:
+        num_atoms:
+    """
+    #| - indexed_read_all
+    import io as io_std
+    import contextlib
+
+    with open(file_name, "r") as fle:
+        num = num_of_atoms_OUTCAR_tmp(fle)
+
+        with contextlib.redirect_stdout(io_std.StringIO()):
+            epsilon = get_epsilon_from_OUTCAR(fle)
+
+        eigvals, eigvecs, norms = get_modes_from_OUTCAR(fle, nat=num_atoms)
+
+    return(num, epsilon, eigvals[:5], norms[:5])
+    #__|
+
+def run_forked(function, *args):
+    """Run function in a forked child, returns (output, time, peak RSS kB)."""
+    #| - run_forked
+    import pickle
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        t_start = time.time()
+        out = function(*args)
+        t_elapsed = time.time() - t_start
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        with os.fdopen(write_fd, "wb") as fle:
+            pickle.dump((out, t_elapsed, rss), fle)
+        os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as fle:
+        out = pickle.load(fle)
+    os.waitpid(pid, 0)
+
+    return(out)
+    #__|
+
+#__|
+
+if __name__ == "__main__":
+    #| - Main
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size_mb", type=float, default=500)
+    parser.add_argument("--num_atoms", type=int, default=64)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        file_name = os.path.join(tmp_dir, "OUTCAR")
+        write_outcar(file_name, args.size_mb, args.num_atoms)
+        size_mb = os.path.getsize(file_name) / 1024. ** 2
+        print("OUTCAR: " + str(round(size_mb, 1)) + " MB, " +
+            str(args.num_atoms) + " atoms")
+
+        num_legacy, t_legacy, rss_legacy = run_forked(
+            legacy_scan_all, file_name, args.num_atoms)
+        print("legacy | " + str(round(t_legacy, 3)) + " s, peak RSS " +
+            str(rss_legacy // 1024) + " MB")
+
+        tmp, t_build, rss_build = run_forked(
+            lambda: OutcarIndex(file_name).num_ionic_steps)
+        print("build  | " + str(round(t_build, 3)) + " s, " +
+            str(tmp) + " ionic steps, peak RSS " +
+            str(rss_build // 1024) + " MB")
+
+        out_warm, t_warm, rss_warm = run_forked(
+            indexed_read_all, file_name, args.num_atoms)
+        print("warm   | " + str(round(t_warm, 3)) + " s (sidecar)")
+
+        os.remove(index_file_name(file_name))
+        out_cold, t_cold, rss_cold = run_forked(
+            indexed_read_all, file_name, args.num_atoms)
+        print("cold   | " + str(round(t_cold, 3)) + " s (index + reads)")
+
+        identical = num_legacy == out_cold[0] and out_cold == out_warm
+        identical &= out_cold[1] == [[5., 0., 0.], [0., 5., 0.], [0., 0., 5.]]
+        print("identical output: " + str(identical))
+
+    finally:
+        shutil.rmtree(tmp_dir)
+    #__|
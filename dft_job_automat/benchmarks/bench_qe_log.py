@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark the single pass QE log parser against the previous readers.
+
+Author: Raul A. Flores
+
+Writes a synthetic spin-polarized pw.x log (--size_mb, a few hundred MB is
+typical of long relaxations) and times:
+
+    legacy | number_of_atoms, tot_abs_magnetization, element_index_dict,
+             magmom_charge_data and estimate_magmom as they were (one or two
+             reads of the log each, estimate_magmom reads it into memory)
+    parser | The same five qe_methods functions, now views of one
+             parse_qe_log pass (cached by path, size and mtime)
+
+and checks that both return the same data. Peak RSS of each side is
+measured in a forked child.
+
+    python bench_qe_log.py --size_mb 300 --num_atoms 40
+"""
+
+#| - Import Modules
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import resource
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+
+from quantum_espresso import qe_methods
+from quantum_espresso.qe_log_parser import clear_cache
+#__|
+
+#| - Methods
+
+def write_log(file_name, size_mb, num_atoms=40, seed=0):
+    """Write synthetic spin-polarized QE log of roughly size_mb MB.
+
+    Every ionic step has a "Cartesian axes" block followed by SCF
+    iterations, each with a magnetic moment block and the total/absolute
+    magnetization.
+
+    Args:
+        file_name:
+        size_mb:
+        num_atoms:
+        seed:
+    """
+    #| - write_log
+    np.random.seed(seed)
+    elements = ["Fe", "O1", "O2", "Ni"]
+
+    size_max = size_mb * 1024 ** 2
+    with open(file_name, "w") as fle:
+        fle.write("     Program PWSCF v.6.1 starts\n")
+        fle.write(
+            "     kinetic-energy cutoff     =      50.0000  Ry\n\n"
+            )
+
+        scf_iter = 0
+        while fle.tell() < size_max:
+            fle.write("     Cartesian axes\n\n")
+            fle.write(
+                "     site n.     atom                  positions (alat units)\n"
+                )
+            for atom_i in range(num_atoms):
+                fle.write(
+                    "%12d           %-3s tau(%4d) = (   %.7f   %.7f   %.7f  )\n"
+                    % ((atom_i + 1, elements[atom_i % len(elements)],
+                        atom_i + 1) + tuple(np.random.rand(3)))
+                    )
+            fle.write("\n")
+
+            for iter_i in range(10):
+                scf_iter += 1
+                fle.write("     iteration #%3d     ecut=    50.00 Ry\n\n" % (
+                    iter_i + 1))
+                fle.write("     Magnetic moment per site:\n")
+
+                charges = 6. + np.random.rand(num_atoms)
+                magmoms = 3. * (np.random.rand(num_atoms) - 0.5)
+                for atom_i in range(num_atoms):
+                    fle.write(
+                        "     atom: %4d    charge: %8.4f    magn: %8.4f    "
+                        "constr:   0.0000\n"
+                        % (atom_i + 1, charges[atom_i], magmoms[atom_i])
+                        )
+                fle.write("\n")
+
+                fle.write(
+                    "     total energy              =   -%.8f Ry\n"
+                    % (1000. + np.random.rand())
+                    )
+                fle.write(
+                    "     estimated scf accuracy    <       %.8f Ry\n\n"
+                    % (10. ** -iter_i)
+                    )
+                fle.write(
+                    "     total magnetization       =     %.2f Bohr mag/cell\n"
+                    % np.sum(magmoms)
+                    )
+                fle.write(
+                    "     absolute magnetization    =     %.2f Bohr mag/cell\n\n"
+                    % np.sum(np.abs(magmoms))
+                    )
+
+            fle.write(
+                "!    total energy              =   -%.8f Ry\n\n"
+                % (1000. + np.random.rand())
+                )
+    #__|
+
+def legacy_read_all(path_i, log):
+    """Previous readers of qe_methods, returns their outputs.
+
+    Args:
+        path_i:
+        log:
+    """
+    #| - legacy_read_all
+    file_name = os.path.join(path_i, log)
+
+    #| - number_of_atoms / element_index_dict
+    def read_cartesian():
+        atom_list = []
+        elem_ind_dict = {}
+        with open(file_name, "r") as fle:
+            while True:
+                line = fle.readline()
+                if not line:
+                    break
+
+                if "Cartesian axes" in line:
+                    fle.readline()
+                    fle.readline()
+
+                    atom_list = []
+                    while True:
+                        line_i = fle.readline()
+                        if "tau(" not in line_i:
+                            break
+
+                        atom_list.append(line_i)
+                        line_list = line_i.split()
+                        elem_i = "".join(
+                            [i for i in line_list[1] if not i.isdigit()])
+                        elem_ind_dict[int(line_list[0]) - 1] = elem_i
+
+        return(len(atom_list), elem_ind_dict)
+
+    num_atoms, elem_ind_dict = read_cartesian()
+    #__|
+
+    #| - tot_abs_magnetization
+    tot_mag_list = []
+    abs_mag_list = []
+    with open(file_name, "r") as fle:
+        for line in fle:
+            if "total magnetization" in line:
+                tot_mag_list.append(float(line.split()[3]))
+            if "absolute magnetization" in line:
+                abs_mag_list.append(float(line.split()[3]))
+
+    df_tot_abs = pd.concat([
+        pd.DataFrame(tot_mag_list, columns=["tot_mag"]),
+        pd.DataFrame(abs_mag_list, columns=["abs_mag"]),
+        ], axis=1)
+    #__|
+
+    #| - magmom_charge_data
+    master_list = []
+    with open(file_name, "r") as fle:
+        while True:
+            line = fle.readline()
+            if not line:
+                break
+
+            if "Magnetic moment per site" in line:
+                list_i = []
+                while True:
+                    line_i = fle.readline()
+                    if "atom:" not in line_i:
+                        break
+
+                    line_list = line_i.split()
+                    list_i.append({
+                        "atom_num": int(line_list[1]) - 1,
+                        "charge": float(line_list[3]),
+                        "magmom": float(line_list[5]),
+                        })
+                master_list.append(list_i)
+
+    # magmom_charge_data read the Cartesian blocks again
+    read_cartesian()
+
+    df_list = []
+    for i_cnt, iter_i in enumerate(master_list):
+        df_i = pd.DataFrame(iter_i)
+        df_i["iteration"] = i_cnt
+        df_list.append(df_i)
+
+    df_magmom = pd.concat(df_list)
+    df_magmom["element"] = df_magmom["atom_num"].map(elem_ind_dict)
+    #__|
+
+    #| - estimate_magmom
+    # number_of_atoms was read once more
+    num_atoms, tmp = read_cartesian()
+
+    with open(file_name, "r") as fle:
+        lines = fle.readlines()
+
+    i = len(lines) - 1
+    while True:
+        line = lines[i].split()
+        if len(line) > 3:
+            if line[0] == "absolute":
+                abs_magmom = float(line[3])
+        if len(line) > 6:
+            if line[4] == "magn:":
+                i -= num_atoms - 1
+                break
+        i -= 1
+
+    magmoms = np.array([float(lines[i + j].split()[5])
+        for j in range(num_atoms)])
+    magmom_list = magmoms * abs_magmom / np.sum(np.abs(magmoms))
+    #__|
+
+    out = {
+        "num_atoms": num_atoms,
+        "elem_ind_dict": elem_ind_dict,
+        "tot_abs": df_tot_abs,
+        "magmom_charge": df_magmom,
+        "magmom_list": magmom_list,
+        }
+
+    return(out)
+    #__|
+
+def parser_read_all(path_i, log):
+    """qe_methods readers, returns their outputs.
+
+    Args:
+        path_i:
+        log:
+    """
+    #| - parser_read_all
+    out = {
+        "num_atoms": qe_methods.number_of_atoms(path_i=path_i, log=log),
+        "elem_ind_dict": qe_methods.element_index_dict(
+            path_i=path_i, log=log),
+        "tot_abs": qe_methods.tot_abs_magnetization(path_i=path_i, log=log),
+        "magmom_charge": qe_methods.magmom_charge_data(
+            path_i=path_i, log=log),
+        "magmom_list": qe_methods.estimate_magmom(
+            path_i=path_i, log=log)[0],
+        }
+
+    return(out)
+    #__|
+
+def compare(out_legacy, out_parser):
+    """Return True if the legacy and parser outputs match."""
+    #| - compare
+    same = out_legacy["num_atoms"] == out_parser["num_atoms"]
+    same &= out_legacy["elem_ind_dict"] == out_parser["elem_ind_dict"]
+    same &= out_legacy["tot_abs"].equals(out_parser["tot_abs"])
+    same &= np.allclose(out_legacy["magmom_list"], out_parser["magmom_list"])
+
+    cols = ["atom_num", "charge", "magmom", "iteration", "element"]
+    df_legacy = out_legacy["magmom_charge"][cols]
+    df_parser = out_parser["magmom_charge"][cols]
+    same &= np.array_equal(df_legacy.index, df_parser.index)
+    for col in cols:
+        same &= list(df_legacy[col]) == list(df_parser[col])
+
+    return(bool(same))
+    #__|
+
+def run_forked(function, *args):
+    """Run function in a forked child, returns (output, time, peak RSS kB).
+
+    The output has to be picklable.
+    """
+    #| - run_forked
+    import pickle
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        t_start = time.time()
+        out = function(*args)
+        t_elapsed = time.time() - t_start
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        with os.fdopen(write_fd, "wb") as fle:
+            pickle.dump((out, t_elapsed, rss), fle)
+        os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as fle:
+        out = pickle.load(fle)
+    os.waitpid(pid, 0)
+
+    return(out)
+    #__|
+
+#__|
+
+if __name__ == "__main__":
+    #| - Main
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size_mb", type=float, default=300)
+    parser.add_argument("--num_atoms", type=int, default=40)
+    parser.add_argument("--skip_legacy", action="store_true")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        write_log(os.path.join(tmp_dir, "log"), args.size_mb, args.num_atoms)
+        size_mb = os.path.getsize(os.path.join(tmp_dir, "log")) / 1024. ** 2
+
+        print("log: " + str(round(size_mb, 1)) + " MB, " +
+            str(args.num_atoms) + " atoms")
+
+        clear_cache()
+        out_parser, t_parser, rss_parser = run_forked(
+            parser_read_all, tmp_dir, "log")
+        print(
+            "parser | " + str(round(t_parser, 2)) + " s, " +
+            str(round(size_mb / t_parser, 1)) + " MB/s, peak RSS " +
+            str(rss_parser // 1024) + " MB"
+            )
+
+        if not args.skip_legacy:
+            out_legacy, t_legacy, rss_legacy = run_forked(
+                legacy_read_all, tmp_dir, "log")
+            print(
+                "legacy | " + str(round(t_legacy, 2)) + " s, " +
+                str(round(size_mb / t_legacy, 1)) + " MB/s, peak RSS " +
+                str(rss_legacy // 1024) + " MB"
+                )
+            print("identical output: " + str(compare(out_legacy, out_parser)))
+
+    finally:
+        shutil.rmtree(tmp_dir)
+    #__|
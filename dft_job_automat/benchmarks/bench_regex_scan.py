@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark regex_scan against the grep + temp file parsers it replaced.
+
+Author: Raul A. Flores
+
+Writes --num_jobs synthetic QE logs (--size_mb each, see bench_qe_log.py) and
+times, per job:
+
+    scf_convergence | grep scf / grep "kinetic-energy cutoff" into a temp
+                      file in $HOME (legacy) vs one RegexScanner pass
+    calc_wf Fermi   | grep -n "Fermi" | tail -1 (legacy) vs a RegexScanner
+                      "last" pattern, searched from the end of the file
+
+and checks that both return the same values. The legacy scf_convergence is
+run with its python 3 fix (list(filter(...))), without it no scf values
+were returned at all.
+
+    python bench_regex_scan.py --num_jobs 50 --size_mb 5
+"""
+
+#| - Import Modules
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+
+from bench_qe_log import write_log
+
+from quantum_espresso.qe_methods import scf_convergence
+from dft_post_analysis.wf import __fermi_scanner__
+#__|
+
+#| - Methods
+
+def legacy_scf_convergence(log, tmp_file):
+    """Previous scf_convergence (python 3 fix applied).
+
+    Args:
+        log:
+        tmp_file:
+            Was $HOME/scf_temp.txt
+    """
+    #| - legacy_scf_convergence
+    rydberg = 13.6057
+
+    os.system("grep scf %s > %s" % (log, tmp_file))
+    with open(tmp_file) as fle:
+        lines = list(filter(None, fle.read().split("\n")))
+
+    scf = []
+    iter = []
+    n = 0
+    for line in lines:
+        items = list(filter(None, line.split(" ")))
+        try:
+            scf.append(float(items[4]) * rydberg)
+            n += 1
+            iter.append(n)
+        except:
+            continue
+
+    os.system('grep "kinetic-energy cutoff" %s > %s' % (log, tmp_file))
+    with open(tmp_file) as fle:
+        items = list(filter(None, fle.read().split(" ")))
+
+    pw = float(items[3]) * 13.606
+    os.system("rm %s" % tmp_file)
+
+    return(scf, iter, pw)
+    #__|
+
+def legacy_fermi(outdir):
+    """Previous Fermi energy grep of calc_wf."""
+    #| - legacy_fermi
+    fermi_data = os.popen('grep -n "Fermi" %s/log | tail -1' % outdir, "r")
+    fermi_energy = float(fermi_data.readline().split()[-2])
+    fermi_data.close()
+
+    return(fermi_energy)
+    #__|
+
+def new_fermi(outdir):
+    """Fermi energy as read by calc_wf now."""
+    #| - new_fermi
+    out = __fermi_scanner__.scan(os.path.join(outdir, "log"))
+
+    return(float(out["fermi"][-1]))
+    #__|
+
+def write_jobs(root_dir, num_jobs, size_mb):
+    """Write job folders with a QE log each (Fermi energy lines added)."""
+    #| - write_jobs
+    path_list = []
+    for job_i in range(num_jobs):
+        path_i = os.path.join(root_dir, "%04d" % job_i)
+        os.makedirs(path_i)
+
+        log = os.path.join(path_i, "log")
+        write_log(log, size_mb, num_atoms=8, seed=job_i)
+        with open(log, "a") as fle:
+            for i in range(3):
+                fle.write(
+                    "     the Fermi energy is     %.4f ev\n\n" % (i + job_i))
+            fle.write("     JOB DONE.\n")
+
+        path_list.append(path_i)
+
+    return(path_list)
+    #__|
+
+#__|
+
+if __name__ == "__main__":
+    #| - Main
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_jobs", type=int, default=50)
+    parser.add_argument("--size_mb", type=float, default=5)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path_list = write_jobs(tmp_dir, args.num_jobs, args.size_mb)
+        tmp_file = os.path.join(tmp_dir, "scf_temp.txt")
+        print(str(args.num_jobs) + " logs of " + str(args.size_mb) + " MB")
+
+        identical = True
+        timings = {"legacy_scf": 0., "scf": 0., "legacy_fermi": 0., "fermi": 0.}
+        for path_i in path_list:
+            log = os.path.join(path_i, "log")
+
+            t_start = time.time()
+            out_legacy = legacy_scf_convergence(log, tmp_file)
+            timings["legacy_scf"] += time.time() - t_start
+
+            t_start = time.time()
+            out_new = scf_convergence(path_i=path_i, log="log")
+            timings["scf"] += time.time() - t_start
+
+            t_start = time.time()
+            fermi_legacy = legacy_fermi(path_i)
+            timings["legacy_fermi"] += time.time() - t_start
+
+            t_start = time.time()
+            fermi_new = new_fermi(path_i)
+            timings["fermi"] += time.time() - t_start
+
+            identical &= out_legacy == out_new
+            identical &= fermi_legacy == fermi_new
+
+        for key in ["legacy_scf", "scf", "legacy_fermi", "fermi"]:
+            print(key.ljust(13) + "| " +
+                str(round(1000 * timings[key] / args.num_jobs, 2)) +
+                " ms per job")
+        print("identical output: " + str(identical))
+
+    finally:
+        shutil.rmtree(tmp_dir)
+    #__|
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark submission throughput and status polling on simulated clusters.
+
+Author: Raul A. Flores
+
+Jobs are submitted through ComputerCluster with COMPENV set to one of the
+sched_sim clusters (sim_nersc, sim_sherlock, sim_slac, sim_aws), then the
+state of every job is polled per job (job_state) and with a single batched
+query (update_queue_snapshot).
+
+    python bench_sched_sim.py --compenv sim_slac --num_jobs 200 \
+        --latency 0.05 --failure_rate 0.01
+"""
+
+#| - Import Modules
+import os
+import sys
+import time
+import json
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+#__|
+
+#| - Methods
+
+def make_job_dirs(root, num_jobs):
+    """Create job folders with a dummy job script."""
+    #| - make_job_dirs
+    path_list = []
+    for i_job in range(num_jobs):
+        path_i = os.path.join(root, "data", "job_" + str(i_job), "_1")
+        os.makedirs(path_i)
+
+        with open(os.path.join(path_i, "model.py"), "w") as fle:
+            fle.write("#!/usr/bin/env python\n")
+
+        path_list.append(path_i)
+
+    return(path_list)
+    #__|
+
+#__|
+
+if __name__ == "__main__":
+    #| - Main
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--compenv", default="sim_nersc")
+    parser.add_argument("--num_jobs", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.)
+    parser.add_argument("--failure_rate", type=float, default=0.)
+    parser.add_argument("--pending_time", type=float, default=1.)
+    parser.add_argument("--run_time", type=float, default=5.)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    root_dir = os.getcwd()
+    try:
+        os.environ["SCHED_SIM_STATE"] = os.path.join(tmp_dir, "state.json")
+        os.environ["COMPENV"] = args.compenv
+
+        # AWS jobs copy these into the job folders
+        for key in ["PYTHONMODULES", "PYTHONPACKAGES"]:
+            os.environ[key] = os.path.join(tmp_dir, key)
+            os.makedirs(os.environ[key])
+
+        from dft_job_automat.sched_sim.sched_state import (
+            set_config,
+            load_state,
+            )
+        from dft_job_automat.compute_env import ComputerCluster
+        from dft_job_automat.queue_poller import read_job_id
+
+        set_config(
+            latency={"default": args.latency},
+            failure_rate={"default": args.failure_rate},
+            pending_time=args.pending_time,
+            run_time=args.run_time,
+            )
+
+        path_list = make_job_dirs(tmp_dir, args.num_jobs)
+        cluster = ComputerCluster()
+
+        #| - Submission
+        t_start = time.time()
+        for path_i in path_list:
+            try:
+                cluster.submit_job(path_i=path_i)
+            except Exception as e:
+                print("Submission error: " + str(e))
+            os.chdir(root_dir)
+        t_submit = time.time() - t_start
+
+        num_submitted = len([
+            i for i in path_list if read_job_id(path_i=i) is not None
+            ])
+        #__|
+
+        #| - Per Job Polling
+        t_start = time.time()
+        for path_i in path_list:
+            try:
+                cluster.job_state(path_i=path_i)
+            except Exception as e:
+                print("Polling error: " + str(e))
+        t_poll = time.time() - t_start
+        #__|
+
+        #| - Batched Polling
+        t_start = time.time()
+        cluster.update_queue_snapshot(path_list)
+        states = [cluster.job_state(path_i=path_i) for path_i in path_list]
+        t_snapshot = time.time() - t_start
+        cluster.clear_queue_snapshot()
+        #__|
+
+        out = {
+            "compenv": args.compenv,
+            "num_jobs": args.num_jobs,
+            "num_submitted": num_submitted,
+            "submit_jobs_per_s": num_submitted / t_submit,
+            "poll_per_job_s": t_poll / args.num_jobs,
+            "poll_snapshot_s": t_snapshot,
+            "states": dict([(str(i), states.count(i)) for i in set(states)]),
+            "scheduler_calls": load_state()["calls"],
+            }
+        print(json.dumps(out, indent=2))
+
+    finally:
+        os.chdir(root_dir)
+        shutil.rmtree(tmp_dir)
+    #__|
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark incremental (tail) parsing of the logs of running jobs.
+
+Author: Raul A. Flores
+
+Simulates --num_jobs running QE jobs whose logs (--size_mb final size each,
+see bench_qe_log.py) grow over --rounds refreshes. Every refresh appends the
+next chunk of output to every log and then reads the magmom/charge history
+of all of them:
+
+    full        | parse_qe_log from byte 0 (what every refresh did before)
+    incremental | parse_qe_log(incremental=True), only the appended lines
+
+The work of the full parse grows with the total output, the incremental one
+with the new output only. Both must return the same DataFrames.
+
+    python bench_tail_parser.py --num_jobs 100 --size_mb 2 --rounds 20
+"""
+
+#| - Import Modules
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+
+from bench_qe_log import write_log
+
+from quantum_espresso.qe_log_parser import parse_qe_log
+#__|
+
+#| - Methods
+
+def chunk_ends(data, rounds):
+    """Return line aligned end offsets splitting data in rounds chunks."""
+    #| - chunk_ends
+    ends = []
+    for round_i in range(1, rounds + 1):
+        end = data.find(b"\n", len(data) * round_i // rounds - 1) + 1
+        if end == 0 or round_i == rounds:
+            end = len(data)
+        ends.append(end)
+
+    return(ends)
+    #__|
+
+def same_result(result_0, result_1):
+    """Return True if both QELogResults give the same history DataFrame."""
+    #| - same_result
+    df_0 = result_0.magmom_charge_df()
+    df_1 = result_1.magmom_charge_df()
+
+    if df_0 is None or df_1 is None:
+        return(df_0 is None and df_1 is None)
+
+    return(df_0.equals(df_1))
+    #__|
+
+#__|
+
+if __name__ == "__main__":
+    #| - Main
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_jobs", type=int, default=100)
+    parser.add_argument("--size_mb", type=float, default=2)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        source = os.path.join(tmp_dir, "source_log")
+        write_log(source, args.size_mb, num_atoms=8, seed=0)
+        with open(source, "rb") as fle:
+            data = fle.read()
+        ends = chunk_ends(data, args.rounds)
+
+        logs = []
+        for job_i in range(args.num_jobs):
+            path_i = os.path.join(tmp_dir, "%04d" % job_i)
+            os.makedirs(path_i)
+            logs.append(os.path.join(path_i, "log"))
+            open(logs[-1], "wb").close()
+
+        print(str(args.num_jobs) + " running jobs, logs growing to " +
+            str(args.size_mb) + " MB in " + str(args.rounds) + " refreshes")
+
+        identical = True
+        timings = {"full": 0., "incremental": 0.}
+        start = 0
+        for round_i, end in enumerate(ends):
+            for log in logs:
+                with open(log, "ab") as fle:
+                    fle.write(data[start:end])
+            start = end
+
+            t_start = time.time()
+            results_full = [parse_qe_log(i, use_cache=False) for i in logs]
+            t_full = time.time() - t_start
+
+            t_start = time.time()
+            results_inc = [parse_qe_log(i, incremental=True) for i in logs]
+            t_inc = time.time() - t_start
+
+            timings["full"] += t_full
+            timings["incremental"] += t_inc
+
+            for result_full, result_inc in zip(results_full, results_inc):
+                identical &= same_result(result_full, result_inc)
+
+            print("refresh " + str(round_i + 1).rjust(3) + " | full " +
+                str(round(t_full, 3)) + " s | incremental " +
+                str(round(t_inc, 3)) + " s")
+
+        for key in ["full", "incremental"]:
+            print(key.ljust(12) + "| " + str(round(timings[key], 2)) +
+                " s total")
+        print("identical output: " + str(identical))
+
+    finally:
+        shutil.rmtree(tmp_dir)
+    #__|
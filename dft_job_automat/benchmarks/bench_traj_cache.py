@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark the trajectory cache of the DFT_Methods columns.
+
+Author: Raul A. Flores
+
+Writes --num_jobs finished job folders, each with an out_opt.traj of
+--num_frames relaxation frames, and times the elec_energy, atoms_object,
+init_atoms and atom_type_num_dict columns:
+
+    legacy  | The io.read calls the methods made before (all frames read by
+              atoms_object, elec_energy reading the file twice more, ...)
+    cold    | DFT_Methods with a TrajectoryCache, no sidecars yet
+    sidecar | Fresh cache, frames loaded from the .frames.npz sidecars
+
+The columns are computed one after the other over all jobs, as in
+DFT_Jobs_Analysis, so the in-memory cache holds fewer trajectories than
+there are jobs and the sidecars do most of the work.
+
+    python bench_traj_cache.py --num_jobs 50 --num_frames 300
+"""
+
+#| - Import Modules
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import contextlib
+import io as io_std
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+
+from ase import io
+from ase.build import bulk
+from ase.io import Trajectory
+from ase.calculators.singlepoint import SinglePointCalculator
+
+from ase_modules.traj_cache import TrajectoryCache
+from dft_job_automat.job_types_classes.dft_methods import DFT_Methods
+#__|
+
+#| - Methods
+
+COLUMNS = ["elec_energy", "atoms_object", "init_atoms", "atom_type_num_dict"]
+
+def write_jobs(root_dir, num_jobs, num_frames, size=3):
+    """Write finished job folders with relaxation trajectories.
+
+    Args:
+        root_dir:
+        num_jobs:
+        num_frames:
+        size:
+            Supercell repetitions of the Cu cell
+    """
+    #| - write_jobs
+    path_list = []
+    for job_i in range(num_jobs):
+        path_i = os.path.join(root_dir, "%04d" % job_i)
+        os.makedirs(path_i)
+
+        traj = Trajectory(os.path.join(path_i, "out_opt.traj"), "w")
+        for frame_i in range(num_frames):
+            atoms = bulk("Cu", cubic=True).repeat((size, size, size))
+            atoms.rattle(0.01, seed=frame_i)
+            atoms.calc = SinglePointCalculator(
+                atoms,
+                energy=-10. - 0.01 * frame_i,
+                forces=np.random.rand(len(atoms), 3),
+                )
+            traj.write(atoms)
+        traj.close()
+
+        open(os.path.join(path_i, ".FINISHED"), "w").close()
+        path_list.append(path_i)
+
+    return(path_list)
+    #__|
+
+def legacy_columns(path_list):
+    """The reads of the four columns before the trajectory cache."""
+    #| - legacy_columns
+    for path_i in path_list:
+        file_name = os.path.join(path_i, "out_opt.traj")
+
+        # elec_energy: atoms_object()[-1] and out_opt.traj again
+        io.read(file_name, index=":")[-1].get_potential_energy()
+        io.read(file_name).get_potential_energy()
+
+    for path_i in path_list:
+        io.read(os.path.join(path_i, "out_opt.traj"), index=":")
+
+    for path_i in path_list:
+        io.read(os.path.join(path_i, "out_opt.traj"))
+
+    for path_i in path_list:
+        io.read(os.path.join(path_i, "out_opt.traj"))
+    #__|
+
+def cached_columns(path_list, traj_cache):
+    """The four DFT_Methods columns with traj_cache."""
+    #| - cached_columns
+    methods = DFT_Methods(traj_cache=traj_cache)
+    with contextlib.redirect_stdout(io_std.StringIO()):
+        for column in COLUMNS:
+            for path_i in path_list:
+                getattr(methods, column)(path_i)
+    #__|
+
+def remove_sidecars(path_list):
+    """Remove the .frames.npz sidecars."""
+    #| - remove_sidecars
+    for path_i in path_list:
+        for file_name in os.listdir(path_i):
+            if file_name.endswith(".frames.npz"):
+                os.remove(os.path.join(path_i, file_name))
+    #__|
+
+#__|
+
+if __name__ == "__main__":
+    #| - Main
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_jobs", type=int, default=50)
+    parser.add_argument("--num_frames", type=int, default=300)
+    parser.add_argument("--max_files", type=int, default=16)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path_list = write_jobs(tmp_dir, args.num_jobs, args.num_frames)
+        print(str(args.num_jobs) + " jobs x " + str(args.num_frames) +
+            " frames, " + str(len(COLUMNS)) + " columns")
+
+        t_start = time.time()
+        legacy_columns(path_list)
+        print("legacy  | " + str(round(time.time() - t_start, 2)) + " s")
+
+        remove_sidecars(path_list)
+        traj_cache = TrajectoryCache(max_files=args.max_files)
+        t_start = time.time()
+        cached_columns(path_list, traj_cache)
+        print("cold    | " + str(round(time.time() - t_start, 2)) + " s, " +
+            str(traj_cache.num_reads) + " trajectory reads")
+
+        traj_cache = TrajectoryCache(max_files=args.max_files)
+        t_start = time.time()
+        cached_columns(path_list, traj_cache)
+        print("sidecar | " + str(round(time.time() - t_start, 2)) + " s, " +
+            str(traj_cache.num_reads) + " trajectory reads")
+
+    finally:
+        shutil.rmtree(tmp_dir)
+    #__|
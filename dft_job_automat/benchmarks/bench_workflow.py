@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""End-to-end benchmark of the job automation classes on synthetic trees.
+
+Author: Raul A. Flores
+
+For every tree size a synthetic tree is written (see synthetic_tree.py) and
+every case below is timed in a fresh python process, so that the peak RSS
+of one case doesn't leak into the next:
+
+    setup_init          | DFT_Jobs_Setup.__init__
+    analysis_init       | DFT_Jobs_Analysis.__init__
+    analysis_job_state  | DFT_Jobs_Analysis.__init__(update_job_state=True)
+    manager_restart     | DFT_Jobs_Manager.restart_job on a sample of jobs
+    workflow_init       | DFT_Jobs_Workflow construction (2 steps)
+
+The job states are queried from the sched_sim fake scheduler (COMPENV is set
+to sim_nersc). Reported per case: wall time, peak RSS, and the read/write
+syscall and byte counts of /proc/self/io (Linux only, None elsewhere, the
+fake scheduler subprocesses aren't included).
+
+    python bench_workflow.py --sizes 1000,10000,100000 --output results.json
+"""
+
+#| - Import Modules
+import os
+import sys
+import time
+import json
+import shutil
+import platform
+import tempfile
+import argparse
+import resource
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+#__|
+
+#| - Methods
+
+CASES = [
+    "setup_init",
+    "analysis_init",
+    "analysis_job_state",
+    "workflow_init",
+
+    # Creates new revision folders, must be last
+    "manager_restart",
+    ]
+
+def proc_io():
+    """Return read/write counters of current process from /proc/self/io."""
+    #| - proc_io
+    try:
+        with open("/proc/self/io", "r") as fle:
+            lines = fle.read().splitlines()
+    except IOError:
+        return(None)
+
+    io_dict = {}
+    for line in lines:
+        key, value = line.split(":")
+        io_dict[key.strip()] = int(value)
+
+    return(io_dict)
+    #__|
+
+def noop_setup(step, path_i, job_i_params, wf_vars):
+    """Workflow setup function doing nothing."""
+    #| - noop_setup
+    pass
+    #__|
+
+def run_case(case, tree_dir, num_restarts=10):
+    """Time a single case, returns results dict.
+
+    Args:
+        case:
+        tree_dir:
+            Output folder of make_tree
+        num_restarts:
+            Number of jobs restarted in manager_restart
+    """
+    #| - run_case
+    with open(os.path.join(tree_dir, "tree.json"), "r") as fle:
+        tree = json.load(fle)
+
+    root_dir = os.path.join(tree_dir, "tree")
+    wf_dir = os.path.join(tree_dir, "workflow")
+
+    os.environ["COMPENV"] = "sim_nersc"
+    os.environ["SCHED_SIM_STATE"] = os.path.join(tree_dir, "state.json")
+
+    from dft_job_automat.job_setup import DFT_Jobs_Setup
+    from dft_job_automat.job_analysis import DFT_Jobs_Analysis
+    from dft_job_automat.job_manager import DFT_Jobs_Manager
+    from dft_job_automat.job_dependencies import DFT_Jobs_Workflow
+
+    tree_args = {
+        "tree_level": tree["tree_level_labels"],
+        "level_entries": tree["level_entries"],
+        "root_dir": root_dir,
+        }
+
+    # Silence the per job prints, they would dominate the timings
+    stdout = sys.stdout
+    devnull = open(os.devnull, "w")
+    sys.stdout = devnull
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    io_before = proc_io()
+    t_start = time.time()
+
+    try:
+        if case == "setup_init":
+            DFT_Jobs_Setup(**tree_args)
+
+        elif case == "analysis_init":
+            DFT_Jobs_Analysis(
+                update_job_state=False,
+                load_dataframe=False,
+                **tree_args)
+
+        elif case == "analysis_job_state":
+            DFT_Jobs_Analysis(
+                update_job_state=True,
+                load_dataframe=False,
+                **tree_args)
+
+        elif case == "manager_restart":
+            Jobs = DFT_Jobs_Manager(
+                update_job_state=False,
+                load_dataframe=False,
+                **tree_args)
+
+            for job_i in Jobs.job_var_lst[0:num_restarts]:
+                Jobs.restart_job(job_i, [])
+
+        elif case == "workflow_init":
+            DFT_Jobs_Workflow(
+                tree_level_labels_list=[tree["tree_level_labels"]] * 2,
+                tree_level_values_list=[tree["level_entries"]] * 2,
+                setup_function=noop_setup,
+                number_of_steps=2,
+                root_dir=wf_dir,
+                )
+
+        else:
+            raise ValueError("Unknown case: " + str(case))
+
+    finally:
+        wall_time = time.time() - t_start
+        sys.stdout = stdout
+        devnull.close()
+
+    io_after = proc_io()
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    out = {
+        "case": case,
+        "num_jobs": tree["num_jobs"],
+        "wall_time_s": wall_time,
+
+        # kB on Linux
+        "rss_before_kb": rss_before,
+        "rss_peak_kb": rss_peak,
+        }
+
+    for key in ["syscr", "syscw", "rchar", "wchar"]:
+        if io_before is None:
+            out[key] = None
+        else:
+            out[key] = io_after[key] - io_before[key]
+
+    return(out)
+    #__|
+
+def make_tree(tree_dir, num_jobs, num_levels=3, revisions=1):
+    """Write synthetic tree, workflow tree and scheduler state.
+
+    Args:
+        tree_dir:
+        num_jobs:
+        num_levels:
+        revisions:
+    """
+    #| - make_tree
+    from dft_job_automat.benchmarks.synthetic_tree import (
+        make_synthetic_tree,
+        make_workflow_tree,
+        scheduler_jobs,
+        )
+
+    os.environ["SCHED_SIM_STATE"] = os.path.join(tree_dir, "state.json")
+    from dft_job_automat.sched_sim.sched_state import add_jobs
+
+    tree_kwargs = {
+        "num_jobs": num_jobs,
+        "num_levels": num_levels,
+        "revisions": revisions,
+        }
+
+    t_start = time.time()
+    tree = make_synthetic_tree(os.path.join(tree_dir, "tree"), **tree_kwargs)
+    make_workflow_tree(
+        os.path.join(tree_dir, "workflow"),
+        num_steps=2,
+        write_fake_outputs=False,
+        **tree_kwargs)
+    t_tree = time.time() - t_start
+
+    add_jobs(scheduler_jobs(tree["job_ids"]))
+
+    tree_desc = {
+        "tree_level_labels": tree["tree_level_labels"],
+        "level_entries": tree["level_entries"],
+        "num_jobs": tree["num_jobs"],
+        }
+    with open(os.path.join(tree_dir, "tree.json"), "w") as fle:
+        json.dump(tree_desc, fle)
+
+    return(t_tree)
+    #__|
+
+def run_case_subprocess(case, tree_dir, num_restarts):
+    """Run case in a fresh python process, returns results dict."""
+    #| - run_case_subprocess
+    cmd = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--run_case", case,
+        "--tree_dir", tree_dir,
+        "--num_restarts", str(num_restarts),
+        ]
+
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        )
+    out, err = proc.communicate()
+
+    if proc.returncode != 0:
+        return({"case": case, "error": err.strip().splitlines()[-1:]})
+
+    return(json.loads(out.strip().splitlines()[-1]))
+    #__|
+
+#__|
+
+if __name__ == "__main__":
+    #| - Main
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--num_levels", type=int, default=3)
+    parser.add_argument("--revisions", type=int, default=1)
+    parser.add_argument("--num_restarts", type=int, default=10)
+    parser.add_argument("--work_dir", default=None)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--keep_trees", action="store_true")
+
+    # Used internally to time a single case
+    parser.add_argument("--run_case", default=None)
+    parser.add_argument("--tree_dir", default=None)
+    args = parser.parse_args()
+
+    if args.run_case is not None:
+        out = run_case(args.run_case, args.tree_dir, args.num_restarts)
+        print(json.dumps(out))
+        sys.exit(0)
+
+    sizes = [int(i) for i in args.sizes.split(",")]
+    cases = [i for i in CASES if i in args.cases.split(",")]
+
+    results = []
+    for num_jobs in sizes:
+        tree_dir = tempfile.mkdtemp(
+            prefix="bench_wf_" + str(num_jobs) + "_",
+            dir=args.work_dir,
+            )
+
+        try:
+            t_tree = make_tree(
+                tree_dir,
+                num_jobs,
+                num_levels=args.num_levels,
+                revisions=args.revisions,
+                )
+            results.append({
+                "case": "generate_tree",
+                "num_jobs": num_jobs,
+                "wall_time_s": t_tree,
+                })
+
+            for case in cases:
+                out = run_case_subprocess(case, tree_dir, args.num_restarts)
+                results.append(out)
+                print(json.dumps(out))
+
+        finally:
+            if not args.keep_trees:
+                shutil.rmtree(tree_dir)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "num_levels": args.num_levels,
+        "revisions": args.revisions,
+        "num_restarts": args.num_restarts,
+        "results": results,
+        }
+
+    if args.output is not None:
+        with open(args.output, "w") as fle:
+            json.dump(report, fle, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    #__|
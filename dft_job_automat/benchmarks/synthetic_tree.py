@@ -0,0 +1,409 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Generate synthetic job trees for benchmarking the automation classes.
+
+Author: Raul A. Flores
+
+Writes the same layout as DFT_Jobs_Setup.create_dir_struct:
+
+    <root_dir>/jobs_bin/dir_structure.json
+    <root_dir>/jobs_bin/.folders_exist
+    <root_dir>/data/01-<value>/03-<value>/job_params.json
+    <root_dir>/data/01-<value>/03-<value>/_1/...
+
+Every revision folder gets marker files (.READY, .SUBMITTED, .jobid,
+.QUEUESTATE, .FINISHED, .FINISHED.new) according to a randomly drawn job
+state, and finished jobs get small fake outputs (QE log, OUTCAR, out.traj if
+ase is installed).
+
+    python synthetic_tree.py /tmp/tree --num_jobs 1000 --num_levels 3
+"""
+
+#| - Import Modules
+import os
+import json
+import random
+import argparse
+
+try:
+    from ase import Atoms
+    from ase.io import write as ase_write
+except ImportError:
+    Atoms = None
+#__|
+
+#| - Fake Output Templates
+QE_LOG_TEMPLATE = """
+     Program PWSCF v.6.1 starts on  1Jan2018 at  0: 0: 0
+
+     kinetic-energy cutoff     =      {ecut:.4f}  Ry
+{scf_lines}
+!    total energy              =    {energy:.8f} Ry
+
+     the Fermi energy is     {fermi:.4f} ev
+
+     JOB DONE.
+"""
+
+QE_SCF_LINE = "     total energy              =    {energy:.8f} Ry"
+
+OUTCAR_TEMPLATE = """ vasp.5.4.1 24Jun15 (build Jan 01 2018) complex
+   number of dos      NEDOS =    301   number of ions     NIONS =      {nions}
+  energy  without entropy=     {energy:.6f}  energy(sigma->0) =     {energy:.6f}
+ General timing and accounting informations for this job:
+"""
+
+# Fraction of jobs in every state
+DEFAULT_STATE_FRACTIONS = {
+    "ready": 0.1,
+    "pending": 0.1,
+    "running": 0.2,
+    "succeeded": 0.5,
+    "failed": 0.1,
+    }
+#__|
+
+#| - Methods
+
+def level_sizes(num_jobs, num_levels):
+    """Return number of values per level giving at least num_jobs jobs.
+
+    Args:
+        num_jobs:
+        num_levels:
+    """
+    #| - level_sizes
+    base = max(int(round(num_jobs ** (1. / num_levels))), 1)
+
+    sizes = [base for i in range(num_levels - 1)]
+
+    prod = 1
+    for size in sizes:
+        prod *= size
+    sizes.append(max(-(-num_jobs // prod), 1))
+
+    return(sizes)
+    #__|
+
+def level_values(sizes):
+    """Return tree level labels and values (first level floats).
+
+    Args:
+        sizes:
+    """
+    #| - level_values
+    labels = []
+    values = []
+    for i_level, size in enumerate(sizes):
+        labels.append("prop_" + str(i_level))
+
+        if i_level == 0:
+            values.append([round(0.1 * (i + 1), 2) for i in range(size)])
+        else:
+            values.append(["v" + str(i) for i in range(size)])
+
+    return(labels, values)
+    #__|
+
+def value_dir_name(index, value, sep="-"):
+    """Folder name of level value (same as DFT_Jobs_Setup.var_lst_to_path).
+
+    Args:
+        index:
+            0 based index of value in its level
+        value:
+        sep:
+    """
+    #| - value_dir_name
+    index = index + 1
+    if index < 10:
+        index = "0" + str(index)
+    else:
+        index = str(index)
+
+    if isinstance(value, float):
+        prop_value = str(value).replace(".", "p")
+        if "-" in str(value):
+            prop_value = prop_value.replace("-", "n")
+    else:
+        prop_value = str(value)
+
+    return(index + sep + prop_value)
+    #__|
+
+def write_markers(path_i, job_state, job_id):
+    """Write marker files of job in job_state.
+
+    Args:
+        path_i:
+        job_state:
+        job_id:
+    """
+    #| - write_markers
+    def touch(fle_name, content="\n"):
+        with open(os.path.join(path_i, fle_name), "w") as fle:
+            fle.write(content)
+
+    touch(".READY")
+    if job_state == "ready":
+        return(None)
+
+    queue_state = {
+        "pending": "PENDING",
+        "running": "RUNNING",
+        "succeeded": "SUCCEEDED",
+        "failed": "FAILED",
+        }[job_state]
+
+    touch(".SUBMITTED")
+    touch(".jobid", str(job_id) + "\n")
+    touch(".QUEUESTATE", queue_state + "\n")
+
+    if job_state == "succeeded":
+        touch(".FINISHED")
+        touch(".FINISHED.new", "job_completed\n")
+    #__|
+
+def write_outputs(path_i, rand, num_scf=10, num_atoms=4):
+    """Write small fake calculation outputs.
+
+    Args:
+        path_i:
+        rand:
+            random.Random instance
+        num_scf:
+        num_atoms:
+    """
+    #| - write_outputs
+    energy = -100. - 10. * rand.random()
+
+    scf_lines = "\n".join([
+        QE_SCF_LINE.format(energy=energy + 1. / (i + 1))
+        for i in range(num_scf)
+        ])
+
+    with open(os.path.join(path_i, "log"), "w") as fle:
+        fle.write(QE_LOG_TEMPLATE.format(
+            ecut=30.,
+            scf_lines=scf_lines,
+            energy=energy,
+            fermi=-2. + rand.random(),
+            ))
+
+    with open(os.path.join(path_i, "OUTCAR"), "w") as fle:
+        fle.write(OUTCAR_TEMPLATE.format(nions=num_atoms, energy=energy))
+
+    if Atoms is not None:
+        atoms = Atoms(
+            "H" + str(num_atoms),
+            positions=[(i, 0., 0.) for i in range(num_atoms)],
+            cell=[num_atoms, 5., 5.],
+            pbc=True,
+            )
+        ase_write(os.path.join(path_i, "out.traj"), atoms)
+    #__|
+
+def make_synthetic_tree(
+    root_dir,
+    num_jobs=1000,
+    num_levels=3,
+    revisions=1,
+    state_fractions=None,
+    write_fake_outputs=True,
+    job_id_start=100000,
+    seed=0,
+    ):
+    """Write synthetic job tree, returns description dict.
+
+    Returned dict keys:
+        tree_level_labels, level_entries (list of lists), num_jobs,
+        path_list (all revision folders), job_ids ({job id: job state})
+
+    Args:
+        root_dir:
+        num_jobs:
+            Approximate number of jobs (the tree is a full product of the
+            level values)
+        num_levels:
+        revisions:
+            Number of revision folders per job, only the last one gets a
+            random state, the previous ones failed
+        state_fractions:
+            {job state: fraction}, see DEFAULT_STATE_FRACTIONS
+        write_fake_outputs:
+        job_id_start:
+        seed:
+    """
+    #| - make_synthetic_tree
+    if state_fractions is None:
+        state_fractions = DEFAULT_STATE_FRACTIONS
+
+    rand = random.Random(seed)
+    states = sorted(state_fractions.keys())
+    weights = [state_fractions[i] for i in states]
+
+    labels, values = level_values(level_sizes(num_jobs, num_levels))
+
+    #| - jobs_bin
+    jobs_bin = os.path.join(root_dir, "jobs_bin")
+    if not os.path.exists(jobs_bin):
+        os.makedirs(jobs_bin)
+
+    with open(os.path.join(jobs_bin, "dir_structure.json"), "w") as fle:
+        json.dump({
+            "tree_level_labels": labels,
+            "level_entries_dict": values,
+            "skip_dirs": None,
+            }, fle, indent=2)
+
+    with open(os.path.join(jobs_bin, ".folders_exist"), "w") as fle:
+        fle.write("\n")
+    #__|
+
+    path_list = []
+    job_ids = {}
+    job_id = job_id_start
+
+    #| - Job Folders
+    # Mixed radix counter over the level values (same order as the job_var_lst)
+    digits = [0 for i in labels]
+    total = 1
+    for vals in values:
+        total *= len(vals)
+
+    for i_job in range(total):
+        job_dir = os.path.join(root_dir, "data", *[
+            value_dir_name(digit, vals[digit])
+            for digit, vals in zip(digits, values)
+            ])
+        os.makedirs(job_dir)
+
+        with open(os.path.join(job_dir, "job_params.json"), "w") as fle:
+            json.dump(dict([
+                (label, vals[digit])
+                for label, vals, digit in zip(labels, values, digits)
+                ]), fle)
+
+        for rev in range(1, revisions + 1):
+            path_i = os.path.join(job_dir, "_" + str(rev))
+            os.makedirs(path_i)
+            path_list.append(path_i)
+
+            if rev < revisions:
+                job_state = "failed"
+            else:
+                job_state = rand.choices(states, weights=weights)[0]
+
+            write_markers(path_i, job_state, job_id)
+            if job_state != "ready":
+                job_ids[str(job_id)] = job_state
+                job_id += 1
+
+            if write_fake_outputs and job_state in ["succeeded", "failed"]:
+                write_outputs(path_i, rand)
+
+        #| - Incrementing Counter
+        for i_level in reversed(range(len(digits))):
+            digits[i_level] += 1
+            if digits[i_level] < len(values[i_level]):
+                break
+            digits[i_level] = 0
+        #__|
+    #__|
+
+    tree = {
+        "tree_level_labels": labels,
+        "level_entries": values,
+        "num_jobs": total,
+        "path_list": path_list,
+        "job_ids": job_ids,
+        }
+
+    return(tree)
+    #__|
+
+def make_workflow_tree(root_dir, num_steps=2, **kwargs):
+    """Write synthetic trees for the steps of a DFT_Jobs_Workflow.
+
+    Step folders are named as in DFT_Jobs_Workflow (1STEP, 2STEP, ...),
+    returns list of make_synthetic_tree outputs.
+
+    Args:
+        root_dir:
+        num_steps:
+        **kwargs:
+            Passed to make_synthetic_tree
+    """
+    #| - make_workflow_tree
+    tree_list = []
+    for step_i in range(num_steps):
+        step_dir = os.path.join(root_dir, str(step_i + 1) + "STEP")
+
+        kwargs_i = dict(kwargs)
+        kwargs_i["job_id_start"] = kwargs.get("job_id_start", 100000) + \
+            step_i * 10 ** 7
+        kwargs_i["seed"] = kwargs.get("seed", 0) + step_i
+
+        tree_list.append(make_synthetic_tree(step_dir, **kwargs_i))
+
+    return(tree_list)
+    #__|
+
+def scheduler_jobs(job_ids):
+    """Return sched_sim jobs dict of the submitted synthetic jobs.
+
+    Args:
+        job_ids:
+            {job id: job state} from make_synthetic_tree
+    """
+    #| - scheduler_jobs
+    slurm_states = {
+        "pending": "PD",
+        "running": "R",
+        "succeeded": "CD",
+        "failed": "F",
+        }
+
+    jobs = dict([
+        (job_id, {
+            "sched": "slurm",
+            "state": slurm_states[state],
+            "partition": "regular",
+            "submit_epoch": 0.,
+            })
+        for job_id, state in job_ids.items()
+        ])
+
+    return(jobs)
+    #__|
+
+#__|
+
+if __name__ == "__main__":
+    #| - Main
+    parser = argparse.ArgumentParser()
+    parser.add_argument("root_dir")
+    parser.add_argument("--num_jobs", type=int, default=1000)
+    parser.add_argument("--num_levels", type=int, default=3)
+    parser.add_argument("--revisions", type=int, default=1)
+    parser.add_argument("--num_steps", type=int, default=None)
+    parser.add_argument("--no_outputs", action="store_true")
+    args = parser.parse_args()
+
+    kwargs = {
+        "num_jobs": args.num_jobs,
+        "num_levels": args.num_levels,
+        "revisions": args.revisions,
+        "write_fake_outputs": not args.no_outputs,
+        }
+
+    if args.num_steps is None:
+        tree_list = [make_synthetic_tree(args.root_dir, **kwargs)]
+    else:
+        tree_list = make_workflow_tree(args.root_dir, args.num_steps, **kwargs)
+
+    for tree in tree_list:
+        print(str(tree["num_jobs"]) + " jobs | levels " +
+            str([len(i) for i in tree["level_entries"]]))
+    #__|
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Content addressed snapshots of code trees shared between job folders.
+
+Author: Raul A. Flores
+
+Instead of copying the PythonModules/PythonPackages trees into every job
+folder, the tree is copied once into a shared bundle store, in a folder named
+after the hash of its contents, and every job folder gets a symlink to it:
+
+    <store_dir>/PythonModules-<tree hash>/
+    <job dir>/PythonModules -> <store_dir>/PythonModules-<tree hash>
+
+An unchanged tree hashes to the same bundle, so the snapshot is reused
+across submissions. Snapshots are immutable, jobs that are already running
+keep seeing the code they were submitted with.
+
+The bundle store must be on a file system that is visible to the compute
+nodes (ex. the same shared file system as the job folders).
+"""
+
+#| - Import Modules
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+#__|
+
+#| - Methods
+
+def iter_tree_files(src_dir, ignore_names=None):
+    """Yield relative paths of the files in src_dir (sorted, deterministic).
+
+    Args:
+        src_dir:
+        ignore_names:
+            File/folder names to skip (ex. .git, __pycache__)
+    """
+    #| - iter_tree_files
+    if ignore_names is None:
+        ignore_names = CodeBundleStore.ignore_names
+
+    for dir_name, subdir_list, file_list in os.walk(src_dir):
+        subdir_list[:] = sorted(
+            [i for i in subdir_list if i not in ignore_names]
+            )
+
+        for fle_name in sorted(file_list):
+            if fle_name in ignore_names or fle_name.endswith(".pyc"):
+                continue
+
+            file_path = os.path.join(dir_name, fle_name)
+            yield os.path.relpath(file_path, src_dir)
+    #__|
+
+def tree_hash(src_dir, ignore_names=None):
+    """Return sha1 hash of the file names and contents of src_dir.
+
+    Args:
+        src_dir:
+        ignore_names:
+    """
+    #| - tree_hash
+    sha = hashlib.sha1()
+    for rel_path in iter_tree_files(src_dir, ignore_names=ignore_names):
+        file_path = os.path.join(src_dir, rel_path)
+
+        sha.update(rel_path.encode("utf-8"))
+        sha.update(b"\0")
+
+        if os.path.islink(file_path):
+            sha.update(os.readlink(file_path).encode("utf-8"))
+        else:
+            with open(file_path, "rb") as fle:
+                while True:
+                    block = fle.read(2 ** 20)
+                    if not block:
+                        break
+                    sha.update(block)
+
+        sha.update(b"\0")
+
+    return(sha.hexdigest())
+    #__|
+
+def force_symlink(source, dest):
+    """Symlink dest -> source, replacing an existing file, link or folder.
+
+    Args:
+        source:
+        dest:
+    """
+    #| - force_symlink
+    if os.path.islink(dest) or os.path.isfile(dest):
+        os.remove(dest)
+    elif os.path.isdir(dest):
+        shutil.rmtree(dest)
+
+    os.symlink(source, dest)
+    #__|
+
+#__|
+
+
+class CodeBundleStore():
+    """Shared store of content addressed code tree snapshots."""
+
+    #| - CodeBundleStore ******************************************************
+
+    #| - Class Variables
+    ignore_names = [".git", "__pycache__", ".ipynb_checkpoints"]
+
+    # Job folder file listing the bundles linked into it
+    pointer_fle = ".code_bundles.json"
+    #__|
+
+    def __init__(self, store_dir):
+        """Initialize CodeBundleStore instance.
+
+        Args:
+            store_dir:
+                Shared folder holding the bundles
+        """
+        #| - __init__
+        self.store_dir = store_dir
+
+        # {(src_dir, name): bundle path}, trees are hashed once per instance
+        self.bundles = {}
+
+        if not os.path.exists(self.store_dir):
+            os.makedirs(self.store_dir)
+        #__|
+
+    def bundle(self, src_dir, name):
+        """Return path of the bundle of src_dir, creating it if necessary.
+
+        Args:
+            src_dir:
+                Code tree to snapshot (ex. $PYTHONMODULES)
+            name:
+                Bundle name prefix (ex. PythonModules)
+        """
+        #| - bundle
+        key = (os.path.abspath(src_dir), name)
+        if key in self.bundles:
+            return(self.bundles[key])
+
+        hash_i = tree_hash(src_dir)
+        bundle_path = os.path.join(self.store_dir, name + "-" + hash_i)
+
+        if not os.path.isdir(bundle_path):
+            print("Creating code bundle " + bundle_path)
+
+            # Copy to temporary folder first so that a partial copy is never
+            # visible under the final name (concurrent submissions)
+            tmp_dir = tempfile.mkdtemp(dir=self.store_dir, prefix=".tmp_")
+            tmp_bundle = os.path.join(tmp_dir, "bundle")
+            shutil.copytree(
+                src_dir,
+                tmp_bundle,
+                symlinks=True,
+                ignore=shutil.ignore_patterns(
+                    "*.pyc",
+                    *CodeBundleStore.ignore_names
+                    ),
+                )
+
+            try:
+                os.rename(tmp_bundle, bundle_path)
+            except OSError:
+                # Bundle created by another process in the meantime
+                if not os.path.isdir(bundle_path):
+                    raise
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.bundles[key] = bundle_path
+
+        return(bundle_path)
+        #__|
+
+    def link_bundle(self, src_dir, name, job_dir, link_name=None):
+        """Symlink bundle of src_dir into job_dir (O(1) in the tree size).
+
+        Args:
+            src_dir:
+            name:
+            job_dir:
+            link_name:
+                Name of the link in job_dir, defaults to name
+        """
+        #| - link_bundle
+        if link_name is None:
+            link_name = name
+
+        bundle_path = self.bundle(src_dir, name)
+
+        force_symlink(bundle_path, os.path.join(job_dir, link_name))
+
+        #| - Recording Bundle in Job Folder
+        pointer_file = os.path.join(job_dir, CodeBundleStore.pointer_fle)
+
+        pointers = {}
+        if os.path.isfile(pointer_file):
+            with open(pointer_file, "r") as fle:
+                pointers = json.load(fle)
+
+        pointers[link_name] = bundle_path
+
+        with open(pointer_file, "w") as fle:
+            json.dump(pointers, fle, indent=2)
+        #__|
+
+        return(bundle_path)
+        #__|
+
+    #__| **********************************************************************
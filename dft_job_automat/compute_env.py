@@ -31,6 +31,19 @@ import json
 
 # My Modules
 from misc_modules.misc_methods import merge_two_dicts
+
+from dft_job_automat.queue_poller import (
+    read_job_id,
+    slurm_squeue_batch,
+    lsf_bjobs_batch,
+    write_queue_state_file,
+    )
+
+from aws.batch_status import job_queue_dicts_bulk
+
+from dft_job_automat.job_arrays import submit_job_arrays, make_executable
+from dft_job_automat.code_bundle import CodeBundleStore
+from dft_job_automat.job_registry import JobRegistry
 #__|
 
 #| - Methods
@@ -44,8 +57,9 @@ def slurm_squeue_parse(
         "R": "RUNNING",
         "CF": "CONFIGURING",
         "SUCCEEDED": "SUCCEEDED",
-        }
-
+        },
+    snapshot=None,
+    squeue_cmd="squeue",
     ):
     """Parse slurm squeue command for job state.
 
@@ -53,40 +67,27 @@ def slurm_squeue_parse(
         job_id:
         path_i:
         queue_state_key:
+        snapshot:
+            Output of queue_poller.slurm_squeue_batch, if given the job info is
+            looked up in the snapshot instead of calling squeue
+        squeue_cmd:
     """
     #| - slurm_squeue_parse
-    bash_comm = "squeue -j " + str(job_id)
+    if snapshot is None:
+        snapshot = slurm_squeue_batch([job_id], squeue_cmd=squeue_cmd)
 
-    try:
-        out = subprocess.check_output(
-            bash_comm,
-            shell=True,
-            stderr=subprocess.STDOUT,
-            )
+    # 'JOBID PARTITION NAME USER ST TIME NODES NODELIST(REASON)'
+    data_dict = snapshot.get(str(job_id), None)
 
-        # 'JOBID PARTITION NAME USER ST TIME NODES NODELIST(REASON)'
-        out = out.splitlines()
-        out = out[1].split(" ")
-        out = [i for i in out if i != '']
+    if data_dict is not None:
+        job_state = job_state_dict.get(data_dict[queue_state_key], None)
 
-        data_dict = {
-            "PARTITION": out[1],
-            "STAT": out[4],
-            # "CF":
-            }
-
-        if path_i is not None:
-            with open(path_i + "/.QUEUESTATE", "w") as fle:
-                fle.write(job_state_dict[data_dict[queue_state_key]])
-                fle.write("\n")
-
-    except subprocess.CalledProcessError:
-        data_dict = None
-        pass
+        # Unrecognized queue states are treated as if the job wasn't found
+        if job_state is None:
+            data_dict = None
 
-    except:
-        data_dict = None
-        pass
+        elif path_i is not None:
+            write_queue_state_file(path_i, job_state)
 
     return(data_dict)
     #__|
@@ -110,6 +111,10 @@ class ComputerCluster():
         self.root_dir = os.getcwd()
         self.default_sub_params = self.default_submission_parameters()
 
+        # MarkerTable used for the '.QUEUESTATE' lookups of job_state (set by
+        # DFT_Jobs_Analysis.attach_marker_watcher)
+        self.marker_table = None
+
         # self.username = self.__parse_username__()
 
         self.__parse_cluster_type__()
@@ -149,11 +154,27 @@ class ComputerCluster():
             "nersc": "EdisonCluster",
             }
 
+        # Offline stand-ins using the fake schedulers of sched_sim
+        sim_clusters_dict = {
+            "sim_aws": "SimAWSCluster",
+            "sim_slac": "SimSLACCluster",
+            "sim_sherlock": "SimSherlockCluster",
+            "sim_nersc": "SimEdisonCluster",
+            }
+
         cluster_sys = os.environ.get("COMPENV")
 
-        if cluster_sys in clusters_dict:
-            package = "dft_job_automat.compute_env"
-            name = clusters_dict[cluster_sys]
+        if cluster_sys in clusters_dict or cluster_sys in sim_clusters_dict:
+            if cluster_sys in clusters_dict:
+                package = "dft_job_automat.compute_env"
+                name = clusters_dict[cluster_sys]
+            else:
+                package = "dft_job_automat.sched_sim.sim_clusters"
+                name = sim_clusters_dict[cluster_sys]
+
+                # Simulated clusters behave as the cluster they stand in for
+                cluster_sys = cluster_sys[len("sim_"):]
+
             cluster = getattr(__import__(package, fromlist=[name]), name)
 
             self.cluster_sys = cluster_sys
@@ -226,7 +247,18 @@ class ComputerCluster():
         #| - job_state
         job_state = self.cluster.job_state(path_i=path_i)
 
-        if job_state is None:
+        marker_table = self.marker_table
+        if job_state is None and marker_table is not None and \
+                marker_table.tracks(path_i):
+            job_state = marker_table.marker_content(path_i, ".QUEUESTATE")
+            if job_state is not None:
+                job_state = job_state.split()
+                if len(job_state) == 1:
+                    job_state = job_state[0]
+                else:
+                    job_state = None
+
+        elif job_state is None:
             try:
                 with open(path_i + "/.QUEUESTATE", "r") as fle:
                     job_state = fle.read().rsplit()
@@ -269,6 +301,42 @@ class ComputerCluster():
         return(data_dict)
         #__|
 
+    def update_queue_snapshot(self, path_list):
+        """Poll the batch system once for all jobs in path_list.
+
+        Subsequent job_state calls for these jobs are served from the snapshot
+        instead of forking one or more scheduler processes per job. Call
+        clear_queue_snapshot to go back to querying the scheduler per job.
+
+        Args:
+            path_list:
+                List of job folder paths (containing '.jobid' files)
+        """
+        #| - update_queue_snapshot
+        snapshot = None
+        if hasattr(self.cluster, "queue_snapshot_batch"):
+            snapshot = self.cluster.queue_snapshot_batch(path_list)
+
+        return(snapshot)
+        #__|
+
+    def clear_queue_snapshot(self):
+        """Discard queue snapshot from the last poll cycle."""
+        #| - clear_queue_snapshot
+        if hasattr(self.cluster, "queue_snapshot"):
+            self.cluster.queue_snapshot = None
+        #__|
+
+    def job_registry(self):
+        """Return JobRegistry of submitted jobs (None if not supported)."""
+        #| - job_registry
+        registry = None
+        if hasattr(self.cluster, "job_registry"):
+            registry = self.cluster.job_registry()
+
+        return(registry)
+        #__|
+
     def submit_job(self, **kwargs):
         """Call cluster specific job submission method.
 
@@ -301,6 +369,72 @@ class ComputerCluster():
 
         #__|
 
+    def submit_job_array(self,
+        params_list,
+        array_dir=None,
+        max_array_size=1000,
+        ):
+        """Submit many jobs at once, as job arrays if the cluster supports it.
+
+        Jobs with the same submission parameters (everything but path_i and
+        job_name) are submitted together. Already submitted jobs are skipped.
+        Clusters without job array support fall back to submit_job.
+
+        Args:
+            params_list:
+                List of submission parameter dicts (one per job, same format
+                as the submit_job kwargs)
+            array_dir:
+                Folder for the job array index files and driver scripts,
+                defaults to jobs_bin/job_arrays in the current directory
+            max_array_size:
+                Max number of jobs per array
+        """
+        #| - submit_job_array
+        if array_dir is None:
+            array_dir = os.path.join(os.getcwd(), "jobs_bin/job_arrays")
+
+        #| - Filtering Submitted Jobs
+        params_to_submit = []
+        for params in params_list:
+            params = merge_two_dicts(self.default_sub_params, params)
+            params["path_i"] = os.path.abspath(params["path_i"])
+
+            if self.is_job_submitted(path_i=params["path_i"]):
+                continue
+
+            params_to_submit.append(params)
+        #__|
+
+        if not hasattr(self.cluster, "submit_job_array_clust"):
+            root_dir = os.getcwd()
+            for params in params_to_submit:
+                os.chdir(params["path_i"])
+                self.submit_job(**params)
+                os.chdir(root_dir)
+
+            return(None)
+
+        #| - Writing Job Submission Parameters
+        for params in params_to_submit:
+            path_i = params["path_i"]
+
+            with open(os.path.join(path_i, ".submission_params.json"), "w") as fle:
+                json.dump(params, fle, indent=2, skipkeys=True)
+
+            with open(os.path.join(path_i, ".cluster_sys"), "w") as fle:
+                fle.write(self.cluster_sys + "\n")
+        #__|
+
+        array_list = self.cluster.submit_job_array_clust(
+            params_to_submit,
+            array_dir=array_dir,
+            max_array_size=max_array_size,
+            )
+
+        return(array_list)
+        #__|
+
     #__| **********************************************************************
 
 ################################################################################
@@ -346,6 +480,14 @@ class EdisonCluster(ComputerCluster):
         self.job_state_keys = self.job_state_dict()
         self.job_queue_state_key = "STAT"  # COMBAK
 
+        self.squeue_cmd = "squeue"
+        self.sbatch_cmd = "/usr/bin/sbatch"
+        self.scancel_cmd = "scancel"
+
+        # Pause before every submission (spaces out sbatch calls)
+        self.submit_delay = 1.5
+        self.queue_snapshot = None
+
         self.error_file = "job.err"
         self.out_file = "job.out"
 
@@ -395,7 +537,7 @@ class EdisonCluster(ComputerCluster):
             **kwargs:
         """
         #| - submit_job
-        time.sleep(1.5)
+        time.sleep(self.submit_delay)
 
         #| - Merging Submission Parameters
         params = merge_two_dicts(self.default_sub_params, kwargs)
@@ -437,7 +579,7 @@ class EdisonCluster(ComputerCluster):
         #__|
 
         #| - Bash Submisssion Command
-        bash_command = "/usr/bin/sbatch "
+        bash_command = self.sbatch_cmd + " "
 
 
         # The -q flag is being used in place of the -p flag
@@ -482,6 +624,8 @@ class EdisonCluster(ComputerCluster):
             # job_id = int(out_list[-1])
             out, err = output.communicate()
             out_copy = copy.deepcopy(out)
+            if isinstance(out, bytes):
+                out = out.decode("utf-8")
             out = out.strip()
             out_list = out.split(" ")
             job_id = int(out_list[-1])
@@ -546,6 +690,80 @@ class EdisonCluster(ComputerCluster):
         # return(out, jobid)
         #__|
 
+    def submit_job_array_clust(self,
+        params_list,
+        array_dir,
+        max_array_size=1000,
+        ):
+        """Submit jobs as SLURM job arrays (grouped by submission params).
+
+        Args:
+            params_list:
+            array_dir:
+            max_array_size:
+        """
+        #| - submit_job_array_clust
+
+        #| - Preparing Job Folders
+        params_list_new = []
+        for params in params_list:
+            params = merge_two_dicts(self.default_sub_params, params)
+
+            # Fixing debug flag specification
+            if params["priority"] == "debug":
+                params["queue"] = "debug"
+
+            if params["queue"] == "debug":
+                params["priority"] = "debug"
+
+            path_i = params["path_i"]
+            if params["job_name"] == "Default":
+                params["job_name"] = path_i
+
+            make_executable(path_i)
+
+            exitcode_line = "exitcode = os.system('srun -n " + \
+                str(int(self.cores_per_node * int(params["nodes"]))) + \
+                " /project/projectdirs/m2997/special_edison')"
+
+            with open(os.path.join(path_i, "run_vasp.py"), "w") as fle:
+                fle.write("import os\n")
+                fle.write(exitcode_line + "\n")
+
+            params_list_new.append(params)
+        #__|
+
+        def sbatch_args(params, name):
+            #| - sbatch_args
+            # The -q flag is being used in place of the -p flag
+            args = [
+                "-q", str(params["queue"]),
+                "--nodes", str(params["nodes"]),
+                "--time", str(params["wall_time"]),
+                "--job-name", name,
+                "--output", os.path.join(array_dir, name + "_%a.out"),
+                "--error", os.path.join(array_dir, name + "_%a.err"),
+                "-C", "haswell",
+                ]
+
+            return(args)
+            #__|
+
+        array_list = submit_job_arrays(
+            params_list_new,
+            self.sbatch_cmd,
+            sbatch_args,
+            array_dir,
+            max_array_size=max_array_size,
+            env_vars={
+                "TMPDIR": "$JOB_DIR",
+                "VASP_SCRIPT": "./run_vasp.py",
+                },
+            )
+
+        return(array_list)
+        #__|
+
     def job_state_dict(self):
         """
         """
@@ -587,6 +805,8 @@ class EdisonCluster(ComputerCluster):
             path_i=path_i,
             queue_state_key=self.job_queue_state_key,
             job_state_dict=self.job_state_keys,
+            snapshot=self.queue_snapshot,
+            squeue_cmd=self.squeue_cmd,
             )
 
         return(data_dict)
@@ -672,6 +892,23 @@ class EdisonCluster(ComputerCluster):
 
         #__|
 
+    def queue_snapshot_batch(self, path_list):
+        """Poll squeue once for all jobs in path_list and store the snapshot.
+
+        Args:
+            path_list:
+        """
+        #| - queue_snapshot_batch
+        job_id_list = [read_job_id(path_i=path_i) for path_i in path_list]
+
+        self.queue_snapshot = slurm_squeue_batch(
+            job_id_list,
+            squeue_cmd=self.squeue_cmd,
+            )
+
+        return(self.queue_snapshot)
+        #__|
+
     def completed_file(self, path_i="."):
         """Check whether ".FINISHED" file exists.
 
@@ -762,6 +999,11 @@ class SLACCluster(ComputerCluster):
 
         self.job_state_keys = self.job_state_dict()
         self.job_queue_state_key = "STAT"
+
+        self.bjobs_cmd = "/usr/local/bin/bjobs"
+        self.bsub_cmd = "/afs/slac/g/suncat/bin/dobsub"
+        self.bkill_cmd = "bkill"
+        self.queue_snapshot = None
         #__|
 
     def job_state_dict(self):
@@ -850,7 +1092,7 @@ class SLACCluster(ComputerCluster):
 
         # bash_command = "/u/if/flores12/bin/qv model.py"
 
-        bash_command = "/afs/slac/g/suncat/bin/dobsub "
+        bash_command = self.bsub_cmd + " "
         bash_command += "-q " + str(params["queue"]) + " "
         bash_command += "-n " + str(params["cpus"]) + " "
         bash_command += "-W " + str(params["wall_time"]) + " "
@@ -873,6 +1115,7 @@ class SLACCluster(ComputerCluster):
                     bash_command,
                     stdout=subprocess.PIPE,
                     shell=True,
+                    universal_newlines=True,
                     )
                 sub_time = datetime.datetime.now().isoformat()
 
@@ -985,11 +1228,26 @@ class SLACCluster(ComputerCluster):
             return(None)
         #__|
 
-        bash_comm = "/usr/local/bin/bjobs -w" + " " + job_id
+        #| - Looking Up Job in Queue Snapshot
+        if self.queue_snapshot is not None:
+            data_dict = self.queue_snapshot.get(job_id, None)
+
+            if data_dict is not None:
+                key = self.job_queue_state_key
+                job_state = self.job_state_keys.get(data_dict[key], None)
+
+                if job_state is not None:
+                    write_queue_state_file(path_i, job_state)
+
+            return(data_dict)
+        #__|
+
+        bash_comm = self.bjobs_cmd + " -w" + " " + job_id
         out = subprocess.check_output(
             bash_comm,
             shell=True,
             stderr=subprocess.STDOUT,
+            universal_newlines=True,
             )
 
         #| - Checking if Job Id Still in Batch System
@@ -1020,8 +1278,12 @@ class SLACCluster(ComputerCluster):
         #__|
 
         #| - bjob Command to Get Job Path From Job ID
-        bash_comm_2 = "/usr/local/bin/bjobs -o" + " 'exec_cwd' " + job_id
-        out2 = subprocess.check_output(bash_comm_2, shell=True)
+        bash_comm_2 = self.bjobs_cmd + " -o" + " 'exec_cwd' " + job_id
+        out2 = subprocess.check_output(
+            bash_comm_2,
+            shell=True,
+            universal_newlines=True,
+            )
         out2 = out2.split()
         data_dict["EXEC_CWD"] = out2[1]
         #__|
@@ -1038,6 +1300,23 @@ class SLACCluster(ComputerCluster):
         return(data_dict)
         #__|
 
+    def queue_snapshot_batch(self, path_list):
+        """Poll bjobs once for all jobs in path_list and store the snapshot.
+
+        Args:
+            path_list:
+        """
+        #| - queue_snapshot_batch
+        job_id_list = [read_job_id(path_i=path_i) for path_i in path_list]
+
+        self.queue_snapshot = lsf_bjobs_batch(
+            job_id_list,
+            bjobs_cmd=self.bjobs_cmd,
+            )
+
+        return(self.queue_snapshot)
+        #__|
+
     def job_state(self, path_i="."):
         """Query job state.
 
@@ -1090,6 +1369,13 @@ class SherlockCluster(ComputerCluster):
         self.job_state_keys = self.job_state_dict()
         self.job_queue_state_key = "STAT"
 
+        self.squeue_cmd = "squeue"
+        self.sbatch_cmd = "/usr/bin/sbatch"
+        self.scancel_cmd = "scancel"
+
+        # Pause before every submission (spaces out sbatch calls)
+        self.submit_delay = 1.5
+        self.queue_snapshot = None
 
         self.error_file = "job.err"
         self.out_file = "job.out"
@@ -1155,7 +1441,7 @@ class SherlockCluster(ComputerCluster):
             **kwargs:
         """
         #| - submit_job
-        time.sleep(1.5)
+        time.sleep(self.submit_delay)
 
         #| - Merging Submission Parameters
         params = merge_two_dicts(self.default_sub_params, kwargs)
@@ -1175,7 +1461,7 @@ class SherlockCluster(ComputerCluster):
         #__| **** TEMP
 
         #| - Bash Submisssion Command
-        bash_command = "/usr/bin/sbatch "
+        bash_command = self.sbatch_cmd + " "
 
         bash_command += "-p " +                 str(params["queue"])       + " "
         bash_command += "--nodes " +            str(params["nodes"])       + " "
@@ -1274,6 +1560,62 @@ class SherlockCluster(ComputerCluster):
 
         #__|
 
+    def submit_job_array_clust(self,
+        params_list,
+        array_dir,
+        max_array_size=1000,
+        ):
+        """Submit jobs as SLURM job arrays (grouped by submission params).
+
+        Args:
+            params_list:
+            array_dir:
+            max_array_size:
+        """
+        #| - submit_job_array_clust
+        params_list_new = []
+        for params in params_list:
+            params = merge_two_dicts(self.default_sub_params, params)
+
+            path_i = params["path_i"]
+            if params["job_name"] == "Default":
+                params["job_name"] = path_i
+
+            make_executable(path_i)
+
+            params_list_new.append(params)
+
+        def sbatch_args(params, name):
+            #| - sbatch_args
+            args = [
+                "-p", str(params["queue"]),
+                "--nodes", str(params["nodes"]),
+                "--ntasks-per-node", str(params["cpus"]),
+                "--mem-per-cpu", str(params["memory"]),
+                "--time", str(params["wall_time"]),
+                "--job-name", name,
+                "--qos", str(params["priority"]),
+                "--mail-user", str(params["email"]),
+                "--mail-type", str(params["email_mess"]),
+                "--output", os.path.join(array_dir, name + "_%a.out"),
+                "--error", os.path.join(array_dir, name + "_%a.err"),
+                "-C", "CPU_GEN:HSW",
+                ]
+
+            return(args)
+            #__|
+
+        array_list = submit_job_arrays(
+            params_list_new,
+            self.sbatch_cmd,
+            sbatch_args,
+            array_dir,
+            max_array_size=max_array_size,
+            )
+
+        return(array_list)
+        #__|
+
     def job_state_dict(self):
         """
         """
@@ -1333,6 +1675,8 @@ class SherlockCluster(ComputerCluster):
             path_i=path_i,
             queue_state_key=self.job_queue_state_key,
             job_state_dict=self.job_state_keys,
+            snapshot=self.queue_snapshot,
+            squeue_cmd=self.squeue_cmd,
             )
 
         return(data_dict)
@@ -1378,6 +1722,23 @@ class SherlockCluster(ComputerCluster):
 
         #__|
 
+    def queue_snapshot_batch(self, path_list):
+        """Poll squeue once for all jobs in path_list and store the snapshot.
+
+        Args:
+            path_list:
+        """
+        #| - queue_snapshot_batch
+        job_id_list = [read_job_id(path_i=path_i) for path_i in path_list]
+
+        self.queue_snapshot = slurm_squeue_batch(
+            job_id_list,
+            squeue_cmd=self.squeue_cmd,
+            )
+
+        return(self.queue_snapshot)
+        #__|
+
     def completed_file(self, path_i="."):
         """
         Check whether ".FINISHED" file exists.
@@ -1461,11 +1822,16 @@ class AWSCluster(ComputerCluster):
         self.default_sub_params = self.default_submission_parameters()
         self.aws_dir = os.environ["aws_sc"]
         self.job_queue_dir = self.aws_dir + "/jobs_bin"
+        self.trisub_cmd = self.aws_dir + "/bin/trisub"
         self.job_state_keys = self.job_state_dict()
         self.queues = self.__queue_types__()
         self.job_queue_state_key = "job_status"
         self.error_file = "err"
         self.out_file = "out"
+
+        self.queue_snapshot = None
+        self.code_bundle_store = None
+        self.registry = None
         #__|
 
     def default_submission_parameters(self):
@@ -1482,6 +1848,11 @@ class AWSCluster(ComputerCluster):
 
             "copy_PythonModules": True,
             "copy_PythonPackages": True,
+
+            # Symlink shared snapshots of PythonModules/PythonPackages instead
+            # of copying them (see dft_job_automat/code_bundle.py)
+            "code_bundle": False,
+            "code_bundle_dir": None,
             }
 
         return(def_params)
@@ -1505,6 +1876,7 @@ class AWSCluster(ComputerCluster):
         copy_PythonPackages = params["copy_PythonPackages"]
         cpus = params["cpus"]
         queue = params["queue"]
+        code_bundle = params.get("code_bundle", False)
         #__|
 
         root_dir = os.getcwd()
@@ -1521,11 +1893,19 @@ class AWSCluster(ComputerCluster):
             os.chdir(root_dir)
         #__|
 
-        self.__copy_pyth_mods_packs_to_job_dir__(
-            path,
-            copy_mods=copy_PythonModules,
-            copy_packs=copy_PythonPackages,
-            )
+        if code_bundle:
+            self.__link_code_bundles_to_job_dir__(
+                path,
+                link_mods=copy_PythonModules,
+                link_packs=copy_PythonPackages,
+                store_dir=params.get("code_bundle_dir", None),
+                )
+        else:
+            self.__copy_pyth_mods_packs_to_job_dir__(
+                path,
+                copy_mods=copy_PythonModules,
+                copy_packs=copy_PythonPackages,
+                )
 
         #| - Submit Job
         # Args: path, root_dir, queue, cpus
@@ -1541,14 +1921,18 @@ class AWSCluster(ComputerCluster):
             aws_dir = os.environ["aws_sc"]
 
             if cpus == "default":
-                bash_command = aws_dir + "/bin/trisub -q " + queue
+                bash_command = self.trisub_cmd + " -q " + queue
                 # bash_command = aws_dir + "/matr.io/bin/trisub -q " + queue
             else:
-                bash_command = aws_dir + "/bin/trisub -c " + str(cpus) + \
+                bash_command = self.trisub_cmd + " -c " + str(cpus) + \
                     " -q " + queue
 
             try:
-                output = subprocess.check_output(bash_command, shell=True)
+                output = subprocess.check_output(
+                    bash_command,
+                    shell=True,
+                    universal_newlines=True,
+                    )
                 sub_time = datetime.datetime.now().isoformat()
             # except subprocess.CalledProcessError, e:
             except subprocess.CalledProcessError as e:
@@ -1581,18 +1965,15 @@ class AWSCluster(ComputerCluster):
 
         #| - Querying AWS For Job Info
         job_queue_dict = self.job_info_batch(jobId)
+        if not isinstance(job_queue_dict, dict):
+            # "job not in batch system", not visible in AWS Batch yet
+            print(job_queue_dict)
+            job_queue_dict = {"job_id": jobId, "job_path": path}
         job_queue_dict["submit_time"] = sub_time
 
-        jobs_file_path = self.job_queue_dir + "/jobs.csv"
-
-        df_new = pd.DataFrame([job_queue_dict])
-        if os.path.isfile(jobs_file_path):
-            df = pd.read_csv(jobs_file_path)
-            df = df.append(df_new)
-        else:
-            df = df_new
-
-        df.to_csv(jobs_file_path, index=False)
+        # Single row insert, jobs.csv is no longer rewritten on every submit
+        # (JobRegistry.export_csv writes it on demand)
+        self.job_registry().add_job(job_queue_dict)
         #__|
 
         return job_queue_dict
@@ -1673,6 +2054,53 @@ class AWSCluster(ComputerCluster):
 
         #__|
 
+    def __link_code_bundles_to_job_dir__(
+        self,
+        path_i,
+        link_mods=True,
+        link_packs=True,
+        store_dir=None,
+        ):
+        """Symlink shared PythonModules/PythonPackages bundles into job dir.
+
+        The bundles are snapshots keyed by the hash of the code trees, they are
+        created once and reused as long as the code doesn't change.
+
+        Args:
+            path_i:
+            link_mods:
+            link_packs:
+            store_dir:
+                Shared bundle folder, defaults to $CODE_BUNDLE_DIR or
+                $aws_sc/code_bundles
+        """
+        #| - __link_code_bundles_to_job_dir__
+        if store_dir is None:
+            store_dir = os.environ.get(
+                "CODE_BUNDLE_DIR",
+                os.path.join(self.aws_dir, "code_bundles"),
+                )
+
+        store = self.code_bundle_store
+        if store is None or store.store_dir != store_dir:
+            store = CodeBundleStore(store_dir)
+            self.code_bundle_store = store
+
+        if link_mods:
+            store.link_bundle(
+                os.environ["PYTHONMODULES"],
+                "PythonModules",
+                path_i,
+                )
+
+        if link_packs:
+            store.link_bundle(
+                os.environ["PYTHONPACKAGES"],
+                "PythonPackages",
+                path_i,
+                )
+        #__|
+
     def get_jobid(self, path_i="."):
         """
         """
@@ -1757,44 +2185,98 @@ class AWSCluster(ComputerCluster):
         #__|
 
     def job_info_batch(self, job_id):
-        """
+        """Return job queue dict of job_id from AWS Batch.
+
+        Served from the queue snapshot if one was taken with
+        queue_snapshot_batch.
+
+        Args:
+            job_id:
         """
         #| - job_info_batch
-        import boto3
-        batch = boto3.client("batch")
-        job_descriptions = batch.describe_jobs(jobs=[job_id])
+        if self.queue_snapshot is not None:
+            job_queue_dicts = self.queue_snapshot
+        else:
+            job_queue_dicts = job_queue_dicts_bulk([job_id])
 
         #| - Checking if Job is in AWS Batch
-        if len(job_descriptions["jobs"]) == 0:
+        if job_id not in job_queue_dicts:
             return("job not in batch system")
         else:
-            job_info = job_descriptions["jobs"][0]
-        #__|
-
-        job_status = job_info["status"]
-        job_path = job_info["parameters"]["model"]
-        job_ram = job_info["parameters"]["ram"]
-        job_cpus = job_info["parameters"]["cpus"]
-        job_name = job_info["jobName"]
-
-        job_queue_str = job_info["jobQueue"]
-        if "small" in job_queue_str:
-            job_queue = "small"
-        elif "medium" in job_queue_str:
-            job_queue = "medium"
-        elif "large" in job_queue_str:
-            job_queue = "large"
-        elif "test" in job_queue_str:
-            job_queue = "test"
-
-        job_queue_dict = {"job_status": job_status, "job_path": job_path,
-                          "job_id": job_id, "job_ram": job_ram,
-                          "job_queue": job_queue, "job_cpus": job_cpus,
-                          "job_name": job_name}
+            job_queue_dict = job_queue_dicts[job_id]
+        #__|
 
         return(job_queue_dict)
         #__|
 
+    def queue_snapshot_batch(self, path_list, max_workers=8):
+        """Query AWS Batch for all jobs in path_list and store the snapshot.
+
+        describe_jobs is called with up to 100 job ids at a time using the
+        shared batch client, calls are overlapped with a thread pool.
+
+        Args:
+            path_list:
+            max_workers:
+        """
+        #| - queue_snapshot_batch
+        job_id_list = [read_job_id(path_i=path_i) for path_i in path_list]
+
+        self.queue_snapshot = job_queue_dicts_bulk(
+            job_id_list,
+            max_workers=max_workers,
+            )
+
+        return(self.queue_snapshot)
+        #__|
+
+    def job_registry(self):
+        """Return JobRegistry of the job queue dir (jobs_bin/jobs.sqlite).
+
+        The jobs.csv file of the job queue dir is imported the first time.
+        """
+        #| - job_registry
+        if self.registry is None:
+            self.registry = JobRegistry(
+                os.path.join(self.job_queue_dir, JobRegistry.db_fle),
+                )
+
+        return(self.registry)
+        #__|
+
+    def update_job_registry(self, job_id_list=None, max_workers=8):
+        """Refresh job_status of registry jobs from AWS Batch.
+
+        Jobs already in a final state (SUCCEEDED, FAILED) aren't queried.
+        All statuses are updated in one transaction.
+
+        Args:
+            job_id_list:
+                Jobs to refresh, defaults to all unfinished registry jobs
+            max_workers:
+        """
+        #| - update_job_registry
+        registry = self.job_registry()
+
+        if job_id_list is None:
+            df = registry.to_dataframe()
+            df = df[~df["job_status"].isin(["SUCCEEDED", "FAILED"])]
+            job_id_list = df["job_id"].tolist()
+
+        job_queue_dicts = job_queue_dicts_bulk(
+            job_id_list,
+            max_workers=max_workers,
+            )
+
+        status_dict = dict([
+            (job_id, job_dict["job_status"])
+            for job_id, job_dict in job_queue_dicts.items()
+            ])
+        registry.update_status(status_dict)
+
+        return(status_dict)
+        #__|
+
     #__| **********************************************************************
 
 
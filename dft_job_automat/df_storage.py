@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Columnar storage of the job dataframe.
+
+Author: Raul A. Flores
+
+Every column of the dataframe is written to its own file so that a subset of
+the columns can be loaded without deserializing the rest (atoms objects,
+pdos arrays, Job instances, etc.). Rows can be appended as new "chunks"
+without rewriting the existing files.
+
+Column files are keyed on the position of the column in the manifest, not on
+its name, duplicate column names (ex. the "NA" columns added by
+add_data_column for failed rows) are stored as separate columns.
+
+    <store_dir>/manifest.json
+    <store_dir>/index.<chunk>.pickle
+    <store_dir>/c<col_num>.<chunk>.<ext>
+
+Column formats:
+    parquet | Non-object columns, if pyarrow is installed
+    npy     | Numeric/datetime columns, if pyarrow isn't available
+    pickle  | Object columns (atoms objects, arrays, dicts, Job instances...)
+"""
+
+#| - Import Modules
+import os
+import sys
+import json
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+#__|
+
+class ColumnarStore():
+    """Dataframe stored as one file per column (and per appended chunk)."""
+
+    #| - ColumnarStore ********************************************************
+
+    #| - Class Variables
+    manifest_fle = "manifest.json"
+    #__|
+
+    def __init__(self, store_dir):
+        """Initialize ColumnarStore instance.
+
+        Args:
+            store_dir:
+                Folder containing the manifest and column files
+        """
+        #| - __init__
+        self.store_dir = store_dir
+        self.manifest = self.__load_manifest__()
+        #__|
+
+    #| - Manifest *************************************************************
+    def __manifest_path__(self):
+        """Return path of manifest file."""
+        #| - __manifest_path__
+        return(os.path.join(self.store_dir, ColumnarStore.manifest_fle))
+        #__|
+
+    def __load_manifest__(self):
+        """Load manifest, an empty manifest is returned if there is none."""
+        #| - __load_manifest__
+        manifest_path = self.__manifest_path__()
+
+        if os.path.isfile(manifest_path):
+            with open(manifest_path, "r") as fle:
+                manifest = json.load(fle)
+        else:
+            manifest = {"columns": [], "chunks": []}
+
+        return(manifest)
+        #__|
+
+    def __save_manifest__(self):
+        """Write manifest (atomically, after all column files)."""
+        #| - __save_manifest__
+        manifest_path = self.__manifest_path__()
+        tmp_file = manifest_path + ".tmp"
+
+        with open(tmp_file, "w") as fle:
+            json.dump(self.manifest, fle, indent=1)
+        os.rename(tmp_file, manifest_path)
+        #__|
+
+    def exists(self):
+        """Return True if the store contains data."""
+        #| - exists
+        return(os.path.isfile(self.__manifest_path__()))
+        #__|
+
+    def columns(self):
+        """Return list of column names in the store."""
+        #| - columns
+        return([i["name"] for i in self.manifest["columns"]])
+        #__|
+
+    def num_rows(self):
+        """Return total number of rows in the store."""
+        #| - num_rows
+        return(sum([i["num_rows"] for i in self.manifest["chunks"]]))
+        #__|
+
+    def __column_key__(self, column_name, occurrence=0):
+        """Return file key of column, new columns are added to manifest.
+
+        Args:
+            column_name:
+            occurrence:
+                Number of columns with the same name before this one in the
+                dataframe (duplicate column names)
+        """
+        #| - __column_key__
+        # Column names are stored as is if json can handle them
+        if isinstance(column_name, (str, int, float)):
+            name = column_name
+        else:
+            name = str(column_name)
+
+        same_name = [i for i in self.manifest["columns"] if i["name"] == name]
+        if occurrence < len(same_name):
+            return(same_name[occurrence]["key"])
+
+        key = "c" + str(len(self.manifest["columns"]))
+
+        self.manifest["columns"].append({"name": name, "key": key})
+
+        return(key)
+        #__|
+    #__| **********************************************************************
+
+    #| - Column I/O ***********************************************************
+    def __write_column__(self, series, file_stem):
+        """Write column to file, return file name.
+
+        Args:
+            series:
+            file_stem:
+        """
+        #| - __write_column__
+        file_stem = os.path.join(self.store_dir, file_stem)
+
+        fle_name = None
+        if series.dtype == object:
+            pass
+        elif PARQUET_AVAILABLE:
+            fle_name = file_stem + ".parquet"
+        elif series.dtype.kind in "biufcmM":
+            fle_name = file_stem + ".npy"
+
+        if fle_name is not None:
+            try:
+                if fle_name.endswith(".parquet"):
+                    pd.DataFrame({"value": series.values}).to_parquet(
+                        fle_name,
+                        index=False,
+                        )
+                else:
+                    np.save(fle_name, np.asarray(series.values),
+                        allow_pickle=False)
+
+                return(os.path.basename(fle_name))
+
+            # Extension dtypes, etc. are pickled
+            except (ValueError, TypeError):
+                if os.path.isfile(fle_name):
+                    os.remove(fle_name)
+
+        fle_name = file_stem + ".pickle"
+        with open(fle_name, "wb") as fle:
+            pickle.dump(list(series.values), fle, protocol=2)
+
+        return(os.path.basename(fle_name))
+        #__|
+
+    def __read_column__(self, fle_name):
+        """Read column file, return list/array of values.
+
+        Args:
+            fle_name:
+        """
+        #| - __read_column__
+        file_path = os.path.join(self.store_dir, fle_name)
+
+        if fle_name.endswith(".parquet"):
+            values = pd.read_parquet(file_path)["value"].values
+
+        elif fle_name.endswith(".npy"):
+            values = np.load(file_path, allow_pickle=False)
+
+        else:
+            values = self.__read_pickle__(file_path)
+
+        return(values)
+        #__|
+
+    def __read_pickle__(self, file_path):
+        """Read pickle file."""
+        #| - __read_pickle__
+        with open(file_path, "rb") as fle:
+            if sys.version_info.major > 2:
+                obj = pickle.load(fle, encoding="latin1")
+            else:
+                obj = pickle.load(fle)
+
+        return(obj)
+        #__|
+    #__| **********************************************************************
+
+    def write(self, df):
+        """Write dataframe, replacing the current contents of the store.
+
+        Args:
+            df:
+        """
+        #| - write
+        if os.path.isdir(self.store_dir):
+            shutil.rmtree(self.store_dir)
+
+        self.manifest = {"columns": [], "chunks": []}
+
+        self.append(df)
+        #__|
+
+    def append(self, df):
+        """Append rows of df as a new chunk (existing files are untouched).
+
+        df may contain columns not yet in the store, they are NaN for the
+        previously stored rows.
+
+        Args:
+            df:
+        """
+        #| - append
+        if not os.path.exists(self.store_dir):
+            os.makedirs(self.store_dir)
+
+        chunk_num = len(self.manifest["chunks"])
+
+        index_fle = "index." + str(chunk_num) + ".pickle"
+        with open(os.path.join(self.store_dir, index_fle), "wb") as fle:
+            pickle.dump(df.index, fle, protocol=2)
+
+        # Columns are taken by position, df[name] is a DataFrame for
+        # duplicate names
+        files = {}
+        occurrences = {}
+        for col_ind, column_name in enumerate(df.columns):
+            occurrence = occurrences.get(column_name, 0)
+            occurrences[column_name] = occurrence + 1
+
+            key = self.__column_key__(column_name, occurrence=occurrence)
+
+            file_stem = key + "." + str(chunk_num)
+            files[key] = self.__write_column__(df.iloc[:, col_ind], file_stem)
+
+        self.manifest["chunks"].append({
+            "num_rows": len(df),
+            "index": index_fle,
+            "files": files,
+            })
+
+        self.__save_manifest__()
+        #__|
+
+    def load(self, columns=None):
+        """Load dataframe, only reading the files of the requested columns.
+
+        Args:
+            columns:
+                List of column names to load, all columns by default. Columns
+                not in the store are ignored.
+        """
+        #| - load
+        column_list = self.manifest["columns"]
+        if columns is not None:
+            column_list = [i for i in column_list if i["name"] in columns]
+
+        df_list = []
+        for chunk_i in self.manifest["chunks"]:
+            index = self.__read_pickle__(
+                os.path.join(self.store_dir, chunk_i["index"])
+                )
+
+            data = {}
+            for col_i in column_list:
+                fle_name = chunk_i["files"].get(col_i["key"], None)
+
+                if fle_name is None:
+                    values = [np.nan] * chunk_i["num_rows"]
+                else:
+                    values = self.__read_column__(fle_name)
+
+                data[col_i["key"]] = pd.Series(
+                    values,
+                    index=index,
+                    dtype=None if len(values) > 0 else object,
+                    )
+
+            # Columns are labeled by key (unique) until the chunks are joined
+            df_i = pd.DataFrame(
+                data,
+                index=index,
+                columns=[i["key"] for i in column_list],
+                )
+            df_list.append(df_i)
+
+        if len(df_list) == 0:
+            df = pd.DataFrame(columns=[i["key"] for i in column_list])
+        elif len(df_list) == 1:
+            df = df_list[0]
+        else:
+            df = pd.concat(df_list, axis=0, sort=False)
+
+        df.columns = [i["name"] for i in column_list]
+
+        return(df)
+        #__|
+
+    #__| **********************************************************************
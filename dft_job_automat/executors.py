@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Run a function over many job folders serially or with an executor pool.
+
+Author: Raul A. Flores
+
+Used by DFT_Jobs_Analysis.add_data_column to parse job folders in parallel.
+The job parsers are mostly I/O bound and independent of each other, so a
+thread pool is usually enough, a process pool can be used for CPU heavy
+parsers (the function must be picklable in that case).
+
+Results are always returned in the order of the input list.
+"""
+
+#| - Import Modules
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+#__|
+
+#| - Methods
+
+def timed_call(function, arg, allow_failure=True):
+    """Call function(arg) and return the output and the wall time.
+
+    Args:
+        function:
+        arg:
+        allow_failure:
+            If True, a failed call returns NaN instead of raising
+    """
+    #| - timed_call
+    t_start = time.time()
+
+    if allow_failure is True:
+        try:
+            out = function(arg)
+        except:
+            out = np.nan
+    else:
+        out = function(arg)
+
+    t_elapsed = time.time() - t_start
+
+    return(out, t_elapsed)
+    #__|
+
+def get_executor(executor="serial", max_workers=None):
+    """Return executor instance and whether the caller must shut it down.
+
+    Args:
+        executor: <type 'str' or concurrent.futures.Executor>
+            "serial"  | No executor, None is returned
+            "thread"  | New ThreadPoolExecutor
+            "process" | New ProcessPoolExecutor
+            Executor instance | Used as is, not shut down after use
+        max_workers:
+            Max number of workers of new pools
+    """
+    #| - get_executor
+    if executor is None or executor == "serial":
+        return(None, False)
+
+    elif isinstance(executor, Executor):
+        return(executor, False)
+
+    elif executor == "thread":
+        if max_workers is None:
+            max_workers = 8
+        return(ThreadPoolExecutor(max_workers=max_workers), True)
+
+    elif executor == "process":
+        return(ProcessPoolExecutor(max_workers=max_workers), True)
+
+    else:
+        raise ValueError(
+            "executor must be 'serial', 'thread', 'process' or an Executor"
+            " instance, not " + str(executor)
+            )
+    #__|
+
+def map_timed(
+    function,
+    arg_list,
+    executor="serial",
+    max_workers=None,
+    allow_failure=True,
+    ):
+    """Apply function to every entry of arg_list.
+
+    Returns the list of outputs and the list of wall times (seconds), both in
+    the order of arg_list.
+
+    Args:
+        function:
+        arg_list:
+        executor:
+            See get_executor
+        max_workers:
+        allow_failure:
+            If True, failed calls result in NaN, otherwise the first exception
+            (in arg_list order) is raised
+    """
+    #| - map_timed
+    arg_list = list(arg_list)
+
+    executor_inst, shutdown = get_executor(
+        executor=executor,
+        max_workers=max_workers,
+        )
+
+    if executor_inst is None:
+        results = [timed_call(function, arg, allow_failure) for arg in arg_list]
+
+    else:
+        try:
+            futures = [
+                executor_inst.submit(timed_call, function, arg, allow_failure)
+                for arg in arg_list
+                ]
+            results = [fut.result() for fut in futures]
+        finally:
+            if shutdown:
+                executor_inst.shutdown(wait=True)
+
+    out_list = [i[0] for i in results]
+    time_list = [i[1] for i in results]
+
+    return(out_list, time_list)
+    #__|
+
+#__|
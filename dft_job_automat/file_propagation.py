@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Plan and execute the file copies from one workflow step to the next.
+
+Author: Raul A. Flores
+
+A job of step n passes its files to the jobs of step n+1 whose values of the
+shared tree level properties match its own (see copyfiles_onestep_up). The
+next step's jobs are indexed once by those values and their latest revision
+folder is resolved once, so building the plan for a job is a dictionary
+lookup.
+
+The plan is a list of copy entries:
+
+    {"source": ..., "dest": ..., "status": ...}
+
+    status:
+        "copy"          | Destination missing (or outdated with update=True)
+        "exists"        | Destination exists, not copied
+        "up_to_date"    | Same size and mtime as the source, not copied
+        "missing_source"| Source file doesn't exist
+
+execute adds the statuses "copied" and "error" (failed copy).
+"""
+
+#| - Import Modules
+import os
+import shutil
+
+from dft_job_automat.executors import map_timed
+#__|
+
+#| - Methods
+
+def file_up_to_date(source, dest):
+    """Return True if dest has the same size and mtime as source.
+
+    shutil.copy2 preserves the mtime, so a copied file stays up to date until
+    either side changes.
+
+    Args:
+        source:
+        dest:
+    """
+    #| - file_up_to_date
+    try:
+        stat_s = os.stat(source)
+        stat_d = os.stat(dest)
+    except OSError:
+        return(False)
+
+    same_size = stat_s.st_size == stat_d.st_size
+    same_mtime = abs(stat_s.st_mtime - stat_d.st_mtime) < 1e-3
+
+    return(same_size and same_mtime)
+    #__|
+
+def copy_entry(entry):
+    """Copy single plan entry, returns entry with updated status.
+
+    Args:
+        entry:
+    """
+    #| - copy_entry
+    entry = dict(entry)
+    if entry["status"] != "copy":
+        return(entry)
+
+    try:
+        shutil.copy2(entry["source"], entry["dest"])
+        entry["status"] = "copied"
+    except (IOError, OSError) as e:
+        entry["status"] = "error"
+        entry["error"] = repr(e)
+
+    return(entry)
+    #__|
+
+def file_pair(file_i):
+    """Return (source name, destination name) of files_lst entry.
+
+    Args:
+        file_i:
+            "file" or ["source_file", "dest_file"]
+    """
+    #| - file_pair
+    if type(file_i) == str:
+        return(file_i, file_i)
+    else:
+        return(file_i[0], file_i[1])
+    #__|
+
+#__|
+
+
+class PropagationPlanner():
+    """Copy plan between the jobs of two consecutive workflow steps."""
+
+    #| - PropagationPlanner ***************************************************
+    def __init__(self, curr_step, next_step):
+        """Initialize PropagationPlanner instance.
+
+        Args:
+            curr_step:
+                Jobs instance (DFT_Jobs_Setup or subclass) of step n
+            next_step:
+                Jobs instance of step n+1
+        """
+        #| - __init__
+        self.curr_step = curr_step
+        self.next_step = next_step
+
+        self.shared_props = self.__shared_props__()
+        self.next_index = self.__index_next_step__()
+        #__|
+
+    def __shared_props__(self):
+        """Return tree level properties present in both steps."""
+        #| - __shared_props__
+        curr_labels = self.curr_step.tree_level_labels
+        next_labels = self.next_step.tree_level_labels
+
+        if curr_labels is None or next_labels is None:
+            return([])
+
+        shared_props = [i for i in curr_labels if i in next_labels]
+
+        return(shared_props)
+        #__|
+
+    def __job_key__(self, job_var_lst):
+        """Return values of the shared properties of job (None if missing).
+
+        Args:
+            job_var_lst:
+        """
+        #| - __job_key__
+        job_vars_dict = {}
+        for prop in job_var_lst:
+            job_vars_dict[prop["property"]] = prop["value"]
+
+        key = tuple([
+            job_vars_dict.get(prop, None) for prop in self.shared_props
+            ])
+
+        return(key)
+        #__|
+
+    def __index_next_step__(self):
+        """Map key of shared property values to next step job folders."""
+        #| - __index_next_step__
+        next_index = {}
+
+        next_var_lst = self.next_step.job_var_lst
+        if next_var_lst is None:
+            return(next_index)
+
+        for job in next_var_lst:
+            path_i = self.next_step.var_lst_to_path(
+                job,
+                job_rev="Auto",
+                relative_path=False,
+                )
+
+            key = self.__job_key__(job)
+            next_index.setdefault(key, []).append(path_i)
+
+        return(next_index)
+        #__|
+
+    def source_dir(self, job_var_lst):
+        """Return latest revision folder of job in current step.
+
+        Args:
+            job_var_lst:
+        """
+        #| - source_dir
+        dir_curr = self.curr_step.var_lst_to_path(
+            job_var_lst,
+            job_rev="Auto",
+            relative_path=False,
+            )
+
+        return(dir_curr)
+        #__|
+
+    def dest_dirs(self, job_var_lst):
+        """Return next step job folders matching job of current step.
+
+        Args:
+            job_var_lst:
+        """
+        #| - dest_dirs
+        key = self.__job_key__(job_var_lst)
+
+        return(self.next_index.get(key, []))
+        #__|
+
+    def plan(self,
+        job_var_lst,
+        files_lst=[],
+        root_dir_files=None,
+        update=False,
+        ):
+        """Return copy plan of single job of current step.
+
+        Args:
+            job_var_lst:
+                Job of current step
+            files_lst:
+                Files of the job's folder (job_data_dir of the cluster),
+                entries are "file" or ["source_file", "dest_file"]
+            root_dir_files:
+                Files of the current step's root_dir, same format
+            update:
+                If False, existing destination files are never overwritten.
+                If True, they are overwritten unless up to date (same size
+                and mtime as the source).
+        """
+        #| - plan
+        dir_curr = self.source_dir(job_var_lst)
+        data_dir = dir_curr + self.curr_step.cluster.cluster.job_data_dir
+        root_dir = self.curr_step.root_dir
+
+        sources = []
+        for file_i in files_lst:
+            source, dest = file_pair(file_i)
+            sources.append((data_dir + "/" + source, dest))
+
+        if root_dir_files is not None:
+            for file_i in root_dir_files:
+                source, dest = file_pair(file_i)
+                sources.append((root_dir + "/" + source, dest))
+
+        plan = []
+        for path_i in self.dest_dirs(job_var_lst):
+            for source, dest in sources:
+                dest_file = path_i + "/" + dest
+
+                if not os.path.isfile(source):
+                    status = "missing_source"
+                elif not os.path.isfile(dest_file):
+                    status = "copy"
+                elif file_up_to_date(source, dest_file):
+                    status = "up_to_date"
+                elif update:
+                    status = "copy"
+                else:
+                    status = "exists"
+
+                plan.append({
+                    "source": source,
+                    "dest": dest_file,
+                    "status": status,
+                    "source_job": dir_curr,
+                    })
+
+        return(plan)
+        #__|
+
+    def plan_all(self,
+        files_lst=[],
+        root_dir_files=None,
+        update=False,
+        job_var_lst_list=None,
+        ):
+        """Return copy plan of all (or the given) jobs of current step.
+
+        Args:
+            files_lst:
+            root_dir_files:
+            update:
+            job_var_lst_list:
+                Jobs of current step, defaults to all of them
+        """
+        #| - plan_all
+        if job_var_lst_list is None:
+            job_var_lst_list = self.curr_step.job_var_lst
+
+        plan = []
+        for job_var_lst in job_var_lst_list:
+            plan.extend(self.plan(
+                job_var_lst,
+                files_lst=files_lst,
+                root_dir_files=root_dir_files,
+                update=update,
+                ))
+
+        return(plan)
+        #__|
+
+    def report(self, plan):
+        """Return printable summary of plan (for dry runs).
+
+        Args:
+            plan:
+        """
+        #| - report
+        counts = {}
+        lines = []
+        for entry in plan:
+            status = entry["status"]
+            counts[status] = counts.get(status, 0) + 1
+            lines.append(
+                status.ljust(15) + entry["source"] + " -> " + entry["dest"]
+                )
+
+        summary = " | ".join([
+            key + ": " + str(counts[key]) for key in sorted(counts.keys())
+            ])
+        lines.append(str(len(plan)) + " files | " + summary)
+
+        return("\n".join(lines))
+        #__|
+
+    def failed_entries(self, plan):
+        """Return entries of plan with status "missing_source" or "error".
+
+        Args:
+            plan:
+        """
+        #| - failed_entries
+        failed = [
+            entry for entry in plan
+            if entry["status"] in ["missing_source", "error"]
+            ]
+
+        return(failed)
+        #__|
+
+    def execute(self, plan, executor="thread", max_workers=None):
+        """Copy the plan entries with status "copy", returns updated plan.
+
+        Copies are done with shutil.copy2 (keeps the mtime, see
+        file_up_to_date). Failed copies get status "error".
+
+        Args:
+            plan:
+            executor:
+                See executors.get_executor, copies are I/O bound so a thread
+                pool is the sensible choice
+            max_workers:
+        """
+        #| - execute
+        plan_out, time_list = map_timed(
+            copy_entry,
+            plan,
+            executor=executor,
+            max_workers=max_workers,
+            allow_failure=False,
+            )
+
+        return(plan_out)
+        #__|
+
+    #__| **********************************************************************
@@ -24,6 +24,12 @@ from ase.visualize import view
 
 # My Modules
 from dft_job_automat.job_setup import DFT_Jobs_Setup
+from dft_job_automat.executors import map_timed
+from dft_job_automat.analysis_cache import AnalysisCache
+from dft_job_automat.df_storage import ColumnarStore
+from dft_job_automat.marker_watcher import MarkerWatcher, MarkerTable
+
+from misc_modules.tail_parser import tail_lines
 #__|
 
 class DFT_Jobs_Analysis(DFT_Jobs_Setup):
@@ -39,6 +45,21 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
 
     #| - Class Variables
     finished_fle = ".FINISHED.new"
+
+    # Default executor used by add_data_column ("serial", "thread",
+    # "process" or concurrent.futures.Executor instance)
+    executor = "serial"
+    max_workers = None
+
+    # Number of slowest jobs reported after each new data column
+    num_slow_jobs_report = 3
+
+    # Reuse results stored in jobs_bin/analysis_cache for unchanged job dirs
+    use_cache = False
+
+    # "pickle" | jobs_bin/job_dataframe.pickle
+    # "columnar" | jobs_bin/job_dataframe/, one file per column
+    dataframe_storage = "pickle"
     #__|
 
     def __init__(self,
@@ -55,6 +76,13 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
         job_type_class=None,
         methods_to_run=None,
         folders_exist=None,
+        executor=None,
+        max_workers=None,
+        use_cache=None,
+        hash_cache=False,
+        dataframe_storage=None,
+        dataframe_columns=None,
+        lazy_jobs=False,
         ):
         """Initialize DFT_Jobs_Analysis Instance.
 
@@ -75,8 +103,48 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
             methods_to_run:
                 Additional methods to run on each job dir and return value to
                 populate data column with.
+            executor:
+                Default executor for add_data_column, see add_data_column
+            max_workers:
+                Number of workers used by the executor pool
+            use_cache:
+                If True, add_data_column only reruns methods on job folders
+                whose files changed since the last run (results are stored in
+                jobs_bin/analysis_cache)
+            hash_cache:
+                If True, the job folder fingerprints used by the cache include
+                a hash of the file contents (not only size and mtime)
+            dataframe_storage:
+                "pickle" or "columnar", format in which the dataframe is
+                written to and loaded from jobs_bin
+            dataframe_columns:
+                Only load these columns of a "columnar" dataframe (plus the
+                "path" and "revision_number" columns)
+            lazy_jobs:
+                Defer reading of the job parameter files, see DFT_Jobs_Setup
         """
         #| - __init__
+        if executor is not None:
+            self.executor = executor
+        if max_workers is not None:
+            self.max_workers = max_workers
+
+        if use_cache is not None:
+            self.use_cache = use_cache
+        self.hash_cache = hash_cache
+        self.analysis_cache = None
+
+        if dataframe_storage is not None:
+            self.dataframe_storage = dataframe_storage
+        self.dataframe_columns = dataframe_columns
+
+        self.column_timings = {}
+
+        # MarkerTable answering the marker file checks of the job state
+        # methods (see attach_marker_watcher)
+        self.marker_table = None
+        self.marker_watcher = None
+
         DFT_Jobs_Setup.__init__(self,
             tree_level=tree_level,
             level_entries=level_entries,
@@ -86,6 +154,7 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
             root_dir=root_dir,
             working_dir=working_dir,
             folders_exist=folders_exist,
+            lazy_jobs=lazy_jobs,
             )
 
         self.dataframe_dir = dataframe_dir
@@ -93,15 +162,25 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
         #| - General Methods
         if update_job_state is True:
             print("update_job_state == True")
-            self.add_data_column(
-                self.job_state,
-                column_name="job_state",
-                )
-            self.add_data_column(
-                self.job_state_3,
-                column_name="N/A",
-                allow_failure=False,
-                )
+
+            # Single scheduler call for all jobs, job_state and job_state_3
+            # are served from this snapshot
+            self.update_queue_snapshot()
+
+            try:
+                self.add_data_column(
+                    self.job_state,
+                    column_name="job_state",
+                    use_cache=False,
+                    )
+                self.add_data_column(
+                    self.job_state_3,
+                    column_name="N/A",
+                    allow_failure=False,
+                    use_cache=False,
+                    )
+            finally:
+                self.cluster.clear_queue_snapshot()
         #__|
 
         #| - Job Type Specific Methods
@@ -155,6 +234,13 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
 
         #__|
 
+    def refresh_job_list(self):
+        """Rebuild Job_list and data_frame, keeping the file data columns."""
+        #| - refresh_job_list
+        DFT_Jobs_Setup.refresh_job_list(self)
+        self.add_all_columns_from_file()
+        #__|
+
     #| - Job Log **************************************************************
 
     def add_jobs_queue_data(self):
@@ -165,33 +251,64 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
 
     def job_queue_info(self, path_i):
         """
-        Return row corresponding to job in path_i from the job queue dir.
+        Return row corresponding to job in path_i from the job registry.
 
-        # FIXME Set up the jobs.csv system to work
+        Indexed lookup in the cluster's JobRegistry (jobs_bin/jobs.sqlite),
+        the first job submitted from the path is returned. None if the
+        cluster has no registry or the path isn't in it.
 
         Args:
             path_i:
         """
         #| - job_queue_info
-        jobs_file_path = self.job_queue_dir + "/jobs.csv"
-        df = pd.read_csv(jobs_file_path)
+        registry = self.cluster.job_registry()
+        if registry is None:
+            return(None)
 
         path_i = path_i[len(self.root_dir):]
         full_path = self.root_dir_short + path_i
 
-        # Looking for job path in jobs.csv file
-        index = df[df["job_path"] == full_path].index.tolist()[0]
+        job_list = registry.jobs_by_path(full_path)
+        if len(job_list) == 0:
+            return(None)
 
-        job_info = df.iloc[index].to_dict()
+        job_info = job_list[0]
 
         return(job_info)
         #__|
 
     #__| **********************************************************************
 
+    def __columnar_store__(self):
+        """Return ColumnarStore instance of the job dataframe."""
+        #| - __columnar_store__
+        if self.dataframe_dir is not None:
+            store_dir = os.path.join(self.dataframe_dir, "job_dataframe")
+        else:
+            store_dir = os.path.join(
+                self.root_dir,
+                self.working_dir,
+                "jobs_bin/job_dataframe",
+                )
+
+        return(ColumnarStore(store_dir))
+        #__|
+
     def __load_dataframe__(self):
         """Attempt to load dataframe."""
         #| - __load_dataframe__
+        if self.dataframe_storage == "columnar":
+            store = self.__columnar_store__()
+
+            # Falls back to the pickle file if the store hasn't been written
+            if store.exists():
+                columns = self.dataframe_columns
+                if columns is not None:
+                    columns = list(columns) + ["path", "revision_number"]
+
+                self.data_frame = store.load(columns=columns)
+                return(None)
+
         if self.dataframe_dir is not None:
             fle_name = self.dataframe_dir + "/job_dataframe.pickle"
         else:
@@ -216,6 +333,10 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
         #| - __write_dataframe__
         df = self.data_frame
 
+        if self.dataframe_storage == "columnar":
+            self.__columnar_store__().write(df)
+            return(None)
+
         # df.to_csv(self.root_dir + "/jobs_bin/job_dataframe.csv", index=False)
 
         df_pickle_fle = os.path.join(
@@ -253,8 +374,7 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
 
         col_data_file_list = [dir.split("/")[-1] for dir in dir_list]
 
-        for col_file in col_data_file_list:
-            self.__add_data_column_from_file__(col_file)
+        self.__add_data_columns_from_files__(col_data_file_list)
         #__|
 
     def __add_data_column_from_file__(self,
@@ -267,59 +387,118 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
             file_name:
         """
         #| - __add_data_column_from_file__
-
-        #| - Extracting Column Name From File Name
-        col_name = file_name.split(".")[0]
+        self.__add_data_columns_from_files__([file_name])
         #__|
 
-        #| - Reading Column Data File - NEW
-        # column_file = self.root_dir + "/jobs_bin/data_columns/" + file_name
-        column_file = os.path.join(
-            self.working_dir,
-            "jobs_bin/data_columns",
-            file_name,
-            )
+    def __read_column_files__(self, file_list):
+        """Read .col files into a single dataframe.
+
+        Returns dataframe with "file", "key" and "value" columns, where "key"
+        is the "<path>_<revision>" string the rows are matched against (path
+        normalized with os.path.normpath).
+
+        Args:
+            file_list:
+                File names in jobs_bin/data_columns
+        """
+        #| - __read_column_files__
+        file_label_list = []
+        line_list = []
+        for file_name in file_list:
+            column_file = os.path.join(
+                self.working_dir,
+                "jobs_bin/data_columns",
+                file_name,
+                )
+
+            with open(column_file, "r") as fle:
+                lines_i = fle.read().splitlines()
+
+            line_list.extend(lines_i)
+            file_label_list.extend([file_name] * len(lines_i))
+
+        lines = pd.Series(line_list, dtype=object).str.strip()
+
+        not_blank = (lines != "").values
+        lines = lines[not_blank]
+        file_labels = pd.Series(file_label_list, dtype=object)[not_blank]
 
-        with open(column_file, "r") as fle:
-            content = fle.readlines()
+        if len(lines) == 0:
+            return(pd.DataFrame(columns=["file", "key", "value"]))
 
-        content = [x.strip().split("|") for x in content]
+        # value | revision # | path
+        split_lines = lines.str.split("|", n=3, expand=True)
 
-        content_new = []
-        for line in content:
-            line_new = {}
-            line_new["value"] = line[0].strip()
-            line_new["revision"] = line[1].strip()
-            line_new["path"] = line[2].strip()
+        value = split_lines[0].str.strip()
+        revision = split_lines[1].str.strip()
+        path = split_lines[2].str.strip().map(os.path.normpath)
 
-            content_new.append(line_new)
+        col_data = pd.DataFrame({
+            "file": file_labels.values,
+            "key": (path + "_" + revision).values,
+            "value": value.values,
+            })
+
+        return(col_data)
         #__|
 
-        #| - Matching Dataframe with New Data Column
+    def __add_data_columns_from_files__(self, file_list):
+        """Add data in .col files to dataframe (one keyed join per file).
+
+        The "full_path" column ("<path>_<revision_number>") is added to the
+        dataframe, the rows are matched on it with normalized paths
+        (os.path.normpath on both sides). If a job has more than one entry in
+        a file the first one is used and a warning is printed.
+
+        Args:
+            file_list:
+                File names in jobs_bin/data_columns
+        """
+        #| - __add_data_columns_from_files__
+        if len(file_list) == 0:
+            return(None)
+
+        col_data = self.__read_column_files__(file_list)
+        col_data_grouped = dict(list(col_data.groupby("file", sort=False)))
+
         df = self.data_frame
 
         df["full_path"] = df["path"].astype(str) + "_" + \
             df["revision_number"].astype(str)
 
-        column_data_list = []
-        for i_ind, (index, row) in enumerate(df.iterrows()):
-
-            row_has_entry = False
-            for entry in content_new:
+        join_keys = \
+            df["path"].astype(str).str.strip().map(os.path.normpath) + "_" + \
+            df["revision_number"].astype(str).str.strip()
 
-                entry_fullpath = entry["path"] + "_" + entry["revision"]
-                if entry_fullpath == row["full_path"]:
-                    column_data_list.append(entry["value"])
-                    row_has_entry = True
-                    continue
+        for file_name in file_list:
 
-            if not row_has_entry:
-                column_data_list.append(np.nan)
+            #| - Extracting Column Name From File Name
+            col_name = file_name.split(".")[0]
+            #__|
 
-        df.drop("full_path", axis=1)
+            #| - Matching Dataframe with New Data Column
+            col_data_i = col_data_grouped.get(file_name, None)
+
+            if col_data_i is None:
+                df[col_name] = np.nan
+                continue
+
+            duplicates = col_data_i["key"].duplicated(keep="first")
+            if duplicates.any():
+                print(
+                    "WARNING | " + file_name + ": " +
+                    str(col_data_i["key"][duplicates].nunique()) +
+                    " jobs with more than one entry, first entry used"
+                    )
+
+            col_data_i = col_data_i[~duplicates]
+            value_map = pd.Series(
+                col_data_i["value"].values,
+                index=col_data_i["key"].values,
+                )
 
-        df[col_name] = column_data_list
-        #__|
+            df[col_name] = join_keys.map(value_map).tolist()
+            #__|
 
         #__|
 
@@ -342,6 +521,10 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
         revision="auto",
         allow_failure=True,
         # allow_failure=False,
+        executor=None,
+        max_workers=None,
+        use_cache=None,
+        cache_files=None,
         ):
         """
         Add data column to data frame by iterating thourgh job folders.
@@ -366,27 +549,61 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
                 "previous | Second to last revision"
             allow_failure: <True or False>
                 If True, a failed method call will result in NaN
+            executor: <type 'str' or concurrent.futures.Executor>
+                How the job folders are processed, defaults to self.executor
+                "serial"  | One job at a time
+                "thread"  | Thread pool (I/O bound parsers)
+                "process" | Process pool (function must be picklable)
+                Executor instance | Existing pool, left running
+            max_workers:
+                Number of workers of the executor pool
+            use_cache: <True or False>
+                Reuse results of unchanged job folders from
+                jobs_bin/analysis_cache, defaults to self.use_cache
+            cache_files: <type 'list'>
+                Files (relative to the job folder) the result depends on, used
+                to fingerprint the job folder. All non hidden top level files
+                by default.
         """
         #| - __add_data_coumn__
-        new_data_col = []
+        if executor is None:
+            executor = self.executor
+        if max_workers is None:
+            max_workers = self.max_workers
+        if use_cache is None:
+            use_cache = self.use_cache
+
         print("Adding " + str(column_name))
-        for entry in self.data_frame["Job"]:
 
+        #| - Run Function
+        path_list = []
+        for entry in self.data_frame["Job"]:
             path = entry.full_path
-
-            #| - Run Function
             path = path + self.cluster.cluster.job_data_dir
+            path_list.append(path)
+
+        if use_cache:
+            new_data_col, time_list = self.__map_function_cached__(
+                function,
+                column_name,
+                path_list,
+                executor=executor,
+                max_workers=max_workers,
+                allow_failure=allow_failure,
+                cache_files=cache_files,
+                )
 
-            if allow_failure is True:
-                try:
-                    out = function(path)
-                except:
-                    out = np.nan
-            else:
-                out = function(path)
+        else:
+            new_data_col, time_list = map_timed(
+                function,
+                path_list,
+                executor=executor,
+                max_workers=max_workers,
+                allow_failure=allow_failure,
+                )
 
-            new_data_col.append(out)
-            #__|
+        self.__report_column_timings__(column_name, path_list, time_list)
+        #__|
 
         data_type_list = [type(x) for x in new_data_col]
         dict_in_list = any(item == dict for item in data_type_list)
@@ -431,6 +648,124 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
 
 
 
+    def __get_analysis_cache__(self):
+        """Return AnalysisCache instance of jobs_bin/analysis_cache."""
+        #| - __get_analysis_cache__
+        if self.analysis_cache is None:
+            cache_dir = os.path.join(
+                self.root_dir,
+                self.working_dir,
+                "jobs_bin/analysis_cache",
+                )
+
+            self.analysis_cache = AnalysisCache(
+                cache_dir,
+                hash_contents=self.hash_cache,
+                )
+
+        return(self.analysis_cache)
+        #__|
+
+    def __map_function_cached__(self,
+        function,
+        column_name,
+        path_list,
+        executor="serial",
+        max_workers=None,
+        allow_failure=True,
+        cache_files=None,
+        ):
+        """Run function on the job folders whose fingerprint changed.
+
+        Cached results are used for the remaining job folders, the cache is
+        updated with the new results.
+
+        Args:
+            function:
+            column_name:
+            path_list:
+            executor:
+            max_workers:
+            allow_failure:
+            cache_files:
+        """
+        #| - __map_function_cached__
+        cache = self.__get_analysis_cache__()
+
+        out_list = [None] * len(path_list)
+        time_list = [0.] * len(path_list)
+
+        fingerprint_list = []
+        run_indices = []
+        for i_ind, path_i in enumerate(path_list):
+            fingerprint = cache.fingerprint(path_i, file_list=cache_files)
+            fingerprint_list.append(fingerprint)
+
+            cached, value = cache.lookup(column_name, path_i, fingerprint)
+            if cached:
+                out_list[i_ind] = value
+            else:
+                run_indices.append(i_ind)
+
+        print(
+            str(len(path_list) - len(run_indices)) + " cached | " +
+            str(len(run_indices)) + " to run"
+            )
+
+        new_out, new_time = map_timed(
+            function,
+            [path_list[i] for i in run_indices],
+            executor=executor,
+            max_workers=max_workers,
+            allow_failure=allow_failure,
+            )
+
+        for i_ind, out_i, time_i in zip(run_indices, new_out, new_time):
+            out_list[i_ind] = out_i
+            time_list[i_ind] = time_i
+
+            cache.store(
+                column_name,
+                path_list[i_ind],
+                fingerprint_list[i_ind],
+                out_i,
+                )
+
+        if len(run_indices) > 0:
+            cache.save(column_name)
+
+        return(out_list, time_list)
+        #__|
+
+    def __report_column_timings__(self, column_name, path_list, time_list):
+        """Store per-job timings of new data column and print slowest jobs.
+
+        Timings are stored in self.column_timings[column_name] as a pandas
+        Series (seconds) indexed by job path.
+
+        Args:
+            column_name:
+            path_list:
+            time_list:
+        """
+        #| - __report_column_timings__
+        timings = pd.Series(time_list, index=path_list)
+        self.column_timings[column_name] = timings
+
+        if len(timings) == 0:
+            return(None)
+
+        print(
+            str(column_name) + " | total: " + str(round(timings.sum(), 2)) +
+            " s, mean: " + str(round(timings.mean(), 3)) + " s per job"
+            )
+
+        slowest = timings.sort_values(ascending=False)
+        slowest = slowest.iloc[0:self.num_slow_jobs_report]
+        for path_i, time_i in slowest.items():
+            print("    " + str(round(time_i, 3)) + " s | " + str(path_i))
+        #__|
+
     def job_state_file(self, path_i="."):
         """
         Return contents of '.QUEUESTATE' if present in the job directory.
@@ -439,6 +774,17 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
             path:
         """
         #| - job_state_file
+        if self.__marker_tracked__(path_i):
+            # .QUEUESTATE is rewritten by cluster.job_state, usually right
+            # before this call, the watcher (or loaded table) may lag behind
+            self.__sync_marker__(path_i, ".QUEUESTATE")
+
+            job_state = self.marker_table.marker_content(path_i, ".QUEUESTATE")
+            if job_state is not None:
+                job_state = job_state.rstrip()
+
+            return(job_state)
+
         file_path = path_i + "/.QUEUESTATE"
         if os.path.isfile(file_path):
             with open(file_path, "r") as fle:
@@ -449,6 +795,106 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
         return(job_state)
         #__|
 
+    #| - Marker Files *********************************************************
+    def attach_marker_watcher(self,
+        watch_dir=None,
+        backend="auto",
+        table_file=None,
+        start=True,
+        ):
+        """Answer marker file checks from a MarkerWatcher of the job tree.
+
+        Replaces the per job stat calls of the job state methods by lookups in
+        the watcher's table, which is updated from file system events.
+
+        Args:
+            watch_dir:
+                Folder to watch, defaults to <root_dir>/data
+            backend:
+                "auto", "inotify" or "poll" (see marker_watcher.py)
+            table_file:
+                Instead of starting a watcher, load the table written by a
+                watcher service (python marker_watcher.py ... --table_file)
+            start:
+                Start the watcher thread
+        """
+        #| - attach_marker_watcher
+        self.detach_marker_watcher()
+
+        if table_file is not None:
+            self.marker_table = MarkerTable.load(table_file)
+        else:
+            if watch_dir is None:
+                watch_dir = os.path.join(self.root_dir, "data")
+
+            self.marker_watcher = MarkerWatcher(watch_dir, backend=backend)
+            self.marker_table = self.marker_watcher.table
+
+            if start:
+                self.marker_watcher.start()
+
+        self.cluster.marker_table = self.marker_table
+
+        return(self.marker_table)
+        #__|
+
+    def detach_marker_watcher(self):
+        """Stop the marker watcher and go back to checking files."""
+        #| - detach_marker_watcher
+        if self.marker_watcher is not None:
+            self.marker_watcher.stop()
+
+        self.marker_watcher = None
+        self.marker_table = None
+        self.cluster.marker_table = None
+        #__|
+
+    def __marker_tracked__(self, path_i):
+        """Return True if path_i is covered by the attached marker table."""
+        #| - __marker_tracked__
+        if self.marker_table is None:
+            return(False)
+
+        return(self.marker_table.tracks(path_i))
+        #__|
+
+    def __sync_marker__(self, path_i, marker):
+        """Bring the marker table entry of marker in path_i up to date.
+
+        Pending inotify events are applied, otherwise (polling watcher, table
+        loaded from a table_file) the marker is read again from disk.
+
+        Args:
+            path_i:
+            marker:
+        """
+        #| - __sync_marker__
+        watcher = self.marker_watcher
+        if watcher is not None and watcher.backend_name == "inotify":
+            watcher.sync()
+        else:
+            self.marker_table.refresh_marker(path_i, marker)
+        #__|
+
+    def __marker_exists__(self, path_i, marker):
+        """Return whether marker file exists in path_i.
+
+        Looked up in the marker table if attached (synced first, see
+        __sync_marker__), stat of the file otherwise.
+
+        Args:
+            path_i:
+            marker:
+        """
+        #| - __marker_exists__
+        if self.__marker_tracked__(path_i):
+            self.__sync_marker__(path_i, marker)
+            return(self.marker_table.has_marker(path_i, marker))
+
+        return(os.path.isfile(path_i + "/" + marker))
+        #__|
+    #__| **********************************************************************
+
 
     #| - Data Frame Methods
 
@@ -523,6 +969,24 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
 
     #| - Query Job Status *****************************************************
 
+    def update_queue_snapshot(self):
+        """Poll the batch system once for every job in the data frame.
+
+        The job paths are the same ones passed to the job state methods by
+        add_data_column.
+        """
+        #| - update_queue_snapshot
+        job_data_dir = self.cluster.cluster.job_data_dir
+
+        path_list = []
+        for Job_i in self.data_frame["Job"]:
+            path_list.append(Job_i.full_path + job_data_dir)
+
+        snapshot = self.cluster.update_queue_snapshot(path_list)
+
+        return(snapshot)
+        #__|
+
     #| - __old__
     def job_state(self, path_i):
         """
@@ -916,13 +1380,13 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
         #     )
 
         crit_0 = False
-        if os.path.isfile(path_i + "/.READY"):
+        if self.__marker_exists__(path_i, ".READY"):
             crit_0 = True
         elif require_READY_tag is False:
             crit_0 = True
 
         crit_1 = False
-        if not os.path.isfile(path_i + "/.SUBMITTED"):
+        if not self.__marker_exists__(path_i, ".SUBMITTED"):
             crit_1 = True
 
         #| - Having trouble with AWS .READY files not being copied over
@@ -983,15 +1447,15 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
         """
         #| - job_running
         crit_0 = True
-        if os.path.isfile(path_i + "/.READY"):
+        if self.__marker_exists__(path_i, ".READY"):
             crit_0 = True
 
         crit_1 = False
-        if os.path.isfile(path_i + "/.SUBMITTED"):
+        if self.__marker_exists__(path_i, ".SUBMITTED"):
             crit_1 = True
 
         crit_2 = False
-        if not os.path.isfile(path_i + "/.FINISHED"):
+        if not self.__marker_exists__(path_i, ".FINISHED"):
             crit_2 = True
 
         crit_3 = False
@@ -1016,17 +1480,17 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
         """
         #| - job_succeeded
         crit_0 = True
-        if os.path.isfile(path_i + "/.READY"):
+        if self.__marker_exists__(path_i, ".READY"):
             crit_0 = True
 
         crit_1 = False
-        if os.path.isfile(path_i + "/.SUBMITTED"):
+        if self.__marker_exists__(path_i, ".SUBMITTED"):
             crit_1 = True
 
         # Checking for '.FINSISHED' file OR checking batch queue
 
         crit_2_1 = False
-        if os.path.isfile(path_i + "/.FINISHED"):
+        if self.__marker_exists__(path_i, ".FINISHED"):
             crit_2_1 = True
 
         crit_2_2 = False
@@ -1060,11 +1524,11 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
             crit_0 = True
 
         crit_1 = False
-        if os.path.isfile(path_i + "/.SUBMITTED"):
+        if self.__marker_exists__(path_i, ".SUBMITTED"):
             crit_1 = True
 
         crit_2 = False
-        if not os.path.isfile(path_i + "/.FINISHED"):
+        if not self.__marker_exists__(path_i, ".FINISHED"):
             crit_2 = True
 
 
@@ -1097,7 +1561,7 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
         """
         #| - job_submitted
         try:
-            if os.path.isfile(path_i + "/.SUBMITTED"):
+            if self.__marker_exists__(path_i, ".SUBMITTED"):
                 return(True)
             else:
                 return(False)
@@ -1122,10 +1586,9 @@ class DFT_Jobs_Analysis(DFT_Jobs_Setup):
 
         error = False
         if os.path.isfile(err_file):
-            with open(err_file) as fle:
-                lines = [line.strip() for line in fle]
-
-            lines = lines[-4:]
+            # Only the end of the file is read (error files of running jobs
+            # keep growing)
+            lines = tail_lines(err_file, 4)
 
             for line in lines:
 
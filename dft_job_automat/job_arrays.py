@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""SLURM job array submission of many job folders.
+
+Author: Raul A. Flores
+
+Job folders with identical submission parameters (partition, nodes, wall
+time, etc.) are grouped and submitted as a single job array. Every array
+gets an index file (one job folder per line) and a driver script in the
+array folder (ex. jobs_bin/job_arrays):
+
+    <array_name>.index
+    <array_name>.sh     | cd to line $SLURM_ARRAY_TASK_ID of the index file
+                          and run the job script there
+
+The usual per job markers are written to every job folder, the job id of an
+array element is '<array job id>_<task id>' (same as reported by
+'squeue --array'):
+    .SUBMITTED, .jobid, .sub_out, .bash_comm
+"""
+
+#| - Import Modules
+import os
+import re
+import json
+import stat
+import datetime
+import subprocess
+
+try:
+    from shlex import quote
+except ImportError:
+    # python 2
+    from pipes import quote
+#__|
+
+#| - Methods
+
+def group_submission_params(params_list, ignore_keys=None):
+    """Group job submission parameter dicts by their shared parameters.
+
+    Returns list of lists of params dicts, groups are ordered by first
+    appearance and keep the order of params_list.
+
+    Args:
+        params_list:
+        ignore_keys:
+            Per job parameters not used for grouping (default: path_i and
+            job_name)
+    """
+    #| - group_submission_params
+    if ignore_keys is None:
+        ignore_keys = ["path_i", "job_name"]
+
+    groups = {}
+    group_order = []
+    for params in params_list:
+        key = tuple(sorted(
+            [(k, str(v)) for k, v in params.items() if k not in ignore_keys]
+            ))
+
+        if key not in groups:
+            groups[key] = []
+            group_order.append(key)
+
+        groups[key].append(params)
+
+    return([groups[key] for key in group_order])
+    #__|
+
+def chunk_group(group, max_array_size):
+    """Split group into lists of at most max_array_size jobs.
+
+    Args:
+        group:
+        max_array_size:
+    """
+    #| - chunk_group
+    chunks = [
+        group[i:i + max_array_size]
+        for i in range(0, len(group), max_array_size)
+        ]
+
+    return(chunks)
+    #__|
+
+def array_name():
+    """Return unique name for new job array files."""
+    #| - array_name
+    name = "array_" + datetime.datetime.now().strftime("%y%m%d_%H%M%S_%f")
+
+    return(name)
+    #__|
+
+def make_executable(path_i):
+    """Add executable permissions to all files in path_i (not recursive).
+
+    Args:
+        path_i:
+    """
+    #| - make_executable
+    exec_bits = stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+    for fle_name in os.listdir(path_i):
+        file_path = os.path.join(path_i, fle_name)
+        if os.path.isfile(file_path):
+            mode = os.stat(file_path).st_mode
+            os.chmod(file_path, mode | exec_bits)
+    #__|
+
+def write_array_files(
+    array_dir,
+    name,
+    path_list,
+    job_script,
+    out_file="job.out",
+    err_file="job.err",
+    env_vars=None,
+    ):
+    """Write index file and driver script of a job array.
+
+    Returns the paths of the index file and driver script.
+
+    Args:
+        array_dir:
+        name:
+        path_list:
+            Job folders of the array elements (absolute paths)
+        job_script:
+            Script run in every job folder (ex. model.py)
+        out_file:
+        err_file:
+            stdout and stderr files written in every job folder
+        env_vars:
+            Dict of environment variables exported before running the job
+            script ('$JOB_DIR' can be used in the values)
+    """
+    #| - write_array_files
+    if not os.path.exists(array_dir):
+        os.makedirs(array_dir)
+
+    index_file = os.path.join(array_dir, name + ".index")
+    with open(index_file, "w") as fle:
+        for path_i in path_list:
+            fle.write(path_i + "\n")
+
+    lines = [
+        "#!/bin/bash",
+        "# Job array driver, element i runs in line i + 1 of the index file",
+        "JOB_DIR=$(sed -n \"$((SLURM_ARRAY_TASK_ID + 1))p\" " +
+            quote(index_file) + ")",
+        "cd \"$JOB_DIR\" || exit 1",
+        ]
+
+    if env_vars is not None:
+        for key in sorted(env_vars.keys()):
+            lines.append("export " + key + "=" + str(env_vars[key]))
+
+    lines.append(
+        quote("./" + job_script) + " > " + quote(out_file) + " 2> " +
+        quote(err_file)
+        )
+
+    driver_script = os.path.join(array_dir, name + ".sh")
+    with open(driver_script, "w") as fle:
+        fle.write("\n".join(lines) + "\n")
+    os.chmod(driver_script, 0o755)
+
+    return(index_file, driver_script)
+    #__|
+
+def submit_sbatch_array(sbatch_cmd, sbatch_args, num_jobs, driver_script):
+    """Run sbatch for a job array.
+
+    Returns (array job id, sbatch output, command list). The job id is None if
+    it couldn't be parsed, the output is None if sbatch failed.
+
+    Args:
+        sbatch_cmd:
+        sbatch_args:
+            List of sbatch arguments (without --array and the script)
+        num_jobs:
+        driver_script:
+    """
+    #| - submit_sbatch_array
+    bash_comm = [sbatch_cmd, "--parsable"] + sbatch_args + \
+        ["--array=0-" + str(num_jobs - 1), driver_script]
+
+    print("Bash Submission Command:")
+    print(" ".join(bash_comm))
+
+    try:
+        out = subprocess.check_output(bash_comm, universal_newlines=True)
+    except (subprocess.CalledProcessError, OSError) as e:
+        print("Job array submission failed: " + str(e))
+        return(None, None, bash_comm)
+
+    # --parsable output is '<job id>' or '<job id>;<cluster>'
+    job_id = out.strip().split(";")[0]
+    job_id = re.sub("[^0-9]", "", job_id.split(" ")[-1])
+    if job_id == "":
+        print("Couldn't parse for jobid")
+        job_id = None
+
+    return(job_id, out, bash_comm)
+    #__|
+
+def write_array_markers(path_list, array_job_id, out, bash_comm, params_list):
+    """Write per job submission markers of job array elements.
+
+    Args:
+        path_list:
+        array_job_id:
+        out:
+            sbatch output
+        bash_comm:
+        params_list:
+            Submission params of every element (.submission_params_2.json)
+    """
+    #| - write_array_markers
+    for task_id, (path_i, params) in enumerate(zip(path_list, params_list)):
+        if array_job_id is None:
+            job_id = None
+        else:
+            job_id = str(array_job_id) + "_" + str(task_id)
+
+        with open(os.path.join(path_i, ".SUBMITTED"), "w") as fle:
+            fle.write("\n")
+
+        with open(os.path.join(path_i, ".bash_comm"), "w") as fle:
+            fle.write(" ".join(bash_comm) + "\n")
+
+        with open(os.path.join(path_i, ".jobid"), "w") as fle:
+            fle.write(str(job_id) + "\n")
+
+        with open(os.path.join(path_i, ".sub_out"), "w") as fle:
+            fle.write(str(out))
+
+        with open(os.path.join(path_i, ".submission_params_2.json"), "w") as fle:
+            json.dump(params, fle, indent=2, skipkeys=True)
+    #__|
+
+def submit_job_arrays(
+    params_list,
+    sbatch_cmd,
+    sbatch_args_func,
+    array_dir,
+    max_array_size=1000,
+    env_vars=None,
+    ):
+    """Group jobs by submission parameters and submit them as job arrays.
+
+    Returns list of dicts describing the submitted arrays:
+        {"job_id": ..., "name": ..., "index_file": ..., "paths": [...]}
+
+    Args:
+        params_list:
+            Complete submission parameter dicts (cluster defaults merged in),
+            "path_i" must be an absolute path
+        sbatch_cmd:
+        sbatch_args_func:
+            Function (group params dict, array name) -> list of sbatch args
+        array_dir:
+            Folder for the index files, driver scripts and array logs
+        max_array_size:
+            Max number of elements per array (SLURM MaxArraySize - 1)
+        env_vars:
+            Passed to write_array_files
+    """
+    #| - submit_job_arrays
+    array_list = []
+    for group in group_submission_params(params_list):
+        for chunk_i in chunk_group(group, max_array_size):
+            params_0 = chunk_i[0]
+            path_list = [params["path_i"] for params in chunk_i]
+
+            name = array_name()
+            index_file, driver_script = write_array_files(
+                array_dir,
+                name,
+                path_list,
+                params_0["job_script"],
+                out_file=params_0["out_file"],
+                err_file=params_0["err_file"],
+                env_vars=env_vars,
+                )
+
+            job_id, out, bash_comm = submit_sbatch_array(
+                sbatch_cmd,
+                sbatch_args_func(params_0, name),
+                len(chunk_i),
+                driver_script,
+                )
+
+            if out is None:
+                print("JOB ARRAY SKIPPED: " + name)
+                continue
+
+            write_array_markers(path_list, job_id, out, bash_comm, chunk_i)
+
+            array_list.append({
+                "job_id": job_id,
+                "name": name,
+                "index_file": index_file,
+                "paths": path_list,
+                })
+
+    return(array_list)
+    #__|
+
+#__|
@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Cancel and submit many jobs with as few scheduler calls as possible.
+
+Author: Raul A. Flores
+
+    SLURM | one scancel call per chunk of job ids
+    LSF   | one bkill call per chunk of job ids
+    AWS   | Batch terminate_job calls from a bounded thread pool,
+            submissions with a single trisub loop
+
+Every function returns one result dict per job:
+
+    {"job_id": ..., "status": ..., "message": ..., ("path": ...)}
+
+    status:
+        "cancelled" | "submitted"
+        "finished"  | Job had already finished
+        "not_found" | Unknown job id
+        "no_job_id" | Job folder has no .jobid file
+        "skipped"   | Job folder already submitted
+        "error"     | Scheduler call failed, see message
+
+The scheduler commands are taken from the cluster instance (scancel_cmd,
+bkill_cmd, trisub_cmd), so the fake executables of sched_sim can be used
+offline.
+"""
+
+#| - Import Modules
+import os
+import re
+import datetime
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from dft_job_automat.queue_poller import (
+    read_job_id,
+    chunk_list,
+    unique_job_ids,
+    )
+#__|
+
+#| - Methods
+
+def job_result(job_id, status, message=""):
+    """Return result dict of single job.
+
+    Args:
+        job_id:
+        status:
+        message:
+    """
+    #| - job_result
+    out = {
+        "job_id": job_id,
+        "status": status,
+        "message": message,
+        }
+
+    return(out)
+    #__|
+
+def run_command(cmd_list):
+    """Run command, returns (return code, stdout, stderr).
+
+    Args:
+        cmd_list:
+    """
+    #| - run_command
+    try:
+        proc = subprocess.Popen(
+            cmd_list,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            )
+        out, err = proc.communicate()
+    except OSError as e:
+        return(None, "", str(e))
+
+    return(proc.returncode, out, err)
+    #__|
+
+def scancel_jobs(job_id_list, scancel_cmd="scancel", chunk_size=200):
+    """Cancel SLURM jobs, chunk_size job ids per scancel call.
+
+    Args:
+        job_id_list:
+        scancel_cmd:
+        chunk_size:
+    """
+    #| - scancel_jobs
+    error_re = re.compile(r"job id (\S+): (.*)$")
+
+    results = []
+    for chunk in chunk_list(unique_job_ids(job_id_list), chunk_size):
+        code, out, err = run_command([scancel_cmd] + chunk)
+
+        job_errors = {}
+        for line in err.splitlines():
+            match = error_re.search(line)
+            if match is not None:
+                job_errors[match.group(1)] = match.group(2).strip()
+
+        for job_id in chunk:
+            message = job_errors.get(job_id, None)
+
+            if message is None:
+                if code == 0 or len(job_errors) > 0:
+                    results.append(job_result(job_id, "cancelled"))
+                else:
+                    results.append(job_result(job_id, "error", err.strip()))
+
+            elif "Invalid job id" in message:
+                results.append(job_result(job_id, "not_found", message))
+            elif "completed" in message or "completing" in message:
+                results.append(job_result(job_id, "finished", message))
+            else:
+                results.append(job_result(job_id, "error", message))
+
+    return(results)
+    #__|
+
+def bkill_jobs(job_id_list, bkill_cmd="bkill", chunk_size=200):
+    """Cancel LSF jobs, chunk_size job ids per bkill call.
+
+    Args:
+        job_id_list:
+        bkill_cmd:
+        chunk_size:
+    """
+    #| - bkill_jobs
+    line_re = re.compile(r"Job <(\S+)>:? (.*)$")
+
+    results = []
+    for chunk in chunk_list(unique_job_ids(job_id_list), chunk_size):
+        code, out, err = run_command([bkill_cmd] + chunk)
+
+        job_lines = {}
+        for line in out.splitlines() + err.splitlines():
+            match = line_re.search(line)
+            if match is not None:
+                job_lines[match.group(1)] = match.group(2).strip()
+
+        for job_id in chunk:
+            message = job_lines.get(job_id, None)
+
+            if message is None:
+                results.append(job_result(job_id, "error", err.strip()))
+            elif "being terminated" in message:
+                results.append(job_result(job_id, "cancelled", message))
+            elif "No matching job" in message:
+                results.append(job_result(job_id, "not_found", message))
+            elif "already finished" in message:
+                results.append(job_result(job_id, "finished", message))
+            else:
+                results.append(job_result(job_id, "error", message))
+
+    return(results)
+    #__|
+
+def terminate_batch_jobs(job_id_list, reason="N/A", max_workers=8):
+    """Terminate AWS Batch jobs with max_workers concurrent calls.
+
+    Args:
+        job_id_list:
+        reason:
+        max_workers:
+    """
+    #| - terminate_batch_jobs
+    from aws.batch_status import get_batch_client
+
+    batch = get_batch_client()
+
+    def terminate(job_id):
+        try:
+            batch.terminate_job(jobId=job_id, reason=reason)
+        except Exception as e:
+            if "not found" in str(e):
+                return(job_result(job_id, "not_found", str(e)))
+            return(job_result(job_id, "error", str(e)))
+
+        return(job_result(job_id, "cancelled"))
+
+    job_id_list = unique_job_ids(job_id_list)
+    if len(job_id_list) == 0:
+        return([])
+
+    max_workers = max(1, min(max_workers, len(job_id_list)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(terminate, job_id_list))
+
+    return(results)
+    #__|
+
+def cancel_job_ids(cluster, job_id_list, chunk_size=200, max_workers=8,
+    reason="N/A"):
+    """Cancel jobs with the scheduler of cluster.
+
+    Args:
+        cluster:
+            Cluster instance (EdisonCluster, SLACCluster, ...), the cluster
+            attribute of ComputerCluster
+        job_id_list:
+        chunk_size:
+            Job ids per scancel/bkill call
+        max_workers:
+            Concurrent AWS Batch calls
+        reason:
+            AWS Batch termination reason
+    """
+    #| - cancel_job_ids
+    if hasattr(cluster, "scancel_cmd"):
+        results = scancel_jobs(
+            job_id_list,
+            scancel_cmd=cluster.scancel_cmd,
+            chunk_size=chunk_size,
+            )
+
+    elif hasattr(cluster, "bkill_cmd"):
+        results = bkill_jobs(
+            job_id_list,
+            bkill_cmd=cluster.bkill_cmd,
+            chunk_size=chunk_size,
+            )
+
+    elif hasattr(cluster, "trisub_cmd"):
+        results = terminate_batch_jobs(
+            job_id_list,
+            reason=reason,
+            max_workers=max_workers,
+            )
+
+    else:
+        results = [
+            job_result(job_id, "error", "Cluster can't cancel jobs")
+            for job_id in unique_job_ids(job_id_list)
+            ]
+
+    return(results)
+    #__|
+
+def cancel_job_paths(cluster, path_list, **kwargs):
+    """Cancel the jobs submitted from the job folders in path_list.
+
+    Args:
+        cluster:
+        path_list:
+        **kwargs:
+            Passed to cancel_job_ids
+    """
+    #| - cancel_job_paths
+    path_job_ids = [(path_i, read_job_id(path_i=path_i)) for path_i in path_list]
+
+    results_dict = {}
+    for result in cancel_job_ids(
+        cluster,
+        [i[1] for i in path_job_ids],
+        **kwargs):
+        results_dict[result["job_id"]] = result
+
+    results = []
+    for path_i, job_id in path_job_ids:
+        if job_id is None:
+            result = job_result(None, "no_job_id")
+        else:
+            result = dict(results_dict[job_id])
+        result["path"] = path_i
+
+        results.append(result)
+
+    return(results)
+    #__|
+
+def submit_trisub(
+    path_list,
+    trisub_cmd="trisub",
+    queue="medium",
+    cpus=None,
+    registry=None,
+    ):
+    """Submit job folders to AWS with one trisub call each, in a single loop.
+
+    trisub is run in every folder with cwd (no chdir of this process), the
+    job id is written to .jobid and the folder marked with .SUBMITTED, the
+    same as AWSCluster.submit_job_clust. Already submitted folders are
+    skipped.
+
+    Args:
+        path_list:
+        trisub_cmd:
+        queue:
+        cpus:
+            Number of cores, None for the trisub default
+        registry:
+            JobRegistry the submitted jobs are added to (single transaction),
+            None to not register them
+    """
+    #| - submit_trisub
+    cmd_list = [trisub_cmd]
+    if cpus is not None:
+        cmd_list += ["-c", str(cpus)]
+    cmd_list += ["-q", queue]
+
+    id_re = re.compile(r'"jobId"\s*:\s*"([^"]+)"')
+
+    results = []
+    for path_i in path_list:
+        if os.path.isfile(os.path.join(path_i, ".SUBMITTED")):
+            result = job_result(read_job_id(path_i=path_i), "skipped")
+            result["path"] = path_i
+            results.append(result)
+            continue
+
+        try:
+            out = subprocess.check_output(
+                cmd_list,
+                cwd=path_i,
+                stderr=subprocess.STDOUT,
+                universal_newlines=True,
+                )
+            match = id_re.search(out)
+        except (subprocess.CalledProcessError, OSError) as e:
+            out = getattr(e, "output", str(e))
+            match = None
+
+        if match is None:
+            result = job_result(None, "error", str(out).strip())
+        else:
+            job_id = match.group(1)
+
+            with open(os.path.join(path_i, ".jobid"), "w") as fle:
+                fle.write(job_id + "\n")
+            with open(os.path.join(path_i, ".SUBMITTED"), "w") as fle:
+                pass
+
+            result = job_result(job_id, "submitted")
+            result["submit_time"] = datetime.datetime.now().isoformat()
+
+        result["path"] = path_i
+        results.append(result)
+
+    if registry is not None:
+        job_dict_list = [
+            {
+                "job_id": i["job_id"],
+                "job_path": i["path"],
+                "job_status": "SUBMITTED",
+                "job_queue": queue,
+                "job_cpus": cpus,
+                "submit_time": i["submit_time"],
+                }
+            for i in results if i["status"] == "submitted"
+            ]
+
+        if len(job_dict_list) > 0:
+            registry.add_jobs(job_dict_list)
+
+    return(results)
+    #__|
+
+def summarize(results):
+    """Return {status: number of jobs} of results.
+
+    Args:
+        results:
+    """
+    #| - summarize
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+
+    return(counts)
+    #__|
+
+#__|
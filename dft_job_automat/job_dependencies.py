@@ -8,12 +8,16 @@ import sys
 import os
 import shutil
 import copy
+import time
+import traceback
 
 from ase import io
 import pandas as pd
 
 from dft_job_automat.job_analysis import DFT_Jobs_Analysis
 from dft_job_automat.job_manager import DFT_Jobs_Manager
+from dft_job_automat.executors import map_timed
+from dft_job_automat.file_propagation import PropagationPlanner
 #__|
 
 #| - FUNCTIONS
@@ -32,113 +36,82 @@ def copyfiles_onestep_up(
     step,
     JobsInstances_lst,
     files_lst=[],
-    root_dir_files=None
+    root_dir_files=None,
+    planner=None,
+    dry_run=False,
+    update=False,
+    executor="thread",
+    max_workers=None,
     ):
-    """
+    """Copy files of job to the matching jobs of the next step.
+
+    The jobs of step+1 whose shared tree level properties have the same values
+    as job_var_lst receive files_lst (from the job's folder) and
+    root_dir_files (from the step's root_dir). Existing files are not
+    overwritten.
+
+    The .FILES_COPIED file of the job is only written if every source file
+    exists and every copy succeeded, otherwise the job is handled again the
+    next time.
+
+    Args:
+        job_var_lst:
+        step:
+            1 based step number of job_var_lst
+        JobsInstances_lst:
+        files_lst:
+            Entries are "file" or ["source_file", "dest_file"]
+        root_dir_files:
+        planner:
+            file_propagation.PropagationPlanner of the two steps, pass the
+            same instance for all the jobs of a step to index the next step
+            only once (see DFT_Jobs_Workflow.propagation_planner)
+        dry_run:
+            Print the copy plan without copying anything
+        update:
+            Overwrite existing files that aren't up to date (size and mtime)
+        executor:
+            Executor of the copies, see executors.get_executor
+        max_workers:
+
+    Returns the copy plan (list of dicts, see file_propagation)
     """
     #| - copyfiles_onestep_up
-    def copy_if_not_in_dest(source, dest_file):
-        """
-        """
-        #| - copy_if_not_in_dest
-        if not os.path.isfile(dest_file):
-
-            shutil.copy(source, dest_file)
-            source_fle = source.split("/")[-1]
-
-            print("File " + str(source_fle) + " copied")
-        else:
-            pass
-
-        #__|
-
-
-    curr_step = JobsInstances_lst[step - 1]
-    next_step = JobsInstances_lst[step]
-
-
-    root_dir = curr_step.root_dir
+    if planner is None:
+        planner = PropagationPlanner(
+            JobsInstances_lst[step - 1],
+            JobsInstances_lst[step],
+            )
 
-    dir_curr = curr_step.var_lst_to_path(
+    plan = planner.plan(
         job_var_lst,
-        job_rev="Auto",
-        relative_path=False,
+        files_lst=files_lst,
+        root_dir_files=root_dir_files,
+        update=update,
         )
-    next_var_lst = copy.deepcopy(next_step.job_var_lst)
-
-    #| - Finding jobs in step+1 whose properties match step's
-    for curr_property in job_var_lst:
-        prop_name = curr_property["property"]  # force-cutoff
-        prop_value = curr_property["value"]    # 0.001
-
-        for job in next_step.job_var_lst:
-            path_i = next_step.var_lst_to_path(
-                job,
-                job_rev="Auto",
-                relative_path=False,
-                )
-
-            # match_lst = []
-            for next_property in job:
-                next_prop_name = next_property["property"]
-                next_prop_value = next_property["value"]
-
-                if next_prop_name == prop_name:
-                    if next_prop_value != prop_value:
-
-                        if job in next_var_lst:
-                            next_var_lst.remove(job)
-                        else:
-                            pass
-    #__|
-
-    for next_job in next_var_lst:
-        path_i = next_step.var_lst_to_path(
-            next_job,
-            job_rev="Auto",
-            relative_path=False,
-            )
-
-        for file_i in files_lst:
-
-            #| - Copy Files to Directory in New Step
-            if type(file_i) == str:
-                curr_dir = dir_curr + \
-                    curr_step.cluster.cluster.job_data_dir + "/" + file_i
-                copy_if_not_in_dest(curr_dir, path_i + "/" + file_i)
-
-            elif type(file_i) == list:
-                curr_dir = dir_curr + \
-                    curr_step.cluster.cluster.job_data_dir + "/" + file_i[0]
-                copy_if_not_in_dest(curr_dir, path_i + "/" + file_i[1])
-            #__|
-
-
-        if root_dir_files is not None:
-            root_dir = curr_step.root_dir
-            source_dir = root_dir
-
-            dest_dir = path_i
 
-            for file_i in root_dir_files:
-                #| - Copy Files from Root Dir to New Job Folder
-                if type(file_i) == str:
-                    copy_if_not_in_dest(
-                        source_dir + "/" + file_i,
-                        dest_dir + "/" + file_i,
-                        )
+    if dry_run:
+        print(planner.report(plan))
+        return(plan)
 
-                elif type(file_i) == list:
-                    copy_if_not_in_dest(
-                        source_dir + "/" + file_i[0],
-                        dest_dir + "/" + file_i[1],
-                        )
-                #__|
+    plan = planner.execute(plan, executor=executor, max_workers=max_workers)
 
+    for entry in plan:
+        if entry["status"] == "copied":
+            print("File " + entry["source"].split("/")[-1] + " copied")
+        elif entry["status"] == "error":
+            print("File copy failed: " + entry["dest"] + " | " + entry["error"])
+        elif entry["status"] == "missing_source":
+            print("Source file missing: " + entry["source"])
 
-    open(dir_curr + "/.FILES_COPIED", "w")
-    # file = open(dir_curr + "/.FILES_COPIED", "w")
+    dir_curr = planner.source_dir(job_var_lst)
+    if planner.failed_entries(plan):
+        print("Not all files were copied, " + dir_curr + "/.FILES_COPIED "
+            "not written")
+    else:
+        open(dir_curr + "/.FILES_COPIED", "w").close()
 
+    return(plan)
     #__|
 
 def create_atoms_list(atoms_name, file_ext, root_dir):
@@ -164,6 +137,79 @@ def create_level_entries_dict(tree_level_labels, tree_level_values):
     return(level_entries_dict)
     #__|
 
+def run_job_hooks(task):
+    """Run the workflow hooks of a single job, never raises.
+
+    Returns dict with the job tally (None if there is no maint_function) and
+    the error (None if the hooks succeeded).
+
+    Args:
+        task:
+            (hooks, step, path_i, job_i_params, wf_vars, tally), where hooks
+            is the list of functions to run in order, the maint_function
+            (if any) must be last
+    """
+    #| - run_job_hooks
+    hooks, step, path_i, job_i_params, wf_vars, tally = task
+
+    out = {"tally": None, "error": None}
+    try:
+        for hook in hooks[:-1]:
+            hook(step, path_i, job_i_params, wf_vars)
+
+        if tally is None:
+            hooks[-1](step, path_i, job_i_params, wf_vars)
+        else:
+            out["tally"] = hooks[-1](
+                step,
+                path_i,
+                job_i_params,
+                wf_vars,
+                tally,
+                )
+
+    except Exception as e:
+        out["error"] = {
+            "step": step,
+            "path": path_i,
+            "error": repr(e),
+            "traceback": traceback.format_exc(),
+            }
+
+    return(out)
+    #__|
+
+def merge_tallies(tally, job_tally_list):
+    """Add up the tallies returned by the maint_function of every job.
+
+    Every job starts from a zeroed copy of tally, so that the result doesn't
+    depend on the order in which the jobs finished. Numeric entries are
+    summed, other entries take the value of the last job (in job order).
+
+    Args:
+        tally:
+            Tally at the start of the step
+        job_tally_list:
+            Tallies returned per job, in job order (None for failed jobs)
+    """
+    #| - merge_tallies
+    tally_out = copy.copy(tally)
+    for job_tally in job_tally_list:
+        if job_tally is None:
+            continue
+
+        for key, value in job_tally.items():
+            numeric = isinstance(value, (int, float)) and \
+                not isinstance(value, bool)
+
+            if numeric:
+                tally_out[key] = tally_out.get(key, 0) + value
+            else:
+                tally_out[key] = value
+
+    return(tally_out)
+    #__|
+
 #| - __OLD__
 
 def job_runnable(df, root_dir_beg, path_i):
@@ -243,6 +289,8 @@ class DFT_Jobs_Workflow:
         number_of_steps=1,
         root_dir=".",
         run_jobs=False,
+        executor="serial",
+        max_workers=None,
         ):
         """Initialize DFT_Jobs_Workflow instance.
 
@@ -260,6 +308,18 @@ class DFT_Jobs_Workflow:
             number_of_steps:
             root_dir:
             run_jobs:
+            executor:
+                Runs the setup_function/maint_function of the jobs of a step
+                in a pool ("serial", "thread", "process" or an Executor
+                instance, see executors.get_executor). Steps are still run
+                one after the other. A thread pool only suits hooks that
+                don't change or rely on the working directory: job
+                submission (submit_job) chdirs into the job folder and
+                writes .submission_params.json to the working directory,
+                which is shared by all threads. Hooks that submit jobs must
+                use "serial" or "process" (the latter requires the functions
+                and wf_vars to be picklable).
+            max_workers:
         """
         #| - __init__
         self.mod_dir = "dir_models"
@@ -293,6 +353,17 @@ class DFT_Jobs_Workflow:
 
         self.run_jobs = run_jobs
 
+        self.executor = executor
+        self.max_workers = max_workers
+
+        # Jobs whose setup_function/maint_function raised, and wall times of
+        # the preparation and maintenance passes (see __run_step_hooks__)
+        self.maint_errors = []
+        self.maint_timings = {"prep": {}, "maint": {}}
+
+        # PropagationPlanner instances, see propagation_planner
+        self.planners = {}
+
         self.root_dir = self.__set_cwd__(root_dir)
         # self.atoms_dict = create_atoms_list(
         #     atoms_list_names,
@@ -303,6 +374,9 @@ class DFT_Jobs_Workflow:
         self.step_dir_names = self.__set_step_dir_names__()
         self.model_names = self.__set_model_names__(model_names)
 
+        # Steps whose job list changed in __prep_dir_sys__
+        self.steps_to_refresh = []
+
         self.jobs_an_list = self.__create_jobs_an__()
 
         self.__create_parent_dirs__()
@@ -372,7 +446,11 @@ class DFT_Jobs_Workflow:
         #__|
 
     def __create_jobs_an__(self):
-        """Create Jobs_Analysis instances for each step of workflow."""
+        """Create Jobs_Manager instances for each step of workflow.
+
+        DFT_Jobs_Manager is a DFT_Jobs_Analysis, the same instances are used
+        as jobs_man_list so that every step folder is only scanned once.
+        """
         #| - __create_jobs_an__
         # print("PREPARING EXTENDED FOLDER SYSTEM")  #PERM_PRINT
         step_dir_names = self.step_dir_names
@@ -393,9 +471,10 @@ class DFT_Jobs_Workflow:
             indiv_dir_lst_tmp = self.indiv_dir_lst_list[step]
             indiv_job_lst_tmp = self.indiv_job_lst_list[step]
 
-            JobsAn = DFT_Jobs_Analysis(
+            JobsAn = DFT_Jobs_Manager(
                 tree_level=level_labels_tmp,
                 level_entries=level_entries_tmp,
+                skip_dirs_lst=None,
                 indiv_dir_lst=indiv_dir_lst_tmp,
                 indiv_job_lst=indiv_job_lst_tmp,
 
@@ -411,46 +490,39 @@ class DFT_Jobs_Workflow:
         #__|
 
     def __create_jobs_man__(self):
-        """Create Jobs_Manager instance(s)."""
-        #| - __create_jobs_man__
-        step_dir_names = self.step_dir_names
-        master_root_dir = self.root_dir
-
-        Jobs_Inst_list = []
-        for step in range(len(step_dir_names)):
-            # step_num = step + 1
-
-            level_labels_tmp = self.tree_level_labels_list[step]
-            level_entries_tmp = self.tree_level_values_list[step]
-
-            indiv_dir_lst_tmp = self.indiv_dir_lst_list[step]
-            indiv_job_lst_tmp = self.indiv_job_lst_list[step]
+        """Return Jobs_Manager instance(s).
 
-            Jobs = DFT_Jobs_Manager(
-
-
-                tree_level=level_labels_tmp,
-                level_entries=level_entries_tmp,
+        The instances of __create_jobs_an__ are reused, steps in which
+        __prep_dir_sys__ created folders have their job list rebuilt.
+        """
+        #| - __create_jobs_man__
+        for step in self.steps_to_refresh:
+            self.jobs_an_list[step].refresh_job_list()
+        self.steps_to_refresh = []
 
-                skip_dirs_lst=None,
-                indiv_dir_lst=indiv_dir_lst_tmp,  # <-----------------------------------------------
-                indiv_job_lst=indiv_job_lst_tmp,
+        return(self.jobs_an_list)
+        #__|
 
-                root_dir=master_root_dir,
-                working_dir=step_dir_names[step],
+    def propagation_planner(self, step, refresh=False):
+        """Return PropagationPlanner from step to step + 1 (1 based).
 
-                update_job_state=False,
-                load_dataframe=False,
+        The planner is built once per workflow instance and step, pass it to
+        copyfiles_onestep_up.
 
-                # tree_level=level_labels_tmp,
-                # level_entries=level_entries_tmp,
-                # working_dir=master_root_dir + "/" + step_dir_names[step],
-                # load_dataframe=False,
+        Args:
+            step:
+            refresh:
+                Rebuild the planner (e.g. after new revisions were created in
+                step + 1)
+        """
+        #| - propagation_planner
+        if refresh or step not in self.planners:
+            self.planners[step] = PropagationPlanner(
+                self.jobs_man_list[step - 1],
+                self.jobs_man_list[step],
                 )
 
-            Jobs_Inst_list.append(Jobs)
-
-        return(Jobs_Inst_list)
+        return(self.planners[step])
         #__|
 
     def __create_parent_dirs__(self):
@@ -490,15 +562,21 @@ class DFT_Jobs_Workflow:
             if True:
 
                 #| - Create Step Folder Structure
-                JobsAn.create_dir_struct(create_first_rev_folder="True")
-                #__|
+                new_paths = JobsAn.create_dir_struct(
+                    create_first_rev_folder="True",
+                    )
 
-                for Job_i in JobsAn.Job_list:
-                    path_i = Job_i.full_path
-
-                    job_i_params = Job_i.job_params
+                if len(new_paths) > 0 and step not in self.steps_to_refresh:
+                    self.steps_to_refresh.append(step)
+                #__|
 
-                    self.setup_function(step, path_i, job_i_params, wf_vars)
+                self.__run_step_hooks__(
+                    step,
+                    JobsAn,
+                    [self.setup_function],
+                    wf_vars,
+                    pass_name="prep",
+                    )
 
                 # for job_i in JobsAn.job_var_lst:
                 #     path_i = JobsAn.var_lst_to_path(
@@ -526,6 +604,99 @@ class DFT_Jobs_Workflow:
             open(master_root_dir + "/.FOLDERS_CREATED", "w")
         #__|
 
+    def __run_step_hooks__(self,
+        step,
+        Jobs,
+        hooks,
+        wf_vars,
+        tally=None,
+        pass_name="maint",
+        ):
+        """Run hooks on every job of a step with the workflow executor.
+
+        A job's hooks run in order, different jobs may run concurrently
+        (see the executor argument of __init__ for hooks that submit jobs).
+        Jobs that raise are recorded in self.maint_errors and don't stop the
+        other jobs. Wall times are stored in self.maint_timings[pass_name].
+
+        Returns the merged tally (see merge_tallies), None if tally is None.
+
+        Args:
+            step:
+            Jobs:
+                Jobs instance of step
+            hooks:
+                Functions to run per job, with a tally the last one is called
+                with (and must return) the job tally
+            wf_vars:
+            tally:
+            pass_name:
+                "prep" or "maint", key of self.maint_timings
+        """
+        #| - __run_step_hooks__
+        if tally is None:
+            job_tally = None
+        else:
+            job_tally = dict([(key, 0) for key in tally.keys()])
+
+        task_list = [
+            (
+                hooks,
+                step,
+                Job_i.full_path,
+                Job_i.job_params,
+                wf_vars,
+                copy.copy(job_tally),
+                )
+            for Job_i in Jobs.Job_list
+            ]
+
+        t_start = time.time()
+        out_list, time_list = map_timed(
+            run_job_hooks,
+            task_list,
+            executor=self.executor,
+            max_workers=self.max_workers,
+            allow_failure=False,
+            )
+        t_step = time.time() - t_start
+
+        #| - Errors
+        errors = [i["error"] for i in out_list if i["error"] is not None]
+        for error in errors:
+            error["pass"] = pass_name
+            print("Job failed: " + error["path"] + " | " + error["error"])
+
+        self.maint_errors.extend(errors)
+        #__|
+
+        #| - Timings
+        timings = {
+            "num_jobs": len(task_list),
+            "num_errors": len(errors),
+            "wall_time": t_step,
+            "job_time_total": sum(time_list),
+            "job_time_max": max(time_list) if len(time_list) > 0 else 0.,
+            "job_times": dict(zip([i[2] for i in task_list], time_list)),
+            }
+        self.maint_timings[pass_name][step] = timings
+
+        print(
+            "Step " + str(step + 1) + " " + pass_name + " | " +
+            str(timings["num_jobs"]) + " jobs | " +
+            str(round(t_step, 3)) + " s (jobs " +
+            str(round(timings["job_time_total"], 3)) + " s, max " +
+            str(round(timings["job_time_max"], 3)) + " s) | " +
+            str(len(errors)) + " errors"
+            )
+        #__|
+
+        if tally is None:
+            return(None)
+
+        return(merge_tallies(tally, [i["tally"] for i in out_list]))
+        #__|
+
     def __job_maint__(self):
         """Manage jobs after being submitted.
 
@@ -568,28 +739,15 @@ class DFT_Jobs_Workflow:
 
                 wf_vars = vars(self)
 
-                for Job_i in Jobs.Job_list:
-
-                    path_i = Job_i.full_path
-                    job_i_params = Job_i.job_params
-
-                    # Why is this being run again #COMBAK
-                    self.setup_function(step, path_i, job_i_params, wf_vars)
-
-                    # print(self.maint_function)
-                    # step_i,
-                    # job_i,
-                    # job_i_params,
-                    # wf_vars,
-                    # tally,
-
-                    tally = self.maint_function(
-                        step,
-                        path_i,
-                        job_i_params,
-                        wf_vars,
-                        tally,
-                        )
+                # Why is the setup_function being run again #COMBAK
+                tally = self.__run_step_hooks__(
+                    step,
+                    Jobs,
+                    [self.setup_function, self.maint_function],
+                    wf_vars,
+                    tally=tally,
+                    pass_name="maint",
+                    )
 
                 #| - __old__
                 # for job_i in Jobs.job_var_lst:
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Enumeration of job variable combinations of a job tree.
+
+Author: Raul A. Flores
+
+Every job of the tree (one entry per tree level) is addressed by a mixed
+radix integer, the digit of each level being the index of the job's value in
+that level's entries. The first level is the most significant digit so the
+job index follows the itertools.product ordering used to build job_var_lst.
+
+    level_entries = [["a", "b"], [1, 2, 3]]
+    ("a", 1) -> 0 | ("a", 3) -> 2 | ("b", 1) -> 3 | ("b", 3) -> 5
+
+Job variable lists have the same format as DFT_Jobs_Setup.job_var_lst
+entries:
+    [{"property": <level label>, "value": <level value>}, ...]
+"""
+
+#| - Import Modules
+import itertools
+#__|
+
+#| - Methods
+
+def hashable_key(obj):
+    """Return hashable version of obj (lists/dicts become tuples).
+
+    Args:
+        obj:
+    """
+    #| - hashable_key
+    if isinstance(obj, dict):
+        key = tuple(sorted(
+            [(hashable_key(k), hashable_key(v)) for k, v in obj.items()]
+            ))
+    elif isinstance(obj, (list, tuple)):
+        key = tuple([hashable_key(i) for i in obj])
+    else:
+        key = obj
+
+    return(key)
+    #__|
+
+def level_radices(level_entries):
+    """Return number of entries of every tree level.
+
+    Args:
+        level_entries:
+            List of lists of level values
+    """
+    #| - level_radices
+    return([len(i) for i in level_entries])
+    #__|
+
+def num_combinations(level_entries):
+    """Return total number of job combinations of the tree.
+
+    Args:
+        level_entries:
+    """
+    #| - num_combinations
+    num = 1
+    for radix in level_radices(level_entries):
+        num *= radix
+
+    return(num)
+    #__|
+
+def encode_index(digits, radices):
+    """Return mixed radix integer of digits (first digit most significant).
+
+    Args:
+        digits:
+        radices:
+    """
+    #| - encode_index
+    index = 0
+    for digit, radix in zip(digits, radices):
+        if digit < 0 or digit >= radix:
+            raise ValueError(
+                "Digit " + str(digit) + " out of range for radix " + str(radix)
+                )
+        index = index * radix + digit
+
+    return(index)
+    #__|
+
+def decode_index(index, radices):
+    """Return digits of mixed radix integer index.
+
+    Args:
+        index:
+        radices:
+    """
+    #| - decode_index
+    total = 1
+    for radix in radices:
+        total *= radix
+
+    if index < 0 or index >= total:
+        raise ValueError(
+            "Job index " + str(index) + " out of range (" + str(total) +
+            " combinations)"
+            )
+
+    digits = []
+    for radix in reversed(radices):
+        digits.append(index % radix)
+        index = index // radix
+    digits.reverse()
+
+    return(digits)
+    #__|
+
+def value_lookup_tables(level_entries):
+    """Return per level {hashable value: digit} dictionaries.
+
+    Args:
+        level_entries:
+    """
+    #| - value_lookup_tables
+    lookup_tables = []
+    for entries_i in level_entries:
+        table_i = {}
+        for digit, value in enumerate(entries_i):
+            # First occurrence wins, same as list.index
+            table_i.setdefault(hashable_key(value), digit)
+        lookup_tables.append(table_i)
+
+    return(lookup_tables)
+    #__|
+
+def var_lst_from_index(index, tree_level_labels, level_entries):
+    """Return job variable list of job index.
+
+    Args:
+        index:
+        tree_level_labels:
+        level_entries:
+    """
+    #| - var_lst_from_index
+    digits = decode_index(index, level_radices(level_entries))
+
+    var_lst = []
+    for label, entries_i, digit in zip(tree_level_labels, level_entries, digits):
+        var_lst.append({"property": label, "value": entries_i[digit]})
+
+    return(var_lst)
+    #__|
+
+def index_from_var_lst(
+    var_lst,
+    tree_level_labels,
+    level_entries,
+    lookup_tables=None,
+    ):
+    """Return job index of job variable list.
+
+    Raises ValueError if var_lst isn't a job of the tree.
+
+    Args:
+        var_lst:
+        tree_level_labels:
+        level_entries:
+        lookup_tables:
+            Output of value_lookup_tables, computed if not given
+    """
+    #| - index_from_var_lst
+    if lookup_tables is None:
+        lookup_tables = value_lookup_tables(level_entries)
+
+    if len(var_lst) != len(tree_level_labels):
+        raise ValueError("Job variable list doesn't match the tree levels")
+
+    digits = []
+    for entry, label, table_i in zip(var_lst, tree_level_labels, lookup_tables):
+        if set(entry.keys()) != set(["property", "value"]):
+            raise ValueError("Invalid job variable entry: " + str(entry))
+
+        if entry["property"] != label:
+            raise ValueError(
+                "Property " + str(entry["property"]) + " doesn't match tree" +
+                " level " + str(label)
+                )
+
+        digit = table_i.get(hashable_key(entry["value"]), None)
+        if digit is None:
+            raise ValueError(
+                "Value " + str(entry["value"]) + " not in level " + str(label)
+                )
+
+        digits.append(digit)
+
+    index = encode_index(digits, level_radices(level_entries))
+
+    return(index)
+    #__|
+
+def skip_index_set(skip_dirs_lst, tree_level_labels, level_entries):
+    """Return set of job indices of the jobs to skip.
+
+    Raises ValueError for skip entries that aren't jobs of the tree or that
+    are repeated.
+
+    Args:
+        skip_dirs_lst:
+            List of job variable lists
+        tree_level_labels:
+        level_entries:
+    """
+    #| - skip_index_set
+    skip_set = set()
+    if skip_dirs_lst is None:
+        return(skip_set)
+
+    lookup_tables = value_lookup_tables(level_entries)
+    for skip in skip_dirs_lst:
+        index = index_from_var_lst(
+            skip,
+            tree_level_labels,
+            level_entries,
+            lookup_tables=lookup_tables,
+            )
+
+        if index in skip_set:
+            raise ValueError("Job skipped more than once: " + str(skip))
+
+        skip_set.add(index)
+
+    return(skip_set)
+    #__|
+
+def iter_job_var_lst(
+    tree_level_labels,
+    level_entries,
+    skip_set=None,
+    with_index=False,
+    ):
+    """Yield the job variable lists of the tree in job index order.
+
+    Args:
+        tree_level_labels:
+        level_entries:
+        skip_set:
+            Job indices not to yield (see skip_index_set)
+        with_index:
+            If True, (job index, job variable list) tuples are yielded
+    """
+    #| - iter_job_var_lst
+    if skip_set is None:
+        skip_set = set()
+
+    all_comb = itertools.product(*level_entries)
+    for index, job_dir in enumerate(all_comb):
+        if index in skip_set:
+            continue
+
+        var_lst = []
+        for label, value in zip(tree_level_labels, job_dir):
+            var_lst.append({"property": label, "value": value})
+
+        if with_index:
+            yield (index, var_lst)
+        else:
+            yield var_lst
+    #__|
+
+#__|
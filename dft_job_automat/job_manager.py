@@ -18,6 +18,9 @@ import pickle as pickle
 
 # My Modules
 from dft_job_automat.job_analysis import DFT_Jobs_Analysis
+from dft_job_automat.job_registry import JobRegistry
+from dft_job_automat.revision_clone import RevisionCloner
+from dft_job_automat import job_control
 # from aws.aws_class import AWS_Queues
 #__|
 
@@ -39,6 +42,7 @@ class DFT_Jobs_Manager(DFT_Jobs_Analysis):
         working_dir=".",
         update_job_state=False,
         load_dataframe=True,
+        revision_cloner=None,
         ):
         """Initialize Jobs_Manager instance.
 
@@ -49,13 +53,16 @@ class DFT_Jobs_Manager(DFT_Jobs_Analysis):
             working_dir:
             update_job_state:
             load_dataframe:
+            revision_cloner:
+                revision_clone.RevisionCloner used to carry files over to new
+                revisions, defaults to RevisionCloner()
 
         TEMP TEMP
         """
         #| - __init__
-
-
-
+        if revision_cloner is None:
+            revision_cloner = RevisionCloner()
+        self.revision_cloner = revision_cloner
 
         DFT_Jobs_Analysis.__init__(self,
             # # system=system,
@@ -197,26 +204,64 @@ class DFT_Jobs_Manager(DFT_Jobs_Analysis):
                 are obtained from the /simulation folder or the origial job dir.
         """
         #| - copy_files_from_last_revision
+        pair_list = self.__revision_file_pairs__(
+            files_list,
+            job_i,
+            revisions=revisions,
+            source_rev=source_rev,
+            from_simulation_folder=from_simulation_folder,
+            )
 
-        # COMBAK
-        def copy_if_not_in_dest(source, dest_file):
-            """
-            Copy file from source to destionation.
+        results = self.revision_cloner.clone_files(
+            pair_list,
+            allow_failure=False,
+            )
+        self.__print_clone_results__(results)
+        #__|
 
-            Args:
-                dest_file:
-            """
-            #| - copy_if_not_in_dest
-            if not os.path.isfile(dest_file):
+    def __print_clone_results__(self, results):
+        """Print files carried over to a new revision.
 
-                shutil.copy(source, dest_file)
-                source_fle = source.split("/")[-1]
+        Args:
+            results:
+                Output of RevisionCloner.clone_files
+        """
+        #| - __print_clone_results__
+        verb_dict = {
+            "copy": "copied",
+            "reflink": "cloned",
+            "hardlink": "linked",
+            "error": "failed",
+            }
+
+        for result in results:
+            if result["strategy"] is None:
+                continue
 
-                print("File " + str(source_fle) + " copied")
-            else:
-                pass
-            #__|
+            source_fle = result["source"].split("/")[-1]
+            print(
+                "File " + str(source_fle) + " " +
+                verb_dict.get(result["strategy"], result["strategy"])
+                )
+        #__|
+
+    def __revision_file_pairs__(self,
+        files_list,
+        job_i,
+        revisions="Auto",
+        source_rev=None,
+        from_simulation_folder=True,
+        ):
+        """Return (source, dest) file pairs of copy_files_from_last_revision.
 
+        Args:
+            files_list:
+            job_i:
+            revisions:
+            source_rev:
+            from_simulation_folder:
+        """
+        #| - __revision_file_pairs__
         job_path = self.var_lst_to_path(
             job_i,
             job_rev=False,
@@ -236,31 +281,132 @@ class DFT_Jobs_Manager(DFT_Jobs_Analysis):
             rev_dest = revisions[1]
             rev_source = revisions[0]
 
-        dest_dir = job_path + "_" + str(rev_dest)
-        source_dir = job_path + "_" + str(rev_source)
+        dest_dir = os.path.join(job_path, "_" + str(rev_dest))
+        source_dir = os.path.join(job_path, "_" + str(rev_source))
 
-        for file_i in files_list:
-
-            #| - Copy Files to Directory in New Step
-
-            if from_simulation_folder is True:
-                data_d = self.cluster.cluster.job_data_dir
-            else:
-                data_d = ""
+        if from_simulation_folder is True:
+            data_d = self.cluster.cluster.job_data_dir
+        else:
+            data_d = ""
 
+        pair_list = []
+        for file_i in files_list:
             if type(file_i) == str:
-                copy_if_not_in_dest(
+                pair_list.append((
                     source_dir + data_d + "/" + file_i,
                     dest_dir + "/" + file_i,
-                    )
+                    ))
 
             elif type(file_i) == list:
-                copy_if_not_in_dest(
+                pair_list.append((
                     source_dir + data_d + "/" + file_i[0],
                     dest_dir + "/" + file_i[1],
+                    ))
+
+        return(pair_list)
+        #__|
+
+    def restart_jobs(self,
+        job_list,
+        prev_rev_files_list,
+        root_dir=".",
+        file_list=None,
+        sub_params=None,
+        source_rev=None,
+        from_simulation_folder=True,
+        run_job=False,
+        executor="thread",
+        max_workers=None,
+        ):
+        """Restart many jobs, carrying files over with a worker pool.
+
+        Same as calling restart_job for every job, except that the files of
+        all jobs are cloned in one pass with self.revision_cloner's strategies.
+        Revision folders are created (and jobs submitted) serially.
+
+        Returns RevisionCloner.clone_files results of all the files.
+
+        Args:
+            job_list:
+                List of job variable lists
+            prev_rev_files_list:
+            root_dir:
+            file_list:
+                Files of root_dir copied into the new revision folders
+            sub_params:
+            source_rev:
+            from_simulation_folder:
+            run_job:
+            executor:
+                See executors.get_executor
+            max_workers:
+        """
+        #| - restart_jobs
+        pair_list = []
+        for job_i in job_list:
+            self.create_job_dir(job_i, revision="Auto")
+
+            pair_list.extend(self.__revision_file_pairs__(
+                prev_rev_files_list,
+                job_i,
+                revisions="Auto",
+                source_rev=source_rev,
+                from_simulation_folder=from_simulation_folder,
+                ))
+
+            if file_list is not None:
+                dest_dir = self.var_lst_to_path(
+                    job_i,
+                    job_rev="Auto",
+                    relative_path=False,
                     )
-            #__|
 
+                for file_i in file_list:
+                    if type(file_i) == str:
+                        file_i = [file_i, file_i]
+
+                    pair_list.append((
+                        root_dir + "/" + file_i[0],
+                        dest_dir + "/" + file_i[1],
+                        ))
+
+        cloner = RevisionCloner(
+            policy=self.revision_cloner.policy,
+            default_strategy=self.revision_cloner.default_strategy,
+            overwrite=self.revision_cloner.overwrite,
+            executor=executor,
+            max_workers=max_workers,
+            )
+
+        results = cloner.clone_files(pair_list, allow_failure=True)
+
+        for result in results:
+            if result["strategy"] == "error":
+                print(
+                    "File copy failed: " + result["dest"] + " | " +
+                    result["error"]
+                    )
+
+        summary = cloner.summary(results)
+        print("Restarted " + str(len(job_list)) + " jobs | " + str(summary))
+
+        if run_job:
+            for job_i in job_list:
+                path_i = self.var_lst_to_path(
+                    job_i,
+                    job_rev="Auto",
+                    relative_path=False,
+                    )
+
+                if sub_params is None:
+                    params_dict = {}
+                else:
+                    params_dict = dict(sub_params)
+                params_dict["path_i"] = path_i
+
+                self.submit_job(**params_dict)
+
+        return(results)
         #__|
 
     def submit_job(self, **kwargs):
@@ -275,6 +421,33 @@ class DFT_Jobs_Manager(DFT_Jobs_Analysis):
         self.cluster.submit_job(**kwargs)
         #__|
 
+    def submit_job_array(self, params_list, max_array_size=1000):
+        """Submit jobs in bulk, grouped into job arrays where supported.
+
+        The array index files and driver scripts are written to
+        jobs_bin/job_arrays
+
+        Args:
+            params_list:
+                List of submission parameter dicts (one per job)
+            max_array_size:
+        """
+        #| - submit_job_array
+        array_dir = os.path.join(
+            self.root_dir,
+            self.working_dir,
+            "jobs_bin/job_arrays",
+            )
+
+        array_list = self.cluster.submit_job_array(
+            params_list,
+            array_dir=array_dir,
+            max_array_size=max_array_size,
+            )
+
+        return(array_list)
+        #__|
+
     def remove_rev_folder(self, revision_number):
         """Remove revision job folder in all jobs directories.
 
@@ -284,21 +457,45 @@ class DFT_Jobs_Manager(DFT_Jobs_Analysis):
         #| - remove_rev_folder
         print("Removing job revision folder " + str(revision_number))
 
+        rev_dir = "_" + str(revision_number)
         for job in self.job_var_lst:
-            path = self.var_lst_to_path(job)
+            path = self.var_lst_to_path(
+                job,
+                job_rev="False",
+                relative_path=False,
+                )
+
+            shutil.rmtree(os.path.join(path, rev_dir))
+            self.rev_index.remove_revision(path, rev_dir)
 
-            shutil.rmtree(path + "_" + str(revision_number))
+        self.rev_index.save()
         #__|
 
-    def restart_job_2(self, prev_rev_file_list=[], root_dir_file_list=[]):
+    def restart_job_2(self,
+        prev_rev_file_list=[],
+        root_dir_file_list=[],
+        queue="medium",
+        cpus=4,
+        trisub_cmd=None,
+        ):
         """
         Restart jobs - attempt 2.
 
+        The new revision folders are submitted together after all of them are
+        prepared (single trisub loop, see job_control.submit_trisub).
+
         Args:
             prev_rev_file_list:
             root_dir_file_list:
+            queue:
+            cpus:
+            trisub_cmd:
+                Defaults to $HOME/matr.io/bin/trisub, as before
+
+        Returns dataframe with one row per submitted folder.
         """
         #| - restart_job_2
+        new_path_list = []
         for index, row in self.data_frame.iterrows():
             if row["job_state"] == "error":
                 #| - Body
@@ -306,9 +503,13 @@ class DFT_Jobs_Manager(DFT_Jobs_Analysis):
                 path = row["path"]
                 rev_n = self.job_revision_number(job)
 
-                first_path = path + "_1"
-                prev_path = path + "_" + str(rev_n)
-                new_path = path + "_" + str(rev_n + 1)
+                # "path" is the revision folder of the job
+                if os.path.basename(os.path.normpath(path)).startswith("_"):
+                    path = os.path.dirname(os.path.normpath(path))
+
+                first_path = os.path.join(path, "_1")
+                prev_path = os.path.join(path, "_" + str(rev_n))
+                new_path = os.path.join(path, "_" + str(rev_n + 1))
 
                 # if stop == True:
                 #     break
@@ -335,16 +536,25 @@ class DFT_Jobs_Manager(DFT_Jobs_Analysis):
 
                 os.system("chmod 777 " + new_path + "/*")
 
-                os.chdir(new_path)
-                print("Submitting Folder: " + new_path)
-
-                bash_command = "$HOME/matr.io/bin/trisub -q medium -c 4"
-                os.system(bash_command)
-
-                os.chdir(self.root_dir)
+                new_path_list.append(new_path)
                 #__|
             else:
                 continue
+
+        if trisub_cmd is None:
+            trisub_cmd = os.path.expandvars("$HOME/matr.io/bin/trisub")
+
+        print("Submitting " + str(len(new_path_list)) + " folders")
+        results = job_control.submit_trisub(
+            new_path_list,
+            trisub_cmd=trisub_cmd,
+            queue=queue,
+            cpus=cpus,
+            registry=self.cluster.job_registry(),
+            )
+        print("Submitted jobs | " + str(job_control.summarize(results)))
+
+        return(pd.DataFrame(results))
         #__|
 
     def copy_files_jd(self, file_list, variable_lst, revision="Auto"):
@@ -382,17 +592,21 @@ class DFT_Jobs_Manager(DFT_Jobs_Analysis):
         # print(path)
         if revision == "Auto":
             rev = self.job_revision_number(variable_lst) + 1
-            path += "_" + str(rev)
+            path = os.path.join(path, "_" + str(rev))
 
             if not os.path.exists(path):
                 print("Creating revision folder " + str(rev))  # PRINT
                 os.makedirs(path)
+                self.rev_index.add_revision_path(path)
 
-            else:
-                path += "_" + str(revision)
+        else:
+            path = os.path.join(path, "_" + str(revision))
 
-                if not os.path.exists(path):
-                    os.makedirs(path)
+            if not os.path.exists(path):
+                os.makedirs(path)
+                self.rev_index.add_revision_path(path)
+
+        self.rev_index.save()
 
         #__|
 
@@ -512,31 +726,103 @@ class DFT_Jobs_Manager(DFT_Jobs_Analysis):
 
         #__|
 
-    def cancel_jobs(self, state="RUNNABLE"):
+    def cancel_jobs(self, state="RUNNABLE", max_workers=8):
         """
-        Cancel jobs that are in RUNNABLE state.
+        Cancel jobs of the project that are in state (job registry, AWS).
+
+        Returns dataframe with one row per job (see job_control).
 
         Args:
             state:
+            max_workers:
+                Concurrent AWS Batch calls
         """
         #| - cancel_jobs
-        jobs_file_path = self.job_queue_dir + "/jobs.csv"
-        df = pd.read_csv(jobs_file_path)
+        registry = self.cluster.job_registry()
+        if registry is None:
+            print("No job registry for this cluster, no jobs cancelled")
+            return(pd.DataFrame([]))
+
+        df_proj = registry.to_dataframe(
+            registry.jobs_path_contains(self.root_dir_short),
+            )
+
+        job_id_list = []
+        if len(df_proj) > 0:
+            df_state = df_proj[df_proj["job_status"] == state]
+            job_id_list = df_state["job_id"].tolist()
+
+        results = job_control.cancel_job_ids(
+            self.cluster.cluster,
+            job_id_list,
+            max_workers=max_workers,
+            )
 
-        df_proj = df[df["job_path"].str.contains(self.root_dir_short)]
+        registry.update_status(dict([
+            (i["job_id"], "CANCELLED") for i in results
+            if i["status"] == "cancelled"
+            ]))
 
-        return(df_proj)
+        return(pd.DataFrame(results))
         #__|
 
-    def update_jobs_queue_file(self):
+    def cancel_job_list(self,
+        path_list=None,
+        chunk_size=200,
+        max_workers=8,
+        ):
+        """Cancel the jobs of many job folders with batched scheduler calls.
+
+        Multi id scancel/bkill calls on SLURM/LSF clusters, concurrent
+        terminate_job calls on AWS.
+
+        Returns dataframe with one row per job folder (see job_control).
+
+        Args:
+            path_list:
+                Job folders, defaults to the latest revision of every job
+            chunk_size:
+                Job ids per scancel/bkill call
+            max_workers:
+                Concurrent AWS Batch calls
         """
-        # COMBAK Set this up.
+        #| - cancel_job_list
+        if path_list is None:
+            path_list = [Job_i.full_path for Job_i in self.Job_list]
+
+        results = job_control.cancel_job_paths(
+            self.cluster.cluster,
+            path_list,
+            chunk_size=chunk_size,
+            max_workers=max_workers,
+            )
+
+        print("Cancelled jobs | " + str(job_control.summarize(results)))
 
-        TMP
+        return(pd.DataFrame(results))
+        #__|
+
+    def update_jobs_queue_file(self):
+        """Refresh job statuses in the job registry and write jobs.csv.
+
+        Only unfinished jobs are queried (in bulk), the jobs.csv file is
+        exported for tools still reading the old file.
         """
         #| - update_jobs_queue_file
-        tmp = 42
-        print(tmp)
+        registry = self.cluster.job_registry()
+        if registry is None:
+            return(None)
+
+        if hasattr(self.cluster.cluster, "update_job_registry"):
+            self.cluster.cluster.update_job_registry()
+
+        csv_file = os.path.join(
+            os.path.dirname(registry.db_file),
+            JobRegistry.csv_fle,
+            )
+        registry.export_csv(csv_file)
+
+        return(csv_file)
         #__|
 
     #__| **********************************************************************
@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""SQLite registry of submitted jobs (replaces the jobs.csv file).
+
+Author: Raul A. Flores
+
+One row per submitted job with the same fields as the jobs.csv file
+(job_id, job_path, job_name, job_status, job_queue, job_cpus, job_ram,
+submit_time). Lookups by job id and job path are indexed and rows are
+inserted/updated in a single transaction per batch, so submitting N jobs no
+longer rewrites the whole file N times.
+
+The database uses write-ahead logging (WAL) and a busy timeout, so several
+processes can submit jobs concurrently. Write transactions are started with
+BEGIN IMMEDIATE so that concurrent writers wait on each other instead of
+failing.
+
+WAL needs shared memory between all processes using the database, which
+network filesystems (NFS, Lustre, ...) don't provide. A database on a network
+filesystem (e.g. a job queue dir shared between nodes) therefore uses the
+rollback journal (journal_mode=DELETE) instead.
+
+Development Notes:
+    The jobs.csv file of a job queue dir is imported once, the first time
+    the registry is created next to it (see JobRegistry.import_csv)
+"""
+
+#| - Import Modules
+import os
+import json
+import sqlite3
+from contextlib import contextmanager
+
+import pandas as pd
+#__|
+
+#| - Module Variables
+# Filesystem types (/proc/mounts) on which WAL mode is not safe
+NETWORK_FS_TYPES = [
+    "nfs",
+    "nfs4",
+    "cifs",
+    "smbfs",
+    "smb3",
+    "lustre",
+    "gpfs",
+    "beegfs",
+    "ceph",
+    "glusterfs",
+    "fuse.sshfs",
+    "fuse.glusterfs",
+    "fuse.s3fs",
+    "9p",
+    ]
+#__|
+
+#| - Methods
+def is_network_fs(path):
+    """Return True if path is on a network filesystem (see /proc/mounts).
+
+    Returns False if the filesystem type can't be determined.
+
+    Args:
+        path:
+    """
+    #| - is_network_fs
+    path = os.path.realpath(path)
+
+    try:
+        with open("/proc/mounts", "r") as fle:
+            mounts = [line.split() for line in fle]
+    except (IOError, OSError):
+        return(False)
+
+    # Longest mount point containing path
+    mount_point = ""
+    fs_type = None
+    for mount in mounts:
+        if len(mount) < 3:
+            continue
+
+        mount_i = mount[1].replace("\\040", " ")
+        if path == mount_i or path.startswith(mount_i.rstrip("/") + "/"):
+            if len(mount_i) >= len(mount_point):
+                mount_point = mount_i
+                fs_type = mount[2]
+
+    return(fs_type in NETWORK_FS_TYPES)
+    #__|
+#__|
+
+
+class JobRegistry():
+    """Registry of submitted jobs backed by an SQLite database."""
+
+    #| - JobRegistry **********************************************************
+
+    #| - Class Variables
+    # Column order of the jobs.csv file
+    csv_columns = [
+        "job_status",
+        "job_path",
+        "job_id",
+        "job_ram",
+        "job_queue",
+        "job_cpus",
+        "job_name",
+        "submit_time",
+        ]
+
+    db_fle = "jobs.sqlite"
+    csv_fle = "jobs.csv"
+    #__|
+
+    def __init__(self,
+        db_file,
+        timeout=60.,
+        import_csv=True,
+        journal_mode=None,
+        ):
+        """Initialize JobRegistry instance.
+
+        Args:
+            db_file:
+                SQLite database file
+            timeout:
+                Seconds to wait for a lock held by another process
+            import_csv:
+                If True and the database is new, the jobs.csv file in the same
+                folder is imported
+            journal_mode:
+                SQLite journal mode, by default "WAL" on local disks and
+                "DELETE" on network filesystems (see is_network_fs)
+        """
+        #| - __init__
+        self.db_file = db_file
+        self.timeout = timeout
+
+        db_dir = os.path.dirname(os.path.abspath(db_file))
+        if not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+
+        if journal_mode is None:
+            if is_network_fs(db_dir):
+                journal_mode = "DELETE"
+            else:
+                journal_mode = "WAL"
+        self.journal_mode = journal_mode
+
+        self.conn = sqlite3.connect(
+            db_file,
+            timeout=timeout,
+            isolation_level=None,
+            )
+        self.conn.row_factory = sqlite3.Row
+
+        self.__init_db__()
+
+        if import_csv:
+            csv_file = os.path.join(db_dir, JobRegistry.csv_fle)
+            if os.path.isfile(csv_file) and not self.__csv_imported__():
+                self.import_csv(csv_file)
+        #__|
+
+    def __init_db__(self):
+        """Set pragmas and create tables/indices if needed."""
+        #| - __init_db__
+        self.conn.execute("PRAGMA journal_mode=" + self.journal_mode)
+        self.conn.execute(
+            "PRAGMA busy_timeout=" + str(int(self.timeout * 1000))
+            )
+
+        with self.__transaction__() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, "
+                "job_path TEXT, "
+                "job_name TEXT, "
+                "job_status TEXT, "
+                "job_queue TEXT, "
+                "job_cpus TEXT, "
+                "job_ram TEXT, "
+                "submit_time TEXT, "
+                "extra TEXT, "
+                "seq INTEGER"
+                ")"
+                )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_path_index ON jobs (job_path)"
+                )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, "
+                "value TEXT)"
+                )
+        #__|
+
+    @contextmanager
+    def __transaction__(self):
+        """Write transaction (BEGIN IMMEDIATE ... COMMIT/ROLLBACK)."""
+        #| - __transaction__
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except:
+            self.conn.execute("ROLLBACK")
+            raise
+        else:
+            self.conn.execute("COMMIT")
+        #__|
+
+    def close(self):
+        """Close database connection."""
+        #| - close
+        self.conn.close()
+        #__|
+
+    #| - Writing **************************************************************
+    def __row_values__(self, job_dict, seq):
+        """Return row tuple of job queue dict (unknown keys go to 'extra')."""
+        #| - __row_values__
+        columns = ["job_path", "job_name", "job_status", "job_queue",
+            "job_cpus", "job_ram", "submit_time"]
+
+        extra = dict([
+            (k, v) for k, v in job_dict.items()
+            if k not in columns and k != "job_id"
+            ])
+
+        def to_str(value):
+            if value is None:
+                return(None)
+            try:
+                if pd.isnull(value):
+                    return(None)
+            except (TypeError, ValueError):
+                pass
+            return(str(value))
+
+        row = [str(job_dict["job_id"])]
+        row += [to_str(job_dict.get(i, None)) for i in columns]
+        row += [json.dumps(extra, default=str), seq]
+
+        return(tuple(row))
+        #__|
+
+    def add_jobs(self, job_dict_list):
+        """Insert (or replace) jobs in a single transaction.
+
+        Args:
+            job_dict_list:
+                List of job queue dicts, must contain "job_id"
+        """
+        #| - add_jobs
+        with self.__transaction__() as conn:
+            self.__insert_jobs__(conn, job_dict_list)
+        #__|
+
+    def __insert_jobs__(self, conn, job_dict_list):
+        """Insert (or replace) jobs, inside of an open write transaction."""
+        #| - __insert_jobs__
+        seq_0 = conn.execute(
+            "SELECT COALESCE(MAX(seq), -1) + 1 FROM jobs"
+            ).fetchone()[0]
+
+        rows = [
+            self.__row_values__(job_dict, seq_0 + i_ind)
+            for i_ind, job_dict in enumerate(job_dict_list)
+            ]
+
+        conn.executemany(
+            "INSERT OR REPLACE INTO jobs (job_id, job_path, job_name, "
+            "job_status, job_queue, job_cpus, job_ram, submit_time, "
+            "extra, seq) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+            )
+        #__|
+
+    def add_job(self, job_dict):
+        """Insert (or replace) single job.
+
+        Args:
+            job_dict:
+        """
+        #| - add_job
+        self.add_jobs([job_dict])
+        #__|
+
+    def update_status(self, status_dict):
+        """Update job_status of jobs in a single transaction.
+
+        Args:
+            status_dict:
+                {job_id: job_status}
+        """
+        #| - update_status
+        with self.__transaction__() as conn:
+            conn.executemany(
+                "UPDATE jobs SET job_status = ? WHERE job_id = ?",
+                [(str(v), str(k)) for k, v in status_dict.items()],
+                )
+        #__|
+
+    def remove_jobs(self, job_id_list):
+        """Remove jobs from registry.
+
+        Args:
+            job_id_list:
+        """
+        #| - remove_jobs
+        with self.__transaction__() as conn:
+            conn.executemany(
+                "DELETE FROM jobs WHERE job_id = ?",
+                [(str(i), ) for i in job_id_list],
+                )
+        #__|
+    #__| **********************************************************************
+
+    #| - Queries **************************************************************
+    def __row_to_dict__(self, row):
+        """Convert database row to job queue dict."""
+        #| - __row_to_dict__
+        job_dict = dict([
+            (k, row[k]) for k in row.keys() if k not in ["extra", "seq"]
+            ])
+
+        if row["extra"]:
+            job_dict.update(json.loads(row["extra"]))
+
+        return(job_dict)
+        #__|
+
+    def get_job(self, job_id):
+        """Return job queue dict of job_id (None if not in registry).
+
+        Args:
+            job_id:
+        """
+        #| - get_job
+        row = self.conn.execute(
+            "SELECT * FROM jobs WHERE job_id = ?",
+            (str(job_id), ),
+            ).fetchone()
+
+        if row is None:
+            return(None)
+
+        return(self.__row_to_dict__(row))
+        #__|
+
+    def jobs_by_path(self, job_path):
+        """Return job queue dicts with job_path (in order of submission).
+
+        Args:
+            job_path:
+        """
+        #| - jobs_by_path
+        rows = self.conn.execute(
+            "SELECT * FROM jobs WHERE job_path = ? ORDER BY seq",
+            (job_path, ),
+            ).fetchall()
+
+        return([self.__row_to_dict__(row) for row in rows])
+        #__|
+
+    def jobs_path_contains(self, path_substring):
+        """Return job queue dicts whose job_path contains path_substring.
+
+        Args:
+            path_substring:
+        """
+        #| - jobs_path_contains
+        rows = self.conn.execute(
+            "SELECT * FROM jobs WHERE instr(job_path, ?) > 0 ORDER BY seq",
+            (path_substring, ),
+            ).fetchall()
+
+        return([self.__row_to_dict__(row) for row in rows])
+        #__|
+
+    def to_dataframe(self, job_dict_list=None):
+        """Return registry (or job_dict_list) as a jobs.csv like dataframe.
+
+        Args:
+            job_dict_list:
+                Output of one of the query methods, whole registry by default
+        """
+        #| - to_dataframe
+        if job_dict_list is None:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs ORDER BY seq"
+                ).fetchall()
+            job_dict_list = [self.__row_to_dict__(row) for row in rows]
+
+        df = pd.DataFrame(job_dict_list)
+
+        columns = [i for i in JobRegistry.csv_columns if i in df.columns]
+        columns += [i for i in df.columns if i not in columns]
+
+        if len(df) == 0:
+            df = pd.DataFrame(columns=JobRegistry.csv_columns)
+        else:
+            df = df[columns]
+
+        return(df)
+        #__|
+    #__| **********************************************************************
+
+    #| - CSV Import/Export ****************************************************
+    def __csv_imported__(self):
+        """Return True if a jobs.csv file has already been imported."""
+        #| - __csv_imported__
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'csv_imported'"
+            ).fetchone()
+
+        return(row is not None)
+        #__|
+
+    def import_csv(self, csv_file):
+        """Import jobs from jobs.csv file (one-shot migration).
+
+        Returns the number of imported jobs. The jobs and the csv_imported
+        flag are written in one transaction, which is skipped if another
+        process has imported the file in the meantime.
+
+        Args:
+            csv_file:
+        """
+        #| - import_csv
+        df = pd.read_csv(csv_file, dtype=str)
+        df = df[df["job_id"].notnull()]
+
+        job_dict_list = df.to_dict(orient="records")
+
+        with self.__transaction__() as conn:
+            if self.__csv_imported__():
+                return(0)
+
+            self.__insert_jobs__(conn, job_dict_list)
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                ("csv_imported", os.path.abspath(csv_file)),
+                )
+
+        print("Imported " + str(len(job_dict_list)) + " jobs from " + csv_file)
+
+        return(len(job_dict_list))
+        #__|
+
+    def export_csv(self, csv_file):
+        """Write registry to csv file with the jobs.csv layout.
+
+        Args:
+            csv_file:
+        """
+        #| - export_csv
+        df = self.to_dataframe()
+        df.to_csv(csv_file, index=False)
+        #__|
+    #__| **********************************************************************
+
+    #__| **********************************************************************
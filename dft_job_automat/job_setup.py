@@ -13,6 +13,7 @@ import shutil
 import itertools
 import pickle
 import json
+import copy
 
 import numpy as np
 import pandas as pd
@@ -21,6 +22,57 @@ import ast
 
 # My Modules
 from dft_job_automat.compute_env import ComputerCluster
+from dft_job_automat.revision_index import RevisionIndex
+from dft_job_automat.job_enumeration import (
+    iter_job_var_lst,
+    skip_index_set,
+    var_lst_from_index,
+    index_from_var_lst,
+    )
+#__|
+
+#| - Job Parameter File Cache
+# {file_path: ((size, mtime), parsed json)}, stamp and value are None if the
+# file doesn't exist
+# Parameter files in the job root dir (one level up from the "_" dirs) are
+# shared by all revisions of a job, lazy Job instances read them only once
+# (again if the file is rewritten, ex. by a workflow setup_function)
+JOB_PARAMS_FILE_CACHE = {}
+
+def read_job_params_file_cached(file_path):
+    """Return parsed json file (None if it doesn't exist), memoised.
+
+    The file is parsed again if its size or mtime changed.
+
+    Args:
+        file_path:
+    """
+    #| - read_job_params_file_cached
+    try:
+        stat = os.stat(file_path)
+        stamp = (stat.st_size, stat.st_mtime)
+    except OSError:
+        stamp = None
+
+    entry = JOB_PARAMS_FILE_CACHE.get(file_path, None)
+    if entry is None or entry[0] != stamp:
+        value = None
+        if stamp is not None:
+            with open(file_path, "r") as fle:
+                value = json.load(fle)
+
+        entry = (stamp, value)
+        JOB_PARAMS_FILE_CACHE[file_path] = entry
+
+    return(entry[1])
+    #__|
+
+def clear_job_params_cache():
+    """Clear memoised job parameter files (ex. after editing them)."""
+    #| - clear_job_params_cache
+    JOB_PARAMS_FILE_CACHE.clear()
+    #__|
+
 #__|
 
 
@@ -37,6 +89,7 @@ class Job:
         max_revision=None,
 
         root_dir=None,
+        lazy=False,
         ):
         """COMBAK Flesh this out later.
 
@@ -47,18 +100,39 @@ class Job:
                 Job parameter dictionary
             max_revision:
                 Max revisions for unique job, defined by the set of job params
+            lazy:
+                If True, the job parameter files are read the first time
+                job_params is accessed (parent dir files are shared between
+                all Job instances)
         """
         #| - __init__
         self.full_path = path_i
         self.job_params_dict = job_params_dict
         self.max_revision = max_revision
         self.root_dir = root_dir
+        self.lazy = lazy
 
         # Class Methods
-        self.job_params = self.__set_job_parameters__(job_params_dict)
+        if not lazy:
+            self.job_params = self.__set_job_parameters__(job_params_dict)
         self.revision_number = self.__revision_number__()
         #__|
 
+    def __getattr__(self, name):
+        """Read job parameters on first access of job_params (lazy mode).
+
+        Only called if the attribute isn't found the normal way.
+        """
+        #| - __getattr__
+        if name == "job_params" and self.__dict__.get("lazy", False):
+            job_params = self.__set_job_parameters__(self.job_params_dict)
+            self.__dict__["job_params"] = job_params
+
+            return(job_params)
+
+        raise AttributeError(name)
+        #__|
+
     def __set_job_parameters__(self, job_params_dict):
         """
 
@@ -84,6 +158,10 @@ class Job:
         Args:
         """
         #| - __read_job_params_file__
+        if self.lazy:
+            job_params = self.__read_job_params_file_cached__()
+            return(job_params)
+
         job_params = {}
 
         # file_path = self.full_path + "/" + "job_parameters.json"
@@ -122,6 +200,44 @@ class Job:
         return(job_params)
         #__|
 
+    def __read_job_params_file_cached__(self):
+        """Same as __read_job_params_file__ with memoised parent dir files.
+
+        The later files take precedence as in __read_job_params_file__
+        """
+        #| - __read_job_params_file_cached__
+        file_list = [
+            os.path.join(self.full_path, "job_parameters.json"),
+            os.path.join(self.full_path[0:-2], "job_parameters.json"),
+            os.path.join(self.full_path[0:-2], "job_params.json"),
+            ]
+
+        job_params = None
+        for i_ind, file_path in enumerate(file_list):
+
+            # Only the parent dir files are shared between Job instances
+            if i_ind == 0:
+                params_i = None
+                if os.path.exists(file_path):
+                    with open(file_path, "r") as fle:
+                        params_i = json.load(fle)
+            else:
+                params_i = read_job_params_file_cached(file_path)
+
+            if params_i is not None:
+                job_params = params_i
+
+        if job_params is None:
+            print("No job_params file found for following job:")
+            print(self.full_path)
+
+            job_params = {}
+
+        job_params = copy.deepcopy(job_params)
+
+        return(job_params)
+        #__|
+
     def __revision_number__(self):
         """
         """
@@ -153,6 +269,7 @@ class DFT_Jobs_Setup:
         working_dir=".",
         # root_dir=".",
         folders_exist=None,
+        lazy_jobs=False,
         ):
         """Initialize DFT_Jobs_Setup Instance.
 
@@ -165,6 +282,10 @@ class DFT_Jobs_Setup:
             skip_dirs_lst:
             working_dir:
             folders_exist:
+            lazy_jobs:
+                If True, the job parameter files of the Job instances are only
+                read when needed. The data table of jobs enumerated from the
+                tree levels is then built from the tree variables alone.
         """
         #| - __init__
 
@@ -179,6 +300,7 @@ class DFT_Jobs_Setup:
         self.skip_dirs_lst = skip_dirs_lst
         self.indiv_dir_lst = indiv_dir_lst
         self.indiv_job_lst = indiv_job_lst
+        self.lazy_jobs = lazy_jobs
         #__|
 
         self.root_dir = self.__set_root_dir__(root_dir)
@@ -189,12 +311,14 @@ class DFT_Jobs_Setup:
         self.jobs_att = self.__load_jobs_attributes__()
         self.__create_jobs_bin__()
         self.folders_exist = self.__folders_exist__(folders_exist)
+        self.rev_index = self.__revision_index__()
 
         self.load_dir_struct()
         self.__create_dir_structure_file__()
         self.num_jobs = self.__number_of_jobs__()
         self.__Job_list__()
         self.data_frame = self.__gen_datatable__()
+        self.rev_index.save()
 
         # if self.folders_exist:
         #     # self.data_frame = self.__generate_data_table__()
@@ -244,6 +368,7 @@ class DFT_Jobs_Setup:
                         job_params_dict=None,
                         max_revision=max_rev,
                         root_dir=None,
+                        lazy=self.lazy_jobs,
                         )
 
                     self.Job_list.append(Job_i)
@@ -294,6 +419,7 @@ class DFT_Jobs_Setup:
                     job_params_dict=job_var_dict,
                     max_revision=max_rev,
                     root_dir=self.root_dir,
+                    lazy=self.lazy_jobs,
                     )
 
                 self.Job_list.append(Job_i)
@@ -320,6 +446,7 @@ class DFT_Jobs_Setup:
                     job_params_dict=job_params_i,
                     max_revision=None,
                     root_dir=self.root_dir,
+                    lazy=self.lazy_jobs,
                     )
 
                 self.Job_list.append(Job_i)
@@ -359,6 +486,20 @@ class DFT_Jobs_Setup:
             os.makedirs(folder_dir)
         #__|
 
+    def __revision_index__(self):
+        """Load revision folder index from jobs_bin/revision_index.json."""
+        #| - __revision_index__
+        index_file = os.path.join(
+            self.root_dir,
+            self.working_dir,
+            "jobs_bin/revision_index.json",
+            )
+
+        rev_index = RevisionIndex(index_file=index_file)
+
+        return(rev_index)
+        #__|
+
     def __folders_exist__(self, folders_exist):
         """Check whether directory structure exists.
 
@@ -373,12 +514,14 @@ class DFT_Jobs_Setup:
         folders_exist = False
 
         #| - Folders Exist Criteria
+        dir_i = os.path.join(self.root_dir, self.working_dir)
+
         crit_0 = False
-        if os.path.isfile(self.root_dir + "/jobs_bin/.folders_exist"):
+        if os.path.isfile(os.path.join(dir_i, "jobs_bin/.folders_exist")):
             crit_0 = True
 
         crit_1 = False
-        if os.path.isdir(self.root_dir + "/data"):
+        if os.path.isdir(os.path.join(dir_i, "data")):
             crit_1 = True
         #__|
 
@@ -824,26 +967,75 @@ class DFT_Jobs_Setup:
             order_dict:
         """
         #| - __job_variable_list__
-        all_comb = itertools.product(*level_entries)
+        # Skipped jobs are filtered out while enumerating (set of job indices)
+        skip_set = skip_index_set(
+            self.skip_dirs_lst,
+            self.tree_level_labels,
+            level_entries,
+            )
 
-        job_dir_lst = []
-        for job_dir in all_comb:
-            final_lst_2 = []
-            param_names = self.tree_level_labels
+        job_dir_lst = list(iter_job_var_lst(
+            self.tree_level_labels,
+            level_entries,
+            skip_set=skip_set,
+            ))
 
-            for ind, prop in enumerate(job_dir):
-                new_entry = {}
-                new_entry["property"] = param_names[ind]
-                new_entry["value"] = job_dir[ind]
-                final_lst_2.append(new_entry)
+        return(job_dir_lst)
+        #__|
 
-            job_dir_lst.append(final_lst_2)
+    def iter_job_var_lst(self, with_index=False):
+        """Yield job variable lists of the tree (skipped jobs excluded).
 
-        if self.skip_dirs_lst is not None:
-            for skip in self.skip_dirs_lst:
-                job_dir_lst.remove(skip)
+        Args:
+            with_index:
+                If True, (job index, job variable list) tuples are yielded
+        """
+        #| - iter_job_var_lst
+        skip_set = skip_index_set(
+            self.skip_dirs_lst,
+            self.tree_level_labels,
+            self.level_entries_list,
+            )
 
-        return(job_dir_lst)
+        for out in iter_job_var_lst(
+            self.tree_level_labels,
+            self.level_entries_list,
+            skip_set=skip_set,
+            with_index=with_index,
+            ):
+            yield out
+        #__|
+
+    def job_index_to_var_lst(self, index):
+        """Return job variable list of job index (mixed radix integer).
+
+        Args:
+            index:
+        """
+        #| - job_index_to_var_lst
+        var_lst = var_lst_from_index(
+            index,
+            self.tree_level_labels,
+            self.level_entries_list,
+            )
+
+        return(var_lst)
+        #__|
+
+    def var_lst_to_job_index(self, variable_lst):
+        """Return job index (mixed radix integer) of job variable list.
+
+        Args:
+            variable_lst:
+        """
+        #| - var_lst_to_job_index
+        index = index_from_var_lst(
+            variable_lst,
+            self.tree_level_labels,
+            self.level_entries_list,
+            )
+
+        return(index)
         #__|
 
     #__|
@@ -865,8 +1057,11 @@ class DFT_Jobs_Setup:
 
         Args:
             create_first_rev_folder:
+
+        Returns the list of created folders
         """
         #| - create_dir_struct
+        new_paths = []
         for Job_i in self.Job_list:
 
             #| - FOR LOOP BODY
@@ -884,8 +1079,12 @@ class DFT_Jobs_Setup:
 
             elif not os.path.exists(path):
                 os.makedirs(path)
+                self.rev_index.add_revision_path(path)
+                new_paths.append(path)
             #__|
 
+        self.rev_index.save()
+
         #| - folders_exist attribute should be True from now on
         # file_name = self.root_dir + "/jobs_bin/.folders_exist"
         file_name = os.path.join(
@@ -900,6 +1099,22 @@ class DFT_Jobs_Setup:
         self.folders_exist = self.__folders_exist__(True)
         #__|
 
+        return(new_paths)
+        #__|
+
+    def refresh_job_list(self):
+        """Rebuild Job_list and data_frame from the current folder state.
+
+        Used after folders were created or revisions added, instead of
+        creating a new instance (which would rescan the whole tree).
+        """
+        #| - refresh_job_list
+        self.Job_list = []
+        self.folders_exist = self.__folders_exist__(None)
+        self.num_jobs = self.__number_of_jobs__()
+        self.__Job_list__()
+        self.data_frame = self.__gen_datatable__()
+        self.rev_index.save()
         #__|
 
     def old_create_dir_struct(self, create_first_rev_folder="True"):
@@ -1126,7 +1341,14 @@ class DFT_Jobs_Setup:
         for Job_i in self.Job_list:
             #| - FOR LOOP BODY
             entry_param_dict = {}
-            for prop, value in Job_i.job_params.items():
+
+            # Lazy jobs with job variables don't need their param files read
+            if self.lazy_jobs and Job_i.job_params_dict is not None:
+                job_params_i = Job_i.job_params_dict
+            else:
+                job_params_i = Job_i.job_params
+
+            for prop, value in job_params_i.items():
                 entry_param_dict[prop] = value
 
             entry_param_dict["Job"] = Job_i
@@ -1158,25 +1380,10 @@ class DFT_Jobs_Setup:
         #| - __revision_list_and_max__
         if self.folders_exist:
 
-            # dirs = os.listdir(os.path.join(self.working_dir, path_i))
-            dirs = os.listdir(path_i)
-
-            revision_dirs = [dir for dir in dirs if dir[0] == "_" and
-                dir[-1].isdigit() and " " not in dir]
-
-            # dir[1].isdigit() and " " not in dir]
-
-            revision_dirs.sort()
-
-            print(path_i)
-            print("__----___--_____--_kdsfjs")
-
-            if len(revision_dirs) == 0:
-                highest_rev = None
-            else:
-                highest_rev = max(
-                    [int(i.split("_")[-1]) for i in revision_dirs],
-                    )
+            # Served from the revision index (jobs_bin/revision_index.json)
+            revision_dirs, highest_rev = self.rev_index.revision_list_and_max(
+                path_i,
+                )
 
             return(revision_dirs, highest_rev)
         else:
@@ -1188,6 +1395,30 @@ class DFT_Jobs_Setup:
             return(dummy_return)
         #__|
 
+    def job_revision_number(self, variable_lst):
+        """Return the highest revision number for variable_lst -> job.
+
+        Returns 0 if the job directory has no revision folders and 1 if the
+        directory structure hasn't been created yet.
+
+        Args:
+            variable_lst:
+        """
+        #| - job_revision_number
+        path_i = self.var_lst_to_path(
+            variable_lst,
+            job_rev="False",
+            relative_path=False,
+            )
+
+        revision_dirs, highest_rev = self.__revision_list_and_max__(path_i)
+
+        if highest_rev is None:
+            highest_rev = 0
+
+        return(highest_rev)
+        #__|
+
     def copy_files_jd(self, file_list, variable_lst, revision="Auto"):
         """
         Copy files to job directory.
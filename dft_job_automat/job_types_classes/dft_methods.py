@@ -11,6 +11,7 @@ Development Notes:
 import os
 import pickle as pickle
 import json
+import threading
 
 from ase import io
 # from ase.io.trajectory import Trajectory
@@ -19,9 +20,19 @@ from ase import io
 # from ase_modules.ase_methods import number_of_atoms
 from ase_modules.ase_methods import create_species_element_dict
 
+from ase_modules.traj_cache import default_cache
+
+from misc_modules.tail_parser import tail_parse, LineValueParser
+
 from quantum_espresso.qe_methods import magmom_charge_data
 #__|
 
+#| - Module Variables
+# os.chdir changes the working directory of all threads, DFT_Methods columns
+# may be computed in a thread pool (see DFT_Jobs_Analysis)
+CHDIR_LOCK = threading.Lock()
+#__|
+
 class DFT_Methods():
     """Methods and analysis to perform within DFT jobs folders."""
 
@@ -29,15 +40,111 @@ class DFT_Methods():
     def __init__(self,
         methods_to_run=[],
         DFT_code="QE",  # VASP
+        traj_cache=None,
         ):
         """Initialize DFT_Methods instance with methods_to_run list.
 
         Args:
             methods_to_run:
+            DFT_code:
+            traj_cache:
+                TrajectoryCache instance used to read the trajectories, shared
+                module instance by default
         """
         #| - __init__
         self.methods_to_run = methods_to_run
         self.DFT_code = DFT_code
+
+        if traj_cache is None:
+            traj_cache = default_cache
+        self.traj_cache = traj_cache
+        #__|
+
+    def __read_frames__(self, path_i, file_name, index=":"):
+        """Read frames of trajectory file in job folder through the cache.
+
+        VASP OUTCARs are read from within the job folder, the chdir is
+        serialized with CHDIR_LOCK.
+
+        Args:
+            path_i:
+            file_name:
+            index:
+        """
+        #| - __read_frames__
+        file_path = os.path.join(path_i, file_name)
+
+        if self.DFT_code == "VASP":
+            file_path = os.path.abspath(file_path)
+            with CHDIR_LOCK:
+                cwd = os.getcwd()
+                os.chdir(path_i)
+                try:
+                    frames = self.traj_cache.read_frames(
+                        file_path,
+                        index=index,
+                        )
+                finally:
+                    os.chdir(cwd)
+
+        else:
+            frames = self.traj_cache.read_frames(file_path, index=index)
+
+        return(frames)
+        #__|
+
+    def __outcar_energy__(self, path_i):
+        """Return last ionic step energy of OUTCAR only VASP job folders.
+
+        The OUTCAR is parsed incrementally (only what was written since the
+        last call), energy(sigma->0) like the ASE OUTCAR reader. Returns None
+        if the job isn't VASP, has trajectory files or no energy yet.
+
+        Args:
+            path_i:
+        """
+        #| - __outcar_energy__
+        if self.DFT_code != "VASP":
+            return(None)
+
+        for file_name in ["out.traj", "out_opt.traj"]:
+            if os.path.isfile(os.path.join(path_i, file_name)):
+                return(None)
+
+        outcar = os.path.join(path_i, "OUTCAR")
+        if not os.path.isfile(outcar):
+            return(None)
+
+        # "energy  without entropy" (2 spaces) is in the ionic step summaries
+        # only
+        energies = tail_parse(
+            outcar,
+            LineValueParser,
+            keyword="energy  without entropy",
+            field=-1,
+            ).result()
+
+        if len(energies) == 0:
+            return(None)
+
+        return(energies[-1])
+        #__|
+
+    def __job_running__(self, path_i):
+        """Return True if the '.QUEUESTATE' file of the job reads RUNNING.
+
+        Args:
+            path_i:
+        """
+        #| - __job_running__
+        file_path = os.path.join(path_i, ".QUEUESTATE")
+        if not os.path.isfile(file_path):
+            return(False)
+
+        with open(file_path, "r") as fle:
+            job_state = fle.read().strip()
+
+        return(job_state == "RUNNING")
         #__|
 
     def pdos_data(self, path_i):
@@ -80,7 +187,13 @@ class DFT_Methods():
             path_i
         """
         #| - magmom_charge_history
-        df = magmom_charge_data(path_i=path_i, log=log)
+        # Running jobs, only the new part of the log is parsed every refresh,
+        # the logs of other jobs are parsed once (cached by size and mtime)
+        df = magmom_charge_data(
+            path_i=path_i,
+            log=log,
+            incremental=self.__job_running__(path_i),
+            )
         imp_col = ["atom_num", "iteration", "element"]
 
         magmom_history_df = df.filter(items=imp_col + ["magmom"])
@@ -147,15 +260,20 @@ class DFT_Methods():
         # with open(path_i + "/dir_opt/elec_e.out", "r") as fle:
         #     energy = float(fle.read().strip())
 
-        try:
-            atoms = self.atoms_object(path_i)[-1]
-            energy = atoms.get_potential_energy()
-        except:
-            pass
+        # Final frames only, read once through the trajectory cache
+        outcar_energy = self.__outcar_energy__(path_i)
+        if outcar_energy is not None:
+            energy = outcar_energy
 
-        try:
+        else:
+            try:
+                atoms = self.atoms_object(path_i, index=-1)
+                energy = atoms.get_potential_energy()
+            except:
+                pass
 
-            atoms = io.read(path_i + "/" + "out_opt.traj")
+        try:
+            atoms = self.__read_frames__(path_i, "out_opt.traj", index=-1)
             energy = atoms.get_potential_energy()
         except:
             pass
@@ -164,11 +282,13 @@ class DFT_Methods():
         return(energy)
         #__|
 
-    def atoms_object(self, path_i):
+    def atoms_object(self, path_i, index=":"):
         """Attempt to read and return atoms object.
 
         Args:
             path_i:
+            index:
+                ":" for all frames (list), -1 for the final frame only
         """
         #| - atoms_object
         # atoms_file_names = ["out_opt.traj", "out.traj"]
@@ -184,24 +304,7 @@ class DFT_Methods():
             try:
 
                 #| - try to read atoms
-                if self.DFT_code == "VASP":
-
-                    cwd = os.getcwd()
-                    os.chdir(path_i)
-
-                    traj = io.read(
-                        os.path.join(path_i, file_name),
-                        index=":",
-                        )
-
-                    os.chdir(cwd)
-
-                else:
-
-                    traj = io.read(
-                        os.path.join(path_i, file_name),
-                        index=":",
-                        )
+                traj = self.__read_frames__(path_i, file_name, index=index)
 
                 break
                 #__|
@@ -294,7 +397,7 @@ class DFT_Methods():
 
         for file_name in atoms_file_names:
             try:
-                traj = io.read(path_i + "/" + file_name)
+                traj = self.__read_frames__(path_i, file_name, index=-1)
                 break
 
             except:
@@ -329,7 +432,7 @@ class DFT_Methods():
         for file_name in atoms_file_names:
             try:
                 print(path_i + "/" + file_name)
-                atoms = io.read(path_i + "/" + file_name)
+                atoms = self.__read_frames__(path_i, file_name, index=-1)
                 break
 
             except:
@@ -0,0 +1,747 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Event driven table of job marker files (.READY, .SUBMITTED, etc.).
+
+Author: Raul A. Flores
+
+The job state methods of DFT_Jobs_Analysis and ComputerCluster check for the
+marker files of every job folder on every call. A MarkerWatcher subscribes to
+the job tree (ex. <root_dir>/data) and keeps a MarkerTable of the markers
+present in every folder, so the state queries become dictionary lookups:
+
+    watcher = MarkerWatcher("data")
+    watcher.start()
+    watcher.table.has_marker("data/.../_1", ".SUBMITTED")
+
+Backends:
+    "inotify" | Linux inotify via ctypes, changes are applied as they happen
+    "poll"    | Rescan of the tree every poll_interval seconds
+    "auto"    | inotify if available, polling otherwise (ex. NFS/Lustre
+                 mounts don't report changes made on other hosts, use "poll"
+                 there)
+
+The table can be written to a json file (table_file) so that a watcher
+running as a separate service can be used by other processes:
+
+    python marker_watcher.py data --table_file jobs_bin/marker_table.json
+"""
+
+#| - Import Modules
+import os
+import sys
+import json
+import time
+import errno
+import select
+import struct
+import argparse
+import threading
+import ctypes
+import ctypes.util
+#__|
+
+#| - Methods
+
+def read_marker(file_path, max_size=4096):
+    """Return contents of marker file (None if it doesn't exist).
+
+    Args:
+        file_path:
+        max_size:
+            Only the first max_size bytes are read
+    """
+    #| - read_marker
+    try:
+        with open(file_path, "r") as fle:
+            content = fle.read(max_size)
+    except (IOError, OSError):
+        content = None
+
+    return(content)
+    #__|
+
+def scan_dir_markers(dir_path, marker_files):
+    """Return {marker name: contents} of the markers in dir_path.
+
+    Also returns the list of subfolders (one listdir per folder).
+
+    Args:
+        dir_path:
+        marker_files:
+    """
+    #| - scan_dir_markers
+    markers = {}
+    subdirs = []
+    try:
+        entries = list(os.scandir(dir_path))
+    except OSError:
+        return(markers, subdirs)
+
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.name in marker_files:
+                content = read_marker(entry.path)
+                if content is not None:
+                    markers[entry.name] = content
+        except OSError:
+            continue
+
+    return(markers, subdirs)
+    #__|
+
+#__|
+
+
+class MarkerTable():
+    """In memory table of the marker files of every folder of a job tree.
+
+    Paths are stored as absolute paths, folders without markers aren't
+    stored.
+    """
+
+    #| - MarkerTable **********************************************************
+
+    #| - Class Variables
+    marker_files = [
+        ".READY",
+        ".SUBMITTED",
+        ".FINISHED",
+        ".FINISHED.new",
+        ".QUEUESTATE",
+        ]
+    #__|
+
+    def __init__(self, root_dir, marker_files=None):
+        """Initialize MarkerTable instance.
+
+        Args:
+            root_dir:
+                Top folder of the watched tree, queries for paths outside of
+                it return None
+            marker_files:
+        """
+        #| - __init__
+        self.root_dir = os.path.abspath(root_dir)
+
+        if marker_files is not None:
+            self.marker_files = marker_files
+
+        # {abs dir path: {marker name: contents}}
+        self.markers = {}
+
+        self.lock = threading.RLock()
+        self.last_update = None
+        self.dirty = False
+        #__|
+
+    #| - Updating *************************************************************
+    def set_marker(self, dir_path, marker, content):
+        """Record marker (with its contents) in dir_path."""
+        #| - set_marker
+        with self.lock:
+            self.markers.setdefault(dir_path, {})[marker] = content
+            self.last_update = time.time()
+            self.dirty = True
+        #__|
+
+    def remove_marker(self, dir_path, marker):
+        """Remove marker of dir_path."""
+        #| - remove_marker
+        with self.lock:
+            dir_markers = self.markers.get(dir_path, None)
+            if dir_markers is not None and marker in dir_markers:
+                del dir_markers[marker]
+                if len(dir_markers) == 0:
+                    del self.markers[dir_path]
+            self.last_update = time.time()
+            self.dirty = True
+        #__|
+
+    def remove_tree(self, dir_path):
+        """Remove dir_path and all of its subfolders from the table."""
+        #| - remove_tree
+        prefix = dir_path + os.sep
+        with self.lock:
+            for path_i in list(self.markers.keys()):
+                if path_i == dir_path or path_i.startswith(prefix):
+                    del self.markers[path_i]
+            self.last_update = time.time()
+            self.dirty = True
+        #__|
+
+    def refresh_marker(self, dir_path, marker):
+        """Read marker of dir_path from disk again (ex. just rewritten).
+
+        Args:
+            dir_path:
+            marker:
+        """
+        #| - refresh_marker
+        dir_path = os.path.abspath(dir_path)
+
+        content = read_marker(os.path.join(dir_path, marker))
+        if content is None:
+            self.remove_marker(dir_path, marker)
+        else:
+            self.set_marker(dir_path, marker, content)
+        #__|
+
+    def scan_tree(self, dir_path=None):
+        """Rescan dir_path (default: root_dir) and return its subfolders.
+
+        Args:
+            dir_path:
+        """
+        #| - scan_tree
+        if dir_path is None:
+            dir_path = self.root_dir
+
+        tree_markers = {}
+        dir_list = []
+
+        stack = [dir_path]
+        while stack:
+            path_i = stack.pop()
+            dir_list.append(path_i)
+
+            markers, subdirs = scan_dir_markers(path_i, self.marker_files)
+            if markers:
+                tree_markers[path_i] = markers
+            stack.extend(subdirs)
+
+        with self.lock:
+            prefix = dir_path + os.sep
+            for path_i in list(self.markers.keys()):
+                if path_i == dir_path or path_i.startswith(prefix):
+                    del self.markers[path_i]
+
+            self.markers.update(tree_markers)
+            self.last_update = time.time()
+            self.dirty = True
+
+        return(dir_list)
+        #__|
+    #__| **********************************************************************
+
+    #| - Queries **************************************************************
+    def tracks(self, path_i):
+        """Return True if path_i is inside of the watched tree."""
+        #| - tracks
+        path_i = os.path.abspath(path_i)
+
+        tracked = path_i == self.root_dir or \
+            path_i.startswith(self.root_dir + os.sep)
+
+        return(tracked)
+        #__|
+
+    def has_marker(self, path_i, marker):
+        """Return whether marker exists in path_i (None if not tracked).
+
+        Args:
+            path_i:
+            marker:
+        """
+        #| - has_marker
+        if not self.tracks(path_i):
+            return(None)
+
+        with self.lock:
+            dir_markers = self.markers.get(os.path.abspath(path_i), {})
+            exists = marker in dir_markers
+
+        return(exists)
+        #__|
+
+    def marker_content(self, path_i, marker):
+        """Return contents of marker in path_i (None if absent).
+
+        Args:
+            path_i:
+            marker:
+        """
+        #| - marker_content
+        with self.lock:
+            dir_markers = self.markers.get(os.path.abspath(path_i), {})
+            content = dir_markers.get(marker, None)
+
+        return(content)
+        #__|
+
+    def job_markers(self, path_i):
+        """Return {marker name: contents} of path_i."""
+        #| - job_markers
+        with self.lock:
+            dir_markers = dict(self.markers.get(os.path.abspath(path_i), {}))
+
+        return(dir_markers)
+        #__|
+    #__| **********************************************************************
+
+    #| - Saving/Loading *******************************************************
+    def save(self, table_file):
+        """Write table to json file (atomic replace).
+
+        Args:
+            table_file:
+        """
+        #| - save
+        with self.lock:
+            data = {
+                "root_dir": self.root_dir,
+                "marker_files": self.marker_files,
+                "last_update": self.last_update,
+                "markers": self.markers,
+                }
+            tmp_file = table_file + ".tmp"
+            with open(tmp_file, "w") as fle:
+                json.dump(data, fle)
+            os.rename(tmp_file, table_file)
+
+            self.dirty = False
+        #__|
+
+    @classmethod
+    def load(cls, table_file):
+        """Return MarkerTable read from json file.
+
+        Args:
+            table_file:
+        """
+        #| - load
+        with open(table_file, "r") as fle:
+            data = json.load(fle)
+
+        table = cls(data["root_dir"], marker_files=data["marker_files"])
+        table.markers = data["markers"]
+        table.last_update = data["last_update"]
+
+        return(table)
+        #__|
+    #__| **********************************************************************
+
+    #__| **********************************************************************
+
+
+class InotifyBackend():
+    """Recursive inotify watch of a folder tree (Linux only, via ctypes)."""
+
+    #| - InotifyBackend *******************************************************
+
+    #| - Class Variables
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+
+    IN_CLOEXEC = 0o2000000
+    IN_NONBLOCK = 0o4000
+
+    # IN_MODIFY isn't watched, output files of running jobs would flood the
+    # queue, marker contents are read once they are closed
+    watch_mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | \
+        IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+    event_header = struct.Struct("iIII")
+    #__|
+
+    def __init__(self, table):
+        """Initialize InotifyBackend instance.
+
+        Raises OSError if inotify isn't available.
+
+        Args:
+            table:
+                MarkerTable to keep up to date
+        """
+        #| - __init__
+        self.table = table
+
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify not supported by " + libc_name)
+
+        self.libc.inotify_add_watch.argtypes = [
+            ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+        self.fd = self.libc.inotify_init1(
+            InotifyBackend.IN_NONBLOCK | InotifyBackend.IN_CLOEXEC
+            )
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, "inotify_init1: " + os.strerror(err))
+
+        # {watch descriptor: dir path}
+        self.wd_paths = {}
+        self.read_lock = threading.Lock()
+
+        # e.g. ENOSPC (max_user_watches reached), the caller falls back to
+        # polling so the inotify fd must not be leaked
+        try:
+            self.watch_tree(self.table.root_dir)
+        except:
+            self.close()
+            raise
+        #__|
+
+    def close(self):
+        """Close inotify file descriptor."""
+        #| - close
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        #__|
+
+    def add_watch(self, dir_path):
+        """Add watch on dir_path."""
+        #| - add_watch
+        wd = self.libc.inotify_add_watch(
+            self.fd,
+            dir_path.encode(sys.getfilesystemencoding()),
+            InotifyBackend.watch_mask,
+            )
+
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in [errno.ENOENT, errno.ENOTDIR]:
+                # Folder removed in the meantime
+                return(None)
+            raise OSError(err, "inotify_add_watch " + dir_path + ": " +
+                os.strerror(err))
+
+        self.wd_paths[wd] = dir_path
+
+        return(wd)
+        #__|
+
+    def watch_tree(self, dir_path):
+        """Scan dir_path into the table and watch all of its folders.
+
+        The watches are added before the scan so that no marker written in
+        between is missed.
+        """
+        #| - watch_tree
+        stack = [dir_path]
+        while stack:
+            path_i = stack.pop()
+            self.add_watch(path_i)
+            try:
+                stack.extend([
+                    entry.path for entry in os.scandir(path_i)
+                    if entry.is_dir(follow_symlinks=False)
+                    ])
+            except OSError:
+                continue
+
+        self.table.scan_tree(dir_path)
+        #__|
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds for events."""
+        #| - wait
+        try:
+            readable, _, _ = select.select([self.fd], [], [], timeout)
+        except (OSError, ValueError):
+            return(False)
+
+        return(len(readable) > 0)
+        #__|
+
+    def process_events(self):
+        """Read all pending events and apply them to the table.
+
+        Returns the number of processed events.
+        """
+        #| - process_events
+        num_events = 0
+        with self.read_lock:
+            while True:
+                try:
+                    buf = os.read(self.fd, 64 * 1024)
+                except OSError as e:
+                    if e.errno in [errno.EAGAIN, errno.EWOULDBLOCK]:
+                        break
+                    raise
+
+                if not buf:
+                    break
+
+                num_events += self.__apply_events__(buf)
+
+        return(num_events)
+        #__|
+
+    def __apply_events__(self, buf):
+        """Apply the events of an inotify read buffer to the table."""
+        #| - __apply_events__
+        header_size = InotifyBackend.event_header.size
+
+        num_events = 0
+        offset = 0
+        while offset + header_size <= len(buf):
+            wd, mask, cookie, name_len = \
+                InotifyBackend.event_header.unpack_from(buf, offset)
+            name = buf[offset + header_size:offset + header_size + name_len]
+            name = name.rstrip(b"\0").decode(sys.getfilesystemencoding())
+            offset += header_size + name_len
+            num_events += 1
+
+            if mask & InotifyBackend.IN_Q_OVERFLOW:
+                print("inotify queue overflow, rescanning " +
+                    self.table.root_dir)
+                self.table.scan_tree()
+                continue
+
+            if mask & InotifyBackend.IN_IGNORED:
+                self.wd_paths.pop(wd, None)
+                continue
+
+            dir_path = self.wd_paths.get(wd, None)
+            if dir_path is None:
+                continue
+
+            if mask & (InotifyBackend.IN_DELETE_SELF |
+                    InotifyBackend.IN_MOVE_SELF):
+                # Subfolders are handled by the event of their parent (a
+                # moved folder keeps its watch descriptor)
+                if dir_path == self.table.root_dir:
+                    self.table.remove_tree(dir_path)
+                continue
+
+            path_i = os.path.join(dir_path, name)
+
+            #| - Folder Events
+            if mask & InotifyBackend.IN_ISDIR:
+                if mask & (InotifyBackend.IN_CREATE |
+                        InotifyBackend.IN_MOVED_TO):
+                    self.watch_tree(path_i)
+                elif mask & (InotifyBackend.IN_DELETE |
+                        InotifyBackend.IN_MOVED_FROM):
+                    self.table.remove_tree(path_i)
+                continue
+            #__|
+
+            if name not in self.table.marker_files:
+                continue
+
+            if mask & (InotifyBackend.IN_DELETE | InotifyBackend.IN_MOVED_FROM):
+                self.table.remove_marker(dir_path, name)
+            else:
+                content = read_marker(path_i)
+                if content is None:
+                    self.table.remove_marker(dir_path, name)
+                else:
+                    self.table.set_marker(dir_path, name, content)
+
+        return(num_events)
+        #__|
+
+    #__| **********************************************************************
+
+
+class PollingBackend():
+    """Fallback backend rescanning the whole tree."""
+
+    #| - PollingBackend *******************************************************
+    def __init__(self, table):
+        """Initialize PollingBackend instance.
+
+        Args:
+            table:
+        """
+        #| - __init__
+        self.table = table
+        self.table.scan_tree()
+        #__|
+
+    def close(self):
+        """Nothing to release."""
+        #| - close
+        pass
+        #__|
+
+    def wait(self, timeout):
+        """Sleep timeout seconds (always returns True)."""
+        #| - wait
+        time.sleep(timeout)
+
+        return(True)
+        #__|
+
+    def process_events(self):
+        """Rescan the tree, returns the number of scanned folders."""
+        #| - process_events
+        return(len(self.table.scan_tree()))
+        #__|
+
+    #__| **********************************************************************
+
+
+class MarkerWatcher():
+    """Service keeping a MarkerTable of a job tree up to date."""
+
+    #| - MarkerWatcher ********************************************************
+    def __init__(self,
+        root_dir,
+        backend="auto",
+        poll_interval=2.,
+        table_file=None,
+        save_interval=10.,
+        marker_files=None,
+        ):
+        """Initialize MarkerWatcher instance (tree is scanned once).
+
+        Args:
+            root_dir:
+                Folder to watch (ex. <root_dir>/data)
+            backend:
+                "auto", "inotify" or "poll"
+            poll_interval:
+                Seconds between rescans of the polling backend (also max
+                wait between checks of the stop flag)
+            table_file:
+                If given, the table is written to this json file every
+                save_interval seconds (when changed) and on stop
+            save_interval:
+            marker_files:
+                Marker file names, defaults to MarkerTable.marker_files
+        """
+        #| - __init__
+        self.table = MarkerTable(root_dir, marker_files=marker_files)
+        self.poll_interval = poll_interval
+        self.table_file = table_file
+        self.save_interval = save_interval
+
+        self.backend = self.__init_backend__(backend)
+
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.last_save = time.time()
+        #__|
+
+    def __init_backend__(self, backend):
+        """Return backend instance, falling back to polling for 'auto'."""
+        #| - __init_backend__
+        if backend == "poll":
+            return(PollingBackend(self.table))
+
+        try:
+            return(InotifyBackend(self.table))
+        except OSError as e:
+            if backend == "inotify":
+                raise
+            print("inotify not available (" + str(e) + "), polling instead")
+            return(PollingBackend(self.table))
+        #__|
+
+    @property
+    def backend_name(self):
+        """Return "inotify" or "poll"."""
+        #| - backend_name
+        if isinstance(self.backend, InotifyBackend):
+            return("inotify")
+        else:
+            return("poll")
+        #__|
+
+    def sync(self):
+        """Apply pending changes to the table now (from the calling thread).
+
+        Cheap for the inotify backend (non blocking read), a full rescan for
+        the polling backend.
+        """
+        #| - sync
+        self.backend.process_events()
+        #__|
+
+    def __run__(self):
+        """Watcher thread loop."""
+        #| - __run__
+        while not self.stop_event.is_set():
+            if self.backend.wait(self.poll_interval):
+                if self.stop_event.is_set():
+                    break
+                self.backend.process_events()
+
+            if self.table_file is not None and self.table.dirty:
+                if time.time() - self.last_save > self.save_interval:
+                    self.table.save(self.table_file)
+                    self.last_save = time.time()
+        #__|
+
+    def start(self):
+        """Start background watcher thread."""
+        #| - start
+        if self.thread is not None:
+            return(None)
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.__run__)
+        self.thread.daemon = True
+        self.thread.start()
+        #__|
+
+    def stop(self):
+        """Stop watcher thread, write table_file and release the backend."""
+        #| - stop
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        if self.table_file is not None:
+            self.table.save(self.table_file)
+
+        self.backend.close()
+        #__|
+
+    #__| **********************************************************************
+
+
+if __name__ == "__main__":
+    #| - Main
+    parser = argparse.ArgumentParser(
+        description="Watch job marker files and write the marker table",
+        )
+    parser.add_argument("root_dir")
+    parser.add_argument("--table_file", required=True)
+    parser.add_argument("--backend", default="auto")
+    parser.add_argument("--poll_interval", type=float, default=2.)
+    parser.add_argument("--save_interval", type=float, default=2.)
+    args = parser.parse_args()
+
+    watcher = MarkerWatcher(
+        args.root_dir,
+        backend=args.backend,
+        poll_interval=args.poll_interval,
+        table_file=args.table_file,
+        save_interval=args.save_interval,
+        )
+    watcher.table.save(args.table_file)
+
+    print("Watching " + watcher.table.root_dir + " (" +
+        watcher.backend_name + ")")
+
+    watcher.start()
+    try:
+        while True:
+            time.sleep(1.)
+    except KeyboardInterrupt:
+        watcher.stop()
+    #__|
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Batched queue state polling for SLURM and LSF clusters.
+
+A single scheduler call is made for all tracked job ids per poll cycle, the
+output is parsed once and the resulting "snapshot" dictionary (job id -> job
+info dict) is used to look up the state of every job.
+
+Development Notes:
+    The fake scheduler executables in dft_job_automat/sched_sim/bin can be put
+    on the PATH to exercise these methods offline
+"""
+
+#| - Import Modules
+import os
+import subprocess
+#__|
+
+#| - Methods
+
+def read_job_id(path_i="."):
+    """Return job id stored in the '.jobid' file of a job folder.
+
+    Returns None if the file doesn't exist or if the id couldn't be parsed at
+    submission time (the string "None" is written in that case).
+
+    Args:
+        path_i:
+    """
+    #| - read_job_id
+    fileid_path = os.path.join(path_i, ".jobid")
+
+    job_id = None
+    if os.path.isfile(fileid_path):
+        with open(fileid_path, "r") as fle:
+            job_id = fle.read().strip()
+
+        if job_id in ["", "None"]:
+            job_id = None
+
+    return(job_id)
+    #__|
+
+def chunk_list(lst, chunk_size):
+    """Split list into consecutive chunks of at most chunk_size entries.
+
+    Args:
+        lst:
+        chunk_size:
+    """
+    #| - chunk_list
+    chunks = [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
+
+    return(chunks)
+    #__|
+
+def unique_job_ids(job_id_list):
+    """Return the unique, non-None job ids in job_id_list (order preserved).
+
+    Args:
+        job_id_list:
+    """
+    #| - unique_job_ids
+    unique_ids = []
+    seen = set()
+    for job_id in job_id_list:
+        if job_id is None:
+            continue
+
+        job_id = str(job_id)
+        if job_id not in seen:
+            seen.add(job_id)
+            unique_ids.append(job_id)
+
+    return(unique_ids)
+    #__|
+
+def slurm_squeue_batch(
+    job_id_list,
+    squeue_cmd="squeue",
+    chunk_size=500,
+    ):
+    """Query squeue once for all jobs in job_id_list.
+
+    Returns a dictionary with the job id (str) as key and a data_dict of the
+    same format returned by slurm_squeue_parse as the value. Jobs that are
+    not in the batch system anymore are simply absent from the dictionary.
+
+    Job array elements are reported individually (ex. '1234_5').
+
+    Args:
+        job_id_list:
+            List of job ids, None entries are ignored
+        squeue_cmd:
+            squeue executable
+        chunk_size:
+            Max number of job ids passed to a single squeue call, keeps the
+            command line length in check for very large studies
+    """
+    #| - slurm_squeue_batch
+    job_id_list = unique_job_ids(job_id_list)
+
+    snapshot = {}
+    for chunk_i in chunk_list(job_id_list, chunk_size):
+        bash_comm = [
+            squeue_cmd,
+            "--noheader",
+            "--array",
+            "--format=%i|%P|%t",
+            "--jobs=" + ",".join(chunk_i),
+            ]
+
+        try:
+            out = subprocess.check_output(
+                bash_comm,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+                )
+
+        # squeue exits with an error if none of the job ids are known
+        except (subprocess.CalledProcessError, OSError):
+            continue
+
+        snapshot.update(parse_squeue_output(out))
+
+    return(snapshot)
+    #__|
+
+def parse_squeue_output(out):
+    """Parse output of 'squeue --noheader --format=%i|%P|%t'.
+
+    Args:
+        out:
+    """
+    #| - parse_squeue_output
+    snapshot = {}
+    for line in out.splitlines():
+        line = line.strip()
+        if line == "":
+            continue
+
+        line_list = [i.strip() for i in line.split("|")]
+        if len(line_list) < 3:
+            continue
+
+        snapshot[line_list[0]] = {
+            "PARTITION": line_list[1],
+            "STAT": line_list[2],
+            }
+
+    return(snapshot)
+    #__|
+
+def lsf_bjobs_batch(
+    job_id_list,
+    bjobs_cmd="/usr/local/bin/bjobs",
+    chunk_size=500,
+    ):
+    """Query bjobs once ('bjobs -a -w <ids>') for all jobs in job_id_list.
+
+    Returns a dictionary with the job id (str) as key and a data_dict of the
+    same format returned by SLACCluster.job_info_batch as the value (without
+    the "EXEC_CWD" entry, which requires an additional bjobs call per job).
+
+    Args:
+        job_id_list:
+            List of job ids, None entries are ignored
+        bjobs_cmd:
+            bjobs executable
+        chunk_size:
+            Max number of job ids passed to a single bjobs call
+    """
+    #| - lsf_bjobs_batch
+    job_id_list = unique_job_ids(job_id_list)
+
+    snapshot = {}
+    for chunk_i in chunk_list(job_id_list, chunk_size):
+        bash_comm = [bjobs_cmd, "-a", "-w"] + chunk_i
+
+        # bjobs returns a non-zero exit code if any job is not found, the
+        # output for the remaining jobs is still valid
+        proc = subprocess.Popen(
+            bash_comm,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            )
+        out, err = proc.communicate()
+
+        snapshot.update(parse_bjobs_output(out))
+
+    return(snapshot)
+    #__|
+
+def parse_bjobs_output(out):
+    """Parse output of 'bjobs -a -w'.
+
+    'JOBID USER STAT QUEUE FROM_HOST EXEC_HOST JOB_NAME SUBMIT_TIME'
+
+    EXEC_HOST is blank for pending jobs and SUBMIT_TIME spans 3 fields.
+
+    Args:
+        out:
+    """
+    #| - parse_bjobs_output
+    snapshot = {}
+    for line in out.splitlines():
+        line_list = line.split()
+
+        # Skipping header and non-job lines
+        if len(line_list) < 9 or not line_list[0].isdigit():
+            continue
+
+        middle = line_list[5:-3]
+        if line_list[2] == "PEND" or len(middle) < 2:
+            exec_host = ""
+            job_name = " ".join(middle)
+        else:
+            exec_host = middle[0]
+            job_name = " ".join(middle[1:])
+
+        snapshot[line_list[0]] = {
+            "JOBID": line_list[0],
+            "USER": line_list[1],
+            "STAT": line_list[2],
+            "QUEUE": line_list[3],
+            "FROM_HOST": line_list[4],
+            "EXEC_HOST": exec_host,
+            "JOB_NAME": job_name,
+            "SUBMIT_TIME": "_".join(line_list[-3:]),
+            }
+
+    return(snapshot)
+    #__|
+
+def write_queue_state_file(path_i, job_state):
+    """Write job state to '.QUEUESTATE' file in job folder.
+
+    Args:
+        path_i:
+        job_state:
+    """
+    #| - write_queue_state_file
+    with open(os.path.join(path_i, ".QUEUESTATE"), "w") as fle:
+        fle.write(str(job_state))
+        fle.write("\n")
+    #__|
+
+#__|
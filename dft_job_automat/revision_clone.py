@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Clone files from one job revision folder to the next.
+
+Author: Raul A. Flores
+
+Restarting a job copies its restart data (wavefunctions, charge densities,
+trajectories, ...) from revision _N to _N+1. Instead of always copying, every
+file is cloned with one of the following strategies:
+
+    "hardlink" | os.link, no extra space. Source and destination are the same
+                 file afterwards, only for files that are never modified in
+                 place (pseudopotentials, ...)
+    "reflink"  | Copy-on-write clone (FICLONE ioctl, btrfs/XFS/...), no extra
+                 space until one of the files is modified
+    "copy"     | shutil.copy2
+    "auto"     | reflink, falling back to copy if the file system (or the
+                 OS) doesn't support it
+
+hardlink falls back to auto if the link can't be created (different file
+systems, ...). The strategy of every file is chosen with a policy, a list of
+(fnmatch pattern, strategy) pairs matched against the file name, first match
+wins.
+"""
+
+#| - Import Modules
+import os
+import errno
+import shutil
+import fnmatch
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from dft_job_automat.executors import map_timed
+#__|
+
+#| - Module Variables
+# linux/fs.h, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# Errors meaning the clone/link isn't supported for this pair of files
+UNSUPPORTED_ERRNOS = [
+    errno.EXDEV,
+    errno.EPERM,
+    errno.EINVAL,
+    errno.ENOTTY,
+    errno.EOPNOTSUPP,
+    errno.EMLINK,
+    errno.EACCES,
+    ]
+
+DEFAULT_POLICY = [
+    ("*.UPF", "hardlink"),
+    ("*.upf", "hardlink"),
+    ("POTCAR", "hardlink"),
+    ]
+
+STRATEGIES = ["hardlink", "reflink", "copy", "auto"]
+#__|
+
+#| - Methods
+
+def reflink(source, dest):
+    """Clone source to dest with the FICLONE ioctl.
+
+    Raises OSError if the clone isn't supported, dest is removed in that case.
+
+    Args:
+        source:
+        dest:
+    """
+    #| - reflink
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "fcntl not available", source)
+
+    with open(source, "rb") as fle_src:
+        with open(dest, "wb") as fle_dst:
+            try:
+                fcntl.ioctl(fle_dst.fileno(), FICLONE, fle_src.fileno())
+            except (IOError, OSError):
+                fle_dst.close()
+                os.remove(dest)
+                raise
+
+    shutil.copystat(source, dest)
+    #__|
+
+def hardlink(source, dest):
+    """Hard link dest to source.
+
+    Args:
+        source:
+        dest:
+    """
+    #| - hardlink
+    os.link(source, dest)
+    #__|
+
+#__|
+
+
+class RevisionCloner():
+    """Clone files between revision folders with a per file strategy."""
+
+    #| - RevisionCloner *******************************************************
+    def __init__(self,
+        policy=None,
+        default_strategy="auto",
+        overwrite=False,
+        executor="serial",
+        max_workers=None,
+        ):
+        """Initialize RevisionCloner instance.
+
+        Args:
+            policy:
+                List of (fnmatch pattern, strategy) pairs, defaults to
+                DEFAULT_POLICY (hard links for pseudopotentials)
+            default_strategy:
+                Strategy of files not matched by the policy
+            overwrite:
+                If False, files already in the destination are left alone
+            executor:
+                Executor of clone_files, see executors.get_executor
+            max_workers:
+        """
+        #| - __init__
+        if policy is None:
+            policy = DEFAULT_POLICY
+
+        for pattern, strategy in policy:
+            assert strategy in STRATEGIES, "Unknown strategy: " + str(strategy)
+        assert default_strategy in STRATEGIES
+
+        self.policy = policy
+        self.default_strategy = default_strategy
+        self.overwrite = overwrite
+        self.executor = executor
+        self.max_workers = max_workers
+
+        # Set to False the first time reflink isn't supported, to not retry
+        # the ioctl for every file
+        self.reflink_supported = fcntl is not None
+        #__|
+
+    def strategy_for(self, file_name):
+        """Return strategy of file according to the policy.
+
+        Args:
+            file_name:
+        """
+        #| - strategy_for
+        base_name = os.path.basename(file_name)
+        for pattern, strategy in self.policy:
+            if fnmatch.fnmatchcase(base_name, pattern):
+                return(strategy)
+
+        return(self.default_strategy)
+        #__|
+
+    def clone_file(self, source, dest, strategy=None):
+        """Clone source to dest, returns the strategy used.
+
+        Returns None if dest exists and overwrite is False.
+
+        Args:
+            source:
+            dest:
+            strategy:
+                Defaults to the policy's strategy for the file name of dest
+        """
+        #| - clone_file
+        if os.path.lexists(dest):
+            if not self.overwrite:
+                return(None)
+            os.remove(dest)
+
+        if strategy is None:
+            strategy = self.strategy_for(dest)
+
+        if strategy == "hardlink":
+            try:
+                hardlink(source, dest)
+                return("hardlink")
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+            strategy = "auto"
+
+        if strategy in ["reflink", "auto"] and self.reflink_supported:
+            try:
+                reflink(source, dest)
+                return("reflink")
+            except (IOError, OSError) as e:
+                if e.errno not in UNSUPPORTED_ERRNOS + [errno.EBADF]:
+                    raise
+                self.reflink_supported = False
+
+        shutil.copy2(source, dest)
+
+        return("copy")
+        #__|
+
+    def __clone_pair__(self, pair):
+        """Clone (source, dest) pair, returns result dict."""
+        #| - __clone_pair__
+        source, dest = pair
+
+        strategy = self.clone_file(source, dest)
+
+        out = {
+            "source": source,
+            "dest": dest,
+            "strategy": strategy,
+            }
+
+        return(out)
+        #__|
+
+    def __clone_pair_safe__(self, pair):
+        """Clone (source, dest) pair, failures give strategy "error"."""
+        #| - __clone_pair_safe__
+        try:
+            out = self.__clone_pair__(pair)
+        except (IOError, OSError) as e:
+            out = {
+                "source": pair[0],
+                "dest": pair[1],
+                "strategy": "error",
+                "error": repr(e),
+                }
+
+        return(out)
+        #__|
+
+    def clone_files(self, pair_list, allow_failure=True):
+        """Clone list of (source, dest) pairs with the executor.
+
+        Returns list of result dicts (source, dest, strategy), strategy is
+        None for skipped files and "error" for failed ones (with an "error"
+        entry). With allow_failure=False the first error is raised instead.
+
+        Args:
+            pair_list:
+            allow_failure:
+        """
+        #| - clone_files
+        if allow_failure:
+            function = self.__clone_pair_safe__
+        else:
+            function = self.__clone_pair__
+
+        results, time_list = map_timed(
+            function,
+            list(pair_list),
+            executor=self.executor,
+            max_workers=self.max_workers,
+            allow_failure=False,
+            )
+
+        return(results)
+        #__|
+
+    def summary(self, results):
+        """Return {strategy: number of files} of clone_files results.
+
+        Args:
+            results:
+        """
+        #| - summary
+        counts = {}
+        for result in results:
+            key = str(result["strategy"])
+            counts[key] = counts.get(key, 0) + 1
+
+        return(counts)
+        #__|
+
+    #__| **********************************************************************
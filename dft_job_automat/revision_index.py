@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Persistent index of job revision folders ("_1", "_2", ...).
+
+Author: Raul A. Flores
+
+Maps every job directory (the folder containing the "_N" revision folders)
+to its list of revision folders. The index is stored in jobs_bin so that
+resolving the latest revision of a job is a dictionary lookup instead of an
+os.listdir call.
+
+Entries are validated against the job directory mtime (adding or removing a
+revision folder changes it) and are updated in place by the methods that
+create or remove revision folders.
+"""
+
+#| - Import Modules
+import os
+import json
+import time
+#__|
+
+
+class RevisionIndex():
+    """On-disk index of revision folders for each job directory."""
+
+    #| - RevisionIndex ********************************************************
+
+    #| - Class Variables
+    # Directory mtimes closer than this (seconds) to the time the directory
+    # was listed are not trusted (coarse file system timestamp resolution)
+    mtime_slack = 2.
+    #__|
+
+    def __init__(self,
+        index_file=None,
+        validate=True,
+        ):
+        """Initialize RevisionIndex instance.
+
+        Args:
+            index_file:
+                json file to persist the index in, if None the index only
+                lives in memory
+            validate:
+                If True, entries are checked against the directory mtime the
+                first time they're used in a session (one stat per job dir).
+                If False, stored entries are trusted as is.
+        """
+        #| - __init__
+        self.index_file = index_file
+        self.validate = validate
+
+        self.index = {}
+        self.validated = set()
+        self.modified = False
+
+        self.__load__()
+        #__|
+
+    def __load__(self):
+        """Load index from file."""
+        #| - __load__
+        if self.index_file is None:
+            return(None)
+
+        if os.path.isfile(self.index_file):
+            try:
+                with open(self.index_file, "r") as fle:
+                    self.index = json.load(fle)
+            except ValueError:
+                print("Couldn't parse revision index, it will be rebuilt")
+                self.index = {}
+        #__|
+
+    def save(self):
+        """Write index to file if it was modified."""
+        #| - save
+        if self.index_file is None or not self.modified:
+            return(None)
+
+        tmp_file = self.index_file + ".tmp"
+        with open(tmp_file, "w") as fle:
+            json.dump(self.index, fle)
+        os.rename(tmp_file, self.index_file)
+
+        self.modified = False
+        #__|
+
+    def __key__(self, path_i):
+        """Normalized index key of job directory."""
+        #| - __key__
+        key = os.path.normpath(os.path.abspath(path_i))
+
+        return(key)
+        #__|
+
+    def __scan__(self, key):
+        """List revision folders of job directory and update the entry.
+
+        Args:
+            key:
+        """
+        #| - __scan__
+        scan_time = time.time()
+
+        dirs = os.listdir(key)
+        mtime = os.stat(key).st_mtime
+
+        revision_dirs = [dir for dir in dirs if dir[0] == "_" and
+            dir[-1].isdigit() and " " not in dir]
+        revision_dirs.sort()
+
+        entry = {
+            "mtime": mtime,
+            "scan_time": scan_time,
+            "revisions": revision_dirs,
+            }
+
+        self.index[key] = entry
+        self.modified = True
+
+        return(entry)
+        #__|
+
+    def __entry_is_valid__(self, key, entry):
+        """Check entry against the current directory mtime.
+
+        Args:
+            key:
+            entry:
+        """
+        #| - __entry_is_valid__
+        mtime = os.stat(key).st_mtime
+
+        crit_0 = mtime == entry["mtime"]
+        crit_1 = mtime < entry["scan_time"] - RevisionIndex.mtime_slack
+
+        return(crit_0 and crit_1)
+        #__|
+
+    def revisions(self, path_i):
+        """Return sorted list of revision folders in job directory path_i.
+
+        Args:
+            path_i:
+                Job directory (containing the "_N" folders)
+        """
+        #| - revisions
+        key = self.__key__(path_i)
+        entry = self.index.get(key, None)
+
+        if key in self.validated and entry is not None:
+            return(list(entry["revisions"]))
+
+        if entry is None:
+            entry = self.__scan__(key)
+
+        elif self.validate and not self.__entry_is_valid__(key, entry):
+            entry = self.__scan__(key)
+
+        self.validated.add(key)
+
+        return(list(entry["revisions"]))
+        #__|
+
+    def revision_list_and_max(self, path_i):
+        """Return revision folders and highest revision number of path_i.
+
+        Same output format as DFT_Jobs_Setup.__revision_list_and_max__
+
+        Args:
+            path_i:
+        """
+        #| - revision_list_and_max
+        revision_dirs = self.revisions(path_i)
+
+        if len(revision_dirs) == 0:
+            highest_rev = None
+        else:
+            highest_rev = max(
+                [int(i.split("_")[-1]) for i in revision_dirs],
+                )
+
+        return(revision_dirs, highest_rev)
+        #__|
+
+    def __update_entry__(self, path_i, revision_dirs):
+        """Replace the revision list of path_i after a tree modification.
+
+        Args:
+            path_i:
+            revision_dirs:
+        """
+        #| - __update_entry__
+        key = self.__key__(path_i)
+
+        revision_dirs = sorted(set(revision_dirs))
+
+        self.index[key] = {
+            "mtime": os.stat(key).st_mtime,
+            "scan_time": time.time(),
+            "revisions": revision_dirs,
+            }
+
+        self.validated.add(key)
+        self.modified = True
+        #__|
+
+    def add_revision(self, path_i, revision_dir):
+        """Record newly created revision folder.
+
+        Args:
+            path_i:
+                Job directory
+            revision_dir:
+                Name of revision folder (ex. "_3")
+        """
+        #| - add_revision
+        revision_dirs = self.revisions(path_i)
+        revision_dirs.append(revision_dir)
+
+        self.__update_entry__(path_i, revision_dirs)
+        #__|
+
+    def remove_revision(self, path_i, revision_dir):
+        """Record removal of revision folder.
+
+        Args:
+            path_i:
+                Job directory
+            revision_dir:
+                Name of revision folder (ex. "_3")
+        """
+        #| - remove_revision
+        revision_dirs = self.revisions(path_i)
+        revision_dirs = [i for i in revision_dirs if i != revision_dir]
+
+        self.__update_entry__(path_i, revision_dirs)
+        #__|
+
+    def add_revision_path(self, rev_path):
+        """Record revision folder given its full path (.../job_dir/_N).
+
+        Args:
+            rev_path:
+        """
+        #| - add_revision_path
+        job_dir, revision_dir = os.path.split(os.path.normpath(rev_path))
+
+        self.add_revision(job_dir, revision_dir)
+        #__|
+
+    #__| **********************************************************************
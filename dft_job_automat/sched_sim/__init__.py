@@ -0,0 +1 @@
+"""Local stand-ins for batch scheduler executables (offline testing)."""
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Fake AWS Batch client backed by the sched_sim state file.
+
+Implements the client methods used by this package (submit_job,
+describe_jobs, terminate_job, cancel_job) with the latency, failure rate and
+state transition settings of sched_state.py (commands "batch_submit_job",
+"batch_describe_jobs", ...). Install it as the process wide client with:
+
+    from aws.batch_status import set_batch_client
+    set_batch_client(SimBatchClient())
+"""
+
+#| - Import Modules
+import os
+import time
+import uuid
+
+from dft_job_automat.sched_sim.sched_state import (
+    locked_state,
+    record_call,
+    simulate_call,
+    load_config,
+    new_job,
+    advance_jobs,
+    cancel_jobs,
+    )
+#__|
+
+
+class SimBatchError(Exception):
+    """Simulated AWS Batch API error (ex. throttling)."""
+
+    #| - SimBatchError ********************************************************
+    def __init__(self, operation, message):
+        """Initialize SimBatchError instance.
+
+        Args:
+            operation:
+            message:
+        """
+        #| - __init__
+        self.operation = operation
+        self.response = {"Error": {"Code": "ClientException",
+            "Message": message}}
+
+        Exception.__init__(self,
+            "An error occurred (ClientException) when calling the " +
+            operation + " operation: " + message)
+        #__|
+
+    #__| **********************************************************************
+
+
+class SimBatchClient():
+    """Stand-in for boto3.client("batch")."""
+
+    #| - SimBatchClient *******************************************************
+
+    #| - Class Variables
+    # describe_jobs limit of the real API
+    max_describe_jobs = 100
+    #__|
+
+    def __call__(self, operation, config=None):
+        """Simulate latency/failure of API operation."""
+        #| - __call__
+        if simulate_call("batch_" + operation, config=config):
+            raise SimBatchError(operation, "Rate exceeded")
+        #__|
+
+    def submit_job(self,
+        jobName=None,
+        jobQueue=None,
+        jobDefinition=None,
+        parameters=None,
+        containerOverrides=None,
+        **kwargs
+        ):
+        """Submit job, returns {"jobName": ..., "jobId": ...}."""
+        #| - submit_job
+        config = load_config()
+        self("SubmitJob", config=config)
+
+        if parameters is None:
+            parameters = {}
+
+        job_id = str(uuid.uuid4())
+
+        with locked_state() as state:
+            record_call(state, "batch_submit_job")
+
+            state["jobs"][job_id] = new_job(
+                "aws",
+                config=config,
+                name=jobName,
+                job_queue=jobQueue,
+                job_definition=jobDefinition,
+                parameters=dict([(k, str(v)) for k, v in parameters.items()]),
+                created_at=int(time.time() * 1000),
+                )
+
+            state.setdefault("submissions", []).append({
+                "job_id": job_id,
+                "job_queue": jobQueue,
+                "parameters": parameters,
+                "cwd": os.getcwd(),
+                })
+
+        return({"jobName": jobName, "jobId": job_id})
+        #__|
+
+    def describe_jobs(self, jobs=None):
+        """Return {"jobs": [job descriptions]} of the known job ids."""
+        #| - describe_jobs
+        if jobs is None:
+            jobs = []
+
+        if len(jobs) > SimBatchClient.max_describe_jobs:
+            raise SimBatchError("DescribeJobs",
+                "jobs must contain at most " +
+                str(SimBatchClient.max_describe_jobs) + " job ids")
+
+        self("DescribeJobs")
+
+        with locked_state() as state:
+            record_call(state, "batch_describe_jobs")
+            advance_jobs(state)
+            state_jobs = state["jobs"]
+
+        descriptions = []
+        for job_id in jobs:
+            job = state_jobs.get(job_id, None)
+            if job is None or job.get("sched") != "aws":
+                continue
+
+            description = {
+                "jobId": job_id,
+                "jobName": job["name"],
+                "jobQueue": job["job_queue"],
+                "jobDefinition": job["job_definition"],
+                "status": job["state"],
+                "parameters": job["parameters"],
+                "createdAt": job["created_at"],
+                }
+            if job.get("cancelled", False):
+                description["statusReason"] = job.get("reason", "")
+
+            descriptions.append(description)
+
+        return({"jobs": descriptions})
+        #__|
+
+    def terminate_job(self, jobId=None, reason=""):
+        """Terminate job (any state)."""
+        #| - terminate_job
+        self("TerminateJob")
+
+        with locked_state() as state:
+            record_call(state, "batch_terminate_job")
+            advance_jobs(state)
+
+            cancelled, unknown, finished = cancel_jobs(
+                state,
+                [jobId],
+                sched="aws",
+                )
+            for job_id in cancelled:
+                state["jobs"][job_id]["reason"] = reason
+
+        if unknown:
+            raise SimBatchError("TerminateJob", "Job " + str(jobId) +
+                " not found")
+
+        return({})
+        #__|
+
+    def cancel_job(self, jobId=None, reason=""):
+        """Cancel job (only jobs that aren't running yet)."""
+        #| - cancel_job
+        self("CancelJob")
+
+        with locked_state() as state:
+            record_call(state, "batch_cancel_job")
+            advance_jobs(state)
+
+            job = state["jobs"].get(jobId, None)
+            if job is not None and job["state"] == "RUNNABLE":
+                cancel_jobs(state, [jobId], sched="aws")
+                job["reason"] = reason
+
+        return({})
+        #__|
+
+    #__| **********************************************************************
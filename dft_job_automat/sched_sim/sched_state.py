@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Shared job state file for the fake scheduler executables.
+
+The fake scheduler executables in the bin folder (sbatch/squeue/scancel,
+bsub/bjobs/bkill, trisub) and the fake AWS Batch client (batch_sim.py) read
+the jobs known to the "scheduler" from a json file. The location of the file
+is given by the SCHED_SIM_STATE environment variable (defaults to
+'.sched_sim_state.json' in the current directory).
+
+State file format:
+    {
+        "jobs": {
+            "1234": {"state": "R", "partition": "regular", "name": "...",
+                     "user": "...", "submit_time": "Oct 16 18:54"},
+            },
+        "calls": {"squeue": 3, "sbatch": 1},
+        "submissions": [{"job_id": "1235", "array": "0-9", ...}],
+        "next_job_id": 1236,
+        }
+
+Example (make the fakes shadow the real executables):
+    export PATH=$PYTHONMODULES/dft_job_automat/sched_sim/bin:$PATH
+    export SCHED_SIM_STATE=/tmp/sched_state.json
+
+Simulation settings are read from the json file given by SCHED_SIM_CONFIG
+(defaults to '<state file>.config', see DEFAULT_CONFIG and set_config):
+    latency          | {command: seconds} added to every call ("default" key
+                       for all other commands)
+    failure_rate     | {command: probability} of a call failing (submission
+                       error, socket timeout, throttling, ...)
+    pending_time     | Mean seconds from submission to RUNNING, None disables
+                       the state transitions (jobs stay pending)
+    run_time         | Mean seconds from RUNNING to COMPLETED/FAILED
+    time_jitter      | Relative spread of the pending/run times (0.5 -> +-50%)
+    job_failure_rate | Probability of a job ending in the FAILED state
+
+Jobs added with add_jobs (without "submit_epoch") keep the state they were
+given.
+"""
+
+#| - Import Modules
+import os
+import json
+import time
+import fcntl
+import random
+from contextlib import contextmanager
+#__|
+
+#| - Simulation Settings
+DEFAULT_CONFIG = {
+    "latency": {},
+    "failure_rate": {},
+    "pending_time": None,
+    "run_time": 60.,
+    "time_jitter": 0.,
+    "job_failure_rate": 0.,
+    }
+
+# Scheduler specific state codes of the simulated job phases
+STATE_CODES = {
+    "slurm": {
+        "pending": "PD",
+        "running": "R",
+        "completed": "CD",
+        "failed": "F",
+        "cancelled": "CA",
+        },
+    "lsf": {
+        "pending": "PEND",
+        "running": "RUN",
+        "completed": "DONE",
+        "failed": "EXIT",
+        "cancelled": "EXIT",
+        },
+    "aws": {
+        "pending": "RUNNABLE",
+        "running": "RUNNING",
+        "completed": "SUCCEEDED",
+        "failed": "FAILED",
+        "cancelled": "FAILED",
+        },
+    }
+#__|
+
+#| - Methods
+
+def state_file_path():
+    """Return path of the scheduler state file."""
+    #| - state_file_path
+    state_file = os.environ.get("SCHED_SIM_STATE", ".sched_sim_state.json")
+
+    return(state_file)
+    #__|
+
+def empty_state():
+    """Return an empty scheduler state dict."""
+    #| - empty_state
+    state = {
+        "jobs": {},
+        "calls": {},
+        }
+
+    return(state)
+    #__|
+
+def load_state():
+    """Read the scheduler state file (read only)."""
+    #| - load_state
+    state_file = state_file_path()
+
+    if not os.path.isfile(state_file):
+        return(empty_state())
+
+    with open(state_file, "r") as fle:
+        state = json.load(fle)
+
+    for key, value in empty_state().items():
+        state.setdefault(key, value)
+
+    return(state)
+    #__|
+
+@contextmanager
+def locked_state():
+    """Context manager yielding the state dict, written back on exit.
+
+    An exclusive lock is held on '<state file>.lock' so that concurrent fake
+    scheduler calls don't clobber each other.
+    """
+    #| - locked_state
+    state_file = state_file_path()
+
+    with open(state_file + ".lock", "w") as lock_fle:
+        fcntl.flock(lock_fle, fcntl.LOCK_EX)
+
+        state = load_state()
+        yield state
+
+        tmp_file = state_file + ".tmp"
+        with open(tmp_file, "w") as fle:
+            json.dump(state, fle, indent=2)
+        os.rename(tmp_file, state_file)
+
+        fcntl.flock(lock_fle, fcntl.LOCK_UN)
+    #__|
+
+def config_file_path():
+    """Return path of the simulation settings file."""
+    #| - config_file_path
+    config_file = os.environ.get(
+        "SCHED_SIM_CONFIG",
+        state_file_path() + ".config",
+        )
+
+    return(config_file)
+    #__|
+
+def load_config():
+    """Return simulation settings (DEFAULT_CONFIG updated from file)."""
+    #| - load_config
+    config = dict(DEFAULT_CONFIG)
+
+    config_file = config_file_path()
+    if os.path.isfile(config_file):
+        with open(config_file, "r") as fle:
+            config.update(json.load(fle))
+
+    return(config)
+    #__|
+
+def set_config(**kwargs):
+    """Update simulation settings file.
+
+    Ex. set_config(latency={"sbatch": 0.2}, pending_time=5., run_time=30.)
+    """
+    #| - set_config
+    config = load_config()
+    config.update(kwargs)
+
+    with open(config_file_path(), "w") as fle:
+        json.dump(config, fle, indent=2)
+
+    return(config)
+    #__|
+
+def simulate_call(command, config=None):
+    """Apply latency of command, return True if the call should fail.
+
+    Args:
+        command:
+        config:
+            Defaults to load_config()
+    """
+    #| - simulate_call
+    if config is None:
+        config = load_config()
+
+    latency = config["latency"].get(
+        command,
+        config["latency"].get("default", 0.),
+        )
+    if latency:
+        time.sleep(latency)
+
+    failure_rate = config["failure_rate"].get(
+        command,
+        config["failure_rate"].get("default", 0.),
+        )
+    fails = random.random() < failure_rate
+
+    return(fails)
+    #__|
+
+def new_job(sched, config=None, **job_info):
+    """Return state file entry of a newly submitted job.
+
+    The pending/run times and the final state are drawn at submission.
+
+    Args:
+        sched:
+            "slurm", "lsf" or "aws"
+        config:
+        **job_info:
+            Scheduler specific fields (partition, name, ...)
+    """
+    #| - new_job
+    if config is None:
+        config = load_config()
+
+    def jitter(value):
+        spread = config["time_jitter"]
+        return(value * random.uniform(1. - spread, 1. + spread))
+
+    job = {
+        "sched": sched,
+        "state": STATE_CODES[sched]["pending"],
+        "submit_epoch": time.time(),
+        }
+
+    if config["pending_time"] is not None:
+        job["pending_time"] = jitter(config["pending_time"])
+        job["run_time"] = jitter(config["run_time"])
+        job["will_fail"] = random.random() < config["job_failure_rate"]
+
+    job.update(job_info)
+
+    return(job)
+    #__|
+
+def job_phase(job, now):
+    """Return simulated phase of job at time now.
+
+    Phases: "pending", "running", "completed", "failed", "cancelled"
+
+    Args:
+        job:
+        now:
+    """
+    #| - job_phase
+    if job.get("cancelled", False):
+        return("cancelled")
+
+    elapsed = now - job["submit_epoch"]
+    if elapsed < job["pending_time"]:
+        return("pending")
+    elif elapsed < job["pending_time"] + job["run_time"]:
+        return("running")
+    elif job.get("will_fail", False):
+        return("failed")
+    else:
+        return("completed")
+    #__|
+
+def advance_jobs(state, now=None):
+    """Update the state codes of the simulated jobs to time now.
+
+    Args:
+        state:
+        now:
+    """
+    #| - advance_jobs
+    if now is None:
+        now = time.time()
+
+    for job in state["jobs"].values():
+        if "pending_time" not in job or job.get("cancelled", False):
+            continue
+
+        codes = STATE_CODES[job["sched"]]
+        job["state"] = codes[job_phase(job, now)]
+    #__|
+
+def cancel_jobs(state, job_id_list, sched=None):
+    """Cancel jobs, returns (cancelled ids, unknown ids, finished ids).
+
+    A job array id cancels all of its elements ('<id>_<task id>').
+
+    Args:
+        state:
+        job_id_list:
+        sched:
+            Only consider jobs of this scheduler
+    """
+    #| - cancel_jobs
+    jobs = state["jobs"]
+
+    cancelled = []
+    unknown = []
+    finished = []
+    for job_id in job_id_list:
+        job_id = str(job_id)
+
+        matches = [
+            i for i in jobs.keys()
+            if (i == job_id or i.startswith(job_id + "_")) and
+            jobs[i].get("sched", sched) == sched
+            ]
+
+        if len(matches) == 0:
+            unknown.append(job_id)
+            continue
+
+        for job_id_i in matches:
+            job = jobs[job_id_i]
+
+            codes = STATE_CODES[job.get("sched", sched) or "slurm"]
+            final_states = [codes["completed"], codes["failed"],
+                codes["cancelled"]]
+            if job.get("cancelled", False) or job.get("state") in final_states:
+                finished.append(job_id_i)
+                continue
+
+            job["cancelled"] = True
+            job["state"] = codes["cancelled"]
+            cancelled.append(job_id_i)
+
+    return(cancelled, unknown, finished)
+    #__|
+
+def record_call(state, command):
+    """Increment invocation counter of command in the state dict.
+
+    Args:
+        state:
+        command:
+    """
+    #| - record_call
+    calls = state["calls"]
+    calls[command] = calls.get(command, 0) + 1
+    #__|
+
+def add_jobs(job_dict):
+    """Add jobs to the scheduler state file.
+
+    Args:
+        job_dict:
+            {job_id: {"state": ..., "partition": ..., ...}}
+    """
+    #| - add_jobs
+    with locked_state() as state:
+        for job_id, job_info in job_dict.items():
+            state["jobs"][str(job_id)] = job_info
+    #__|
+
+#__|
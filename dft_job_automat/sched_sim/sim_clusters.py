@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Cluster classes using the fake schedulers of sched_sim.
+
+Same behaviour as the compute_env cluster classes, with the scheduler
+executables replaced by the fakes in sched_sim/bin and the AWS Batch client
+replaced by SimBatchClient. Selected through the COMPENV environment variable
+(see ComputerCluster.__parse_cluster_type__):
+
+    COMPENV=sim_nersc     | SimEdisonCluster
+    COMPENV=sim_sherlock  | SimSherlockCluster
+    COMPENV=sim_slac      | SimSLACCluster
+    COMPENV=sim_aws       | SimAWSCluster
+
+Latency, failure rates and queue state transitions are configured with
+sched_state.set_config.
+"""
+
+#| - Import Modules
+import os
+
+from dft_job_automat.compute_env import (
+    EdisonCluster,
+    SherlockCluster,
+    SLACCluster,
+    AWSCluster,
+    )
+
+from aws.batch_status import set_batch_client
+from dft_job_automat.sched_sim.sched_state import state_file_path
+from dft_job_automat.sched_sim.batch_sim import SimBatchClient
+#__|
+
+#| - Methods
+
+def sim_bin(command):
+    """Return path of fake scheduler executable.
+
+    Args:
+        command:
+    """
+    #| - sim_bin
+    bin_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bin")
+
+    return(os.path.join(bin_dir, command))
+    #__|
+
+#__|
+
+
+class SimEdisonCluster(EdisonCluster):
+    """EdisonCluster with fake sbatch/squeue/scancel."""
+
+    #| - SimEdisonCluster *****************************************************
+    def __init__(self, root_dir="."):
+        """Initialize SimEdisonCluster instance.
+
+        Args:
+            root_dir:
+        """
+        #| - __init__
+        os.environ.setdefault("NERSC_HOST", "cori")
+
+        EdisonCluster.__init__(self, root_dir=root_dir)
+
+        self.squeue_cmd = sim_bin("squeue")
+        self.sbatch_cmd = sim_bin("sbatch")
+        self.scancel_cmd = sim_bin("scancel")
+        self.submit_delay = 0.
+        #__|
+
+    #__| **********************************************************************
+
+
+class SimSherlockCluster(SherlockCluster):
+    """SherlockCluster with fake sbatch/squeue/scancel."""
+
+    #| - SimSherlockCluster ***************************************************
+    def __init__(self, root_dir="."):
+        """Initialize SimSherlockCluster instance.
+
+        Args:
+            root_dir:
+        """
+        #| - __init__
+        # Username is used for the email submission parameter
+        os.environ.setdefault("USER", "sim_user")
+
+        SherlockCluster.__init__(self, root_dir=root_dir)
+
+        self.squeue_cmd = sim_bin("squeue")
+        self.sbatch_cmd = sim_bin("sbatch")
+        self.scancel_cmd = sim_bin("scancel")
+        self.submit_delay = 0.
+        #__|
+
+    #__| **********************************************************************
+
+
+class SimSLACCluster(SLACCluster):
+    """SLACCluster with fake bsub/bjobs/bkill."""
+
+    #| - SimSLACCluster *******************************************************
+    def __init__(self, root_dir="."):
+        """Initialize SimSLACCluster instance.
+
+        Args:
+            root_dir:
+        """
+        #| - __init__
+        SLACCluster.__init__(self, root_dir=root_dir)
+
+        self.bjobs_cmd = sim_bin("bjobs")
+        self.bsub_cmd = sim_bin("bsub")
+        self.bkill_cmd = sim_bin("bkill")
+        #__|
+
+    #__| **********************************************************************
+
+
+class SimAWSCluster(AWSCluster):
+    """AWSCluster with fake trisub and AWS Batch client.
+
+    $aws_sc defaults to an 'aws_sim' folder next to the scheduler state file.
+    """
+
+    #| - SimAWSCluster ********************************************************
+    def __init__(self, root_dir="."):
+        """Initialize SimAWSCluster instance.
+
+        Args:
+            root_dir:
+        """
+        #| - __init__
+        state_dir = os.path.dirname(os.path.abspath(state_file_path()))
+        os.environ.setdefault("aws_sc", os.path.join(state_dir, "aws_sim"))
+
+        AWSCluster.__init__(self, root_dir=root_dir)
+
+        if not os.path.exists(self.job_queue_dir):
+            os.makedirs(self.job_queue_dir)
+
+        self.trisub_cmd = sim_bin("trisub")
+
+        set_batch_client(SimBatchClient())
+        #__|
+
+    #__| **********************************************************************
@@ -11,6 +11,15 @@ Author(s): I got the script from Colin but I think Karen wrote these methods
 # from ase.io import read
 import numpy as np
 import os
+
+from misc_modules.regex_scan import RegexScanner, ScanPattern
+#__|
+
+#| - Module Variables
+# Second to last field of the last line containing "Fermi"
+__fermi_scanner__ = RegexScanner([
+    ScanPattern("fermi", b"Fermi", br"(\S+)\s+\S+\s*$", mode="last"),
+    ])
 #__|
 
 def find_max_empty_space(atoms, edir=3):
@@ -78,9 +87,10 @@ def calc_wf(atoms, outdir):
     # vacuum_pos).argmin()][2]
 
     # Get the latest Fermi energy
-    fermi_data = os.popen('grep -n "Fermi" %s/log | tail -1' % outdir, "r")
-    fermi_energy = float(fermi_data.readline().split()[-2])
-    fermi_data.close()
+    fermi_data = __fermi_scanner__.scan(os.path.join(outdir, "log"))["fermi"]
+    if len(fermi_data) == 0:
+        raise ValueError("Fermi energy not found in %s/log" % outdir)
+    fermi_energy = float(fermi_data[-1])
     eopreg = 0.025
 
     # we use cell_length*eopreg*3 here since the work functions seem to
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Extract values from text files with compiled regexes, in one pass.
+
+Author: Raul A. Flores
+
+Replaces `grep pattern file > tmp_file` + parsing. Every pattern has a
+compiled regex whose first group is the value, applied either
+
+    to the lines containing a literal keyword (found with mmap.find, lines
+        without it are never looked at), or
+    with keyword=None, directly to the mapped file (regex.finditer). Faster
+        when there are many matches, the regex should start with a literal
+        and not span lines.
+
+    scanner = RegexScanner([
+        ScanPattern("scf", None, br"estimated scf accuracy\s+<\s+(\S+)"),
+        ScanPattern("fermi", b"Fermi", br"(\S+)\s+\S+\s*$", mode="last"),
+        ])
+    out = scanner.scan("calcdir/log")  # {"scf": array, "fermi": array}
+
+    mode:
+        "all"   | Every matching line, in file order (one pass over the file)
+        "first" | First matching line only
+        "last"  | Last matching line only, searched from the end of the file
+
+Lines where the regex doesn't match or the value can't be converted are
+skipped. The file is mapped, not read, so memory use doesn't depend on its
+size (the "all" pass goes through the file in windows whose pages are
+released afterwards).
+"""
+
+#| - Import Modules
+import os
+import re
+import mmap
+
+import numpy as np
+#__|
+
+#| - Module Variables
+# Window of the "all" pass (bytes)
+WINDOW_SIZE = 64 * 1024 ** 2
+#__|
+
+
+class ScanPattern():
+    """Value to extract from the lines containing a keyword."""
+
+    #| - ScanPattern **********************************************************
+    def __init__(self,
+        name,
+        keyword,
+        regex,
+        mode="all",
+        dtype=float,
+        ):
+        """Initialize ScanPattern instance.
+
+        Args:
+            name:
+                Key of the output dict
+            keyword:
+                Literal (bytes) every matching line contains, None to search
+                the regex in the whole file
+            regex:
+                bytes regex (or compiled regex) searched in the line (or the
+                file), the first group is the value
+            mode:
+                "all" | "first" | "last"
+            dtype:
+                Conversion of the value
+        """
+        #| - __init__
+        assert mode in ["all", "first", "last"], "Unknown mode: " + str(mode)
+
+        self.name = name
+        self.keyword = keyword
+        if isinstance(regex, bytes):
+            regex = re.compile(regex)
+        self.regex = regex
+        self.mode = mode
+        self.dtype = dtype
+        #__|
+
+    def value(self, line):
+        """Return value of line, None if it doesn't match.
+
+        Args:
+            line:
+                bytes
+        """
+        #| - value
+        match = self.regex.search(line)
+        if match is None:
+            return(None)
+
+        return(self.match_value(match))
+        #__|
+
+    def match_value(self, match):
+        """Return value of regex match, None if it can't be converted.
+
+        Args:
+            match:
+        """
+        #| - match_value
+        try:
+            return(self.dtype(match.group(1)))
+        except ValueError:
+            return(None)
+        #__|
+
+    def find_all(self, mm, start, end):
+        """Return values of mm[start:end] (whole lines).
+
+        Args:
+            mm:
+            start:
+            end:
+        """
+        #| - find_all
+        values = []
+
+        if self.keyword is None:
+            for match in self.regex.finditer(mm, start, end):
+                value = self.match_value(match)
+                if value is not None:
+                    values.append(value)
+
+            return(values)
+
+        keyword = self.keyword
+        pos = mm.find(keyword, start, end)
+        while pos != -1:
+            line_start, line = __line_at__(mm, pos)
+
+            value = self.value(line)
+            if value is not None:
+                values.append(value)
+
+            # Next line, the keyword may be more than once in a line (grep
+            # counts it once)
+            pos = mm.find(keyword, line_start + len(line) + 1, end)
+
+        return(values)
+        #__|
+
+    #__| **********************************************************************
+
+
+#| - Methods
+
+def __line_at__(mm, pos):
+    """Return (line start, line) of the line of mm containing pos."""
+    #| - __line_at__
+    line_start = mm.rfind(b"\n", 0, pos) + 1
+
+    line_end = mm.find(b"\n", pos)
+    if line_end == -1:
+        line_end = len(mm)
+
+    return(line_start, mm[line_start:line_end])
+    #__|
+
+def __scan_first__(mm, pattern):
+    """Return first value of pattern in mm (None if not found)."""
+    #| - __scan_first__
+    if pattern.keyword is None:
+        for match in pattern.regex.finditer(mm):
+            value = pattern.match_value(match)
+            if value is not None:
+                return(value)
+
+        return(None)
+
+    pos = mm.find(pattern.keyword)
+    while pos != -1:
+        line_start, line = __line_at__(mm, pos)
+
+        value = pattern.value(line)
+        if value is not None:
+            return(value)
+
+        pos = mm.find(pattern.keyword, line_start + len(line) + 1)
+
+    return(None)
+    #__|
+
+def __scan_last__(mm, pattern):
+    """Return last value of pattern in mm (None if not found)."""
+    #| - __scan_last__
+    if pattern.keyword is None:
+        values = pattern.find_all(mm, 0, len(mm))
+        if len(values) == 0:
+            return(None)
+
+        return(values[-1])
+
+    pos = mm.rfind(pattern.keyword)
+    while pos != -1:
+        line_start, line = __line_at__(mm, pos)
+
+        value = pattern.value(line)
+        if value is not None:
+            return(value)
+
+        pos = mm.rfind(pattern.keyword, 0, line_start)
+
+    return(None)
+    #__|
+
+def __scan_all__(mm, patterns):
+    """Return {name: values} of the "all" patterns, one pass over mm."""
+    #| - __scan_all__
+    values = dict([(pattern.name, []) for pattern in patterns])
+
+    start = 0
+    while start < len(mm):
+        # Windows end at a line end, the matches never span two windows
+        end = mm.find(b"\n", min(start + WINDOW_SIZE, len(mm)) - 1) + 1
+        if end == 0:
+            end = len(mm)
+
+        for pattern in patterns:
+            values[pattern.name].extend(pattern.find_all(mm, start, end))
+
+        if hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+            page_start = start - start % mmap.PAGESIZE
+            mm.madvise(mmap.MADV_DONTNEED, page_start, end - page_start)
+
+        start = end
+
+    return(values)
+    #__|
+
+#__|
+
+
+class RegexScanner():
+    """Extract the values of a list of ScanPatterns from files."""
+
+    #| - RegexScanner *********************************************************
+    def __init__(self, patterns):
+        """Initialize RegexScanner instance.
+
+        Args:
+            patterns:
+                List of ScanPattern instances
+        """
+        #| - __init__
+        names = [pattern.name for pattern in patterns]
+        assert len(set(names)) == len(names), "Duplicate pattern names"
+
+        self.patterns = patterns
+        #__|
+
+    def scan(self, file_name):
+        """Return {pattern name: numpy array of values} of file.
+
+        "first"/"last" patterns give arrays of 0 or 1 values.
+
+        Args:
+            file_name:
+        """
+        #| - scan
+        out = {}
+        for pattern in self.patterns:
+            out[pattern.name] = []
+
+        with open(file_name, "rb") as fle:
+            if os.fstat(fle.fileno()).st_size == 0:
+                return(self.__to_arrays__(out))
+
+            mm = mmap.mmap(fle.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                all_patterns = [i for i in self.patterns if i.mode == "all"]
+                out.update(__scan_all__(mm, all_patterns))
+
+                for pattern in self.patterns:
+                    if pattern.mode == "first":
+                        value = __scan_first__(mm, pattern)
+                    elif pattern.mode == "last":
+                        value = __scan_last__(mm, pattern)
+                    else:
+                        continue
+
+                    if value is not None:
+                        out[pattern.name] = [value]
+            finally:
+                mm.close()
+
+        return(self.__to_arrays__(out))
+        #__|
+
+    def __to_arrays__(self, out):
+        """Convert the value lists of out to numpy arrays."""
+        #| - __to_arrays__
+        for pattern in self.patterns:
+            out[pattern.name] = np.array(out[pattern.name], dtype=pattern.dtype)
+
+        return(out)
+        #__|
+
+    #__| **********************************************************************
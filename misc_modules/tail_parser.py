@@ -0,0 +1,424 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Resumable parsing of files that are still being written (running jobs).
+
+Author: Raul A. Flores
+
+A TailParser feeds the complete lines of a file to a line parser (any object
+with feed(line) and result() methods, e.g. QELogParser) and remembers how far
+it got, so that the next update only reads the bytes appended since:
+
+    tail = tail_parse("calcdir/log", QELogParser)
+    tail.result()
+
+The offset and the parser are kept in memory (tail_parse) and in a sidecar
+next to the file (.<file name>.tail.npz), so a new python process resumes
+where the last one stopped. The parser state is written with parser.to_dict()
+and restored with parser_class.from_dict(), parsers without these methods are
+only kept in memory. The numpy arrays of the state are stored as arrays of the
+npz file, everything else as a JSON string, the sidecar is loaded without
+pickle. Parsing restarts from byte 0 if the file was replaced (new inode),
+shrank, or the bytes before the offset changed.
+"""
+
+#| - Import Modules
+import os
+import json
+import base64
+
+from collections import OrderedDict
+
+import numpy as np
+#__|
+
+#| - Module Variables
+# dtypes of LineValueParser that can be restored from the sidecar
+DTYPES = {"float": float, "int": int, "str": str}
+
+SIDECAR_VERSION = 2
+
+# Bytes before the offset compared to detect rewritten files
+CHECK_SIZE = 64
+
+# Bytes read at a time
+BLOCK_SIZE = 16 * 1024 ** 2
+
+# Number of TailParsers kept by tail_parse
+CACHE_SIZE = 512
+
+__tail_parsers = OrderedDict()
+#__|
+
+#| - Methods
+
+def sidecar_file_name(file_name):
+    """Return path of the tail parser sidecar of file_name.
+
+    Args:
+        file_name:
+    """
+    #| - sidecar_file_name
+    dir_name, base_name = os.path.split(os.path.abspath(file_name))
+
+    return(os.path.join(dir_name, "." + base_name + ".tail.npz"))
+    #__|
+
+def __json_default__(obj):
+    """Serialize types (e.g. dtype=float parser kwargs) by name."""
+    #| - __json_default__
+    if isinstance(obj, type):
+        return(obj.__name__)
+
+    raise TypeError("Not JSON serializable: " + repr(obj))
+    #__|
+
+def tail_lines(file_name, num_lines, block_size=8192):
+    """Return last num_lines lines of file, reading it from the end.
+
+    Lines are stripped, like [line.strip() for line in fle][-num_lines:].
+
+    Args:
+        file_name:
+        num_lines:
+        block_size:
+    """
+    #| - tail_lines
+    with open(file_name, "rb") as fle:
+        fle.seek(0, os.SEEK_END)
+        pos = fle.tell()
+
+        data = b""
+        while pos > 0 and data.count(b"\n") <= num_lines:
+            read_size = min(block_size, pos)
+            pos -= read_size
+            fle.seek(pos)
+            data = fle.read(read_size) + data
+
+    lines = data.decode("utf-8", "replace").splitlines()
+    if pos > 0:
+        # First line may be partial
+        lines = lines[1:]
+
+    lines = [line.strip() for line in lines]
+
+    return(lines[-num_lines:])
+    #__|
+
+def tail_parse(file_name, parser_class, sidecar=True, **parser_kwargs):
+    """Return updated TailParser of file, shared between calls.
+
+    Args:
+        file_name:
+        parser_class:
+        sidecar:
+        **parser_kwargs:
+            Passed to parser_class
+    """
+    #| - tail_parse
+    key = (
+        os.path.abspath(file_name),
+        parser_class.__name__,
+        tuple(sorted(parser_kwargs.items())),
+        )
+
+    tail = __tail_parsers.pop(key, None)
+    if tail is None:
+        tail = TailParser(
+            file_name,
+            parser_class,
+            sidecar=sidecar,
+            **parser_kwargs)
+
+    # Reinserted as most recently used (no OrderedDict.move_to_end in python 2)
+    __tail_parsers[key] = tail
+    while len(__tail_parsers) > CACHE_SIZE:
+        __tail_parsers.popitem(last=False)
+
+    tail.update()
+
+    return(tail)
+    #__|
+
+#__|
+
+
+class LineValueParser():
+    """Collect one field of the lines containing a keyword."""
+
+    #| - LineValueParser ******************************************************
+    def __init__(self, keyword, field=-1, dtype=float):
+        """Initialize LineValueParser instance.
+
+        Args:
+            keyword:
+            field:
+                Index of the whitespace separated field
+            dtype:
+        """
+        #| - __init__
+        self.keyword = keyword
+        self.field = field
+        self.dtype = dtype
+
+        self.values = []
+        #__|
+
+    def feed(self, line):
+        """Process single line."""
+        #| - feed
+        if self.keyword in line:
+            try:
+                self.values.append(self.dtype(line.split()[self.field]))
+            except (ValueError, IndexError):
+                pass
+        #__|
+
+    def result(self):
+        """Return list of values."""
+        #| - result
+        return(list(self.values))
+        #__|
+
+    def to_dict(self):
+        """Return JSON serializable state."""
+        #| - to_dict
+        state = {
+            "keyword": self.keyword,
+            "field": self.field,
+            "dtype": self.dtype.__name__,
+            "values": self.values,
+            }
+
+        return(state)
+        #__|
+
+    @classmethod
+    def from_dict(cls, state):
+        """Return LineValueParser with state of to_dict.
+
+        Args:
+            state:
+        """
+        #| - from_dict
+        parser = cls(
+            state["keyword"],
+            field=state["field"],
+            dtype=DTYPES[state["dtype"]],
+            )
+        parser.values = list(state["values"])
+
+        return(parser)
+        #__|
+
+    #__| **********************************************************************
+
+
+class TailParser():
+    """Feed the lines appended to a file since the last update to a parser."""
+
+    #| - TailParser ***********************************************************
+    def __init__(self,
+        file_name,
+        parser_class,
+        sidecar=True,
+        **parser_kwargs
+        ):
+        """Initialize TailParser instance.
+
+        Args:
+            file_name:
+            parser_class:
+                Class of the line parser, instantiated with parser_kwargs
+                (again when parsing restarts)
+            sidecar:
+                Load/save the state from/to the .tail.npz sidecar (only
+                if parser_class has to_dict/from_dict methods)
+            **parser_kwargs:
+        """
+        #| - __init__
+        self.file_name = file_name
+        self.parser_class = parser_class
+        self.parser_kwargs = parser_kwargs
+        self.sidecar = sidecar and hasattr(parser_class, "from_dict")
+        self.sidecar_file = sidecar_file_name(file_name)
+
+        self.num_restarts = 0
+        self.bytes_parsed = 0
+
+        if not self.__load_state__():
+            self.__reset__()
+        #__|
+
+    def __reset__(self):
+        """Start parsing from byte 0."""
+        #| - __reset__
+        self.parser = self.parser_class(**self.parser_kwargs)
+        self.offset = 0
+        self.inode = None
+        self.check = b""
+        #__|
+
+    def __state__(self):
+        """Return state dict saved in the sidecar."""
+        #| - __state__
+        state = {
+            "version": SIDECAR_VERSION,
+            "parser_class": self.parser_class.__name__,
+            "parser_kwargs": self.__json_kwargs__(),
+            "offset": self.offset,
+            "inode": self.inode,
+            "check": base64.b64encode(self.check).decode("ascii"),
+            "parser": self.parser.to_dict(),
+            }
+
+        return(state)
+        #__|
+
+    def __json_kwargs__(self):
+        """Return parser_kwargs as they read back from the sidecar."""
+        #| - __json_kwargs__
+        kwargs_json = json.dumps(
+            self.parser_kwargs,
+            default=__json_default__,
+            sort_keys=True,
+            )
+
+        return(json.loads(kwargs_json))
+        #__|
+
+    def __load_state__(self):
+        """Load state from sidecar, returns True if it was usable."""
+        #| - __load_state__
+        if not self.sidecar or not os.path.isfile(self.sidecar_file):
+            return(False)
+
+        try:
+            with np.load(self.sidecar_file, allow_pickle=False) as npz:
+                state = json.loads(str(npz["state"]))
+
+                for name in npz.files:
+                    if name.startswith("parser."):
+                        state["parser"][name[len("parser."):]] = npz[name]
+
+            valid = (
+                state.get("version", None) == SIDECAR_VERSION and
+                state.get("parser_class", None) ==
+                    self.parser_class.__name__ and
+                state.get("parser_kwargs", None) == self.__json_kwargs__()
+                )
+            if not valid:
+                return(False)
+
+            parser = self.parser_class.from_dict(state["parser"])
+            offset = int(state["offset"])
+            inode = state["inode"]
+            check = base64.b64decode(state["check"])
+        except Exception:
+            # Unreadable or incomplete sidecar, parsed again from byte 0
+            return(False)
+
+        self.parser = parser
+        self.offset = offset
+        self.inode = inode
+        self.check = check
+
+        return(True)
+        #__|
+
+    def __save_state__(self):
+        """Write state to sidecar."""
+        #| - __save_state__
+        if not self.sidecar:
+            return(None)
+
+        tmp_file = self.sidecar_file + "." + str(os.getpid()) + ".tmp"
+        try:
+            state = self.__state__()
+
+            # numpy arrays of the parser state are stored as npz arrays
+            arrays = {}
+            for key, value in list(state["parser"].items()):
+                if isinstance(value, np.ndarray):
+                    arrays["parser." + key] = state["parser"].pop(key)
+
+            with open(tmp_file, "wb") as fle:
+                np.savez(fle, state=np.array(json.dumps(state)), **arrays)
+            os.rename(tmp_file, self.sidecar_file)
+        except (IOError, OSError, TypeError, ValueError):
+            if os.path.isfile(tmp_file):
+                os.remove(tmp_file)
+        #__|
+
+    def __file_changed__(self, fle, stat):
+        """Return True if file isn't the continuation of what was parsed."""
+        #| - __file_changed__
+        if self.offset == 0:
+            return(False)
+
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            return(True)
+
+        fle.seek(self.offset - len(self.check))
+        return(fle.read(len(self.check)) != self.check)
+        #__|
+
+    def update(self):
+        """Parse the complete lines appended since the last update.
+
+        Returns number of bytes parsed.
+        """
+        #| - update
+        with open(self.file_name, "rb") as fle:
+            stat = os.fstat(fle.fileno())
+
+            if self.__file_changed__(fle, stat):
+                self.num_restarts += 1
+                self.__reset__()
+
+            self.inode = stat.st_ino
+
+            fle.seek(self.offset)
+            remaining = stat.st_size - self.offset
+
+            feed = self.parser.feed
+            parsed = 0
+            pending = b""
+            while remaining > 0:
+                block = fle.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+
+                # Incomplete last line is left for the next block/update
+                block = pending + block
+                block_end = block.rfind(b"\n") + 1
+                pending = block[block_end:]
+                if block_end == 0:
+                    continue
+
+                # Split on "\n" only, like iterating over the file
+                text = block[:block_end].decode("utf-8", "replace")
+                for line in text.split("\n")[:-1]:
+                    feed(line)
+
+                parsed += block_end
+                self.check = (self.check + block[:block_end])[-CHECK_SIZE:]
+
+        if parsed == 0:
+            return(0)
+
+        self.offset += parsed
+        self.bytes_parsed += parsed
+        self.__save_state__()
+
+        return(parsed)
+        #__|
+
+    def result(self):
+        """Return result of the parser."""
+        #| - result
+        return(self.parser.result())
+        #__|
+
+    #__| **********************************************************************
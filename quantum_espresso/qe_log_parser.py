@@ -0,0 +1,598 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Single pass parser of Quantum Espresso (pw.x) log files.
+
+Author: Raul A. Flores
+
+The log is fed line by line to a small state machine which collects every
+quantity used by qe_methods in one read:
+
+    num_atoms, elem_ind_dict   | "Cartesian axes" block (last one)
+    atom_num, charge, magmom,  | "Magnetic moment per site" blocks, one entry
+    iteration                  |  per atom and SCF iteration (flat arrays)
+    tot_mag, abs_mag           | total/absolute magnetization per iteration
+    scf_accuracy               | estimated scf accuracy (Ry) per iteration
+    total_energy               | "!    total energy" lines (Ry)
+
+    result = parse_qe_log("calcdir/log")
+    result.magmom_matrix()  # (iterations, atoms)
+
+Parsed files are cached by path, size and mtime, so that calling several of
+the qe_methods functions on the same log only reads it once.
+
+Logs of running jobs can be parsed incrementally (incremental=True), only the
+lines appended since the last call are read (see misc_modules.tail_parser).
+"""
+
+#| - Import Modules
+import io
+import os
+import copy
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from misc_modules.tail_parser import tail_parse
+#__|
+
+#| - Module Variables
+# Number of parsed logs kept by parse_qe_log
+CACHE_SIZE = 16
+
+__parse_cache = OrderedDict()
+#__|
+
+
+class GrowingArray():
+    """1D numpy array with amortized appends (capacity doubles when full)."""
+
+    #| - GrowingArray *********************************************************
+    def __init__(self, dtype=float, capacity=256):
+        """Initialize GrowingArray instance.
+
+        Args:
+            dtype:
+            capacity:
+        """
+        #| - __init__
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+        #__|
+
+    def append(self, value):
+        """Append value."""
+        #| - append
+        if self.size == len(self.data):
+            new_data = np.empty(2 * len(self.data), dtype=self.data.dtype)
+            new_data[:self.size] = self.data
+            self.data = new_data
+
+        self.data[self.size] = value
+        self.size += 1
+        #__|
+
+    def values(self):
+        """Return copy of the filled part of the array."""
+        #| - values
+        return(self.data[:self.size].copy())
+        #__|
+
+    def __len__(self):
+        """Return number of entries."""
+        #| - __len__
+        return(self.size)
+        #__|
+
+    @classmethod
+    def from_values(cls, values):
+        """Return GrowingArray filled with the entries of 1D array values.
+
+        Args:
+            values:
+        """
+        #| - from_values
+        values = np.asarray(values)
+
+        array = cls(dtype=values.dtype, capacity=max(256, 2 * len(values)))
+        array.data[:len(values)] = values
+        array.size = len(values)
+
+        return(array)
+        #__|
+
+    #__| **********************************************************************
+
+
+class QELogResult():
+    """Quantities parsed from a QE log file."""
+
+    #| - QELogResult **********************************************************
+    def __init__(self,
+        num_atoms=None,
+        elem_ind_dict=None,
+        atom_num=None,
+        charge=None,
+        magmom=None,
+        iteration=None,
+        tot_mag=None,
+        abs_mag=None,
+        scf_accuracy=None,
+        total_energy=None,
+        last_block_abs_mag=None,
+        ):
+        """Initialize QELogResult instance.
+
+        Args:
+            num_atoms:
+            elem_ind_dict:
+                {atom index: element}
+            atom_num, charge, magmom, iteration:
+                Flat arrays, one entry per atom line of the magnetic moment
+                blocks
+            tot_mag, abs_mag:
+            scf_accuracy:
+            total_energy:
+            last_block_abs_mag:
+                Absolute magnetization printed after the last magnetic
+                moment block (None if there isn't one)
+        """
+        #| - __init__
+        self.num_atoms = num_atoms
+        self.elem_ind_dict = elem_ind_dict
+        self.atom_num = atom_num
+        self.charge = charge
+        self.magmom = magmom
+        self.iteration = iteration
+        self.tot_mag = tot_mag
+        self.abs_mag = abs_mag
+        self.scf_accuracy = scf_accuracy
+        self.total_energy = total_energy
+        self.last_block_abs_mag = last_block_abs_mag
+        #__|
+
+    @property
+    def num_iterations(self):
+        """Number of magnetic moment blocks."""
+        #| - num_iterations
+        if len(self.iteration) == 0:
+            return(0)
+
+        return(int(self.iteration[-1]) + 1)
+        #__|
+
+    def __matrix__(self, values):
+        """Return (iterations, atoms) matrix of flat array, NaN if missing."""
+        #| - __matrix__
+        num_cols = self.num_atoms or 0
+        if len(self.atom_num) > 0:
+            num_cols = max(num_cols, int(self.atom_num.max()) + 1)
+
+        matrix = np.full((self.num_iterations, num_cols), np.nan)
+        matrix[self.iteration, self.atom_num] = values
+
+        return(matrix)
+        #__|
+
+    def magmom_matrix(self):
+        """Return magmoms as (iterations, atoms) array."""
+        #| - magmom_matrix
+        return(self.__matrix__(self.magmom))
+        #__|
+
+    def charge_matrix(self):
+        """Return charges as (iterations, atoms) array."""
+        #| - charge_matrix
+        return(self.__matrix__(self.charge))
+        #__|
+
+    def last_block(self):
+        """Return (atom_num, charge, magmom) arrays of last magmom block."""
+        #| - last_block
+        mask = self.iteration == self.num_iterations - 1
+
+        return(self.atom_num[mask], self.charge[mask], self.magmom[mask])
+        #__|
+
+    def magmom_charge_df(self):
+        """Return long format DataFrame of the magnetic moment blocks.
+
+        Columns: atom_num, charge, magmom, iteration, element. The index is
+        the position of the atom line in its block.
+        """
+        #| - magmom_charge_df
+        if len(self.iteration) == 0:
+            return(None)
+
+        # Position of every entry within its block
+        starts = np.searchsorted(self.iteration, self.iteration, side="left")
+        index = np.arange(len(self.iteration)) - starts
+
+        df = pd.DataFrame(
+            {
+                "atom_num": self.atom_num,
+                "charge": self.charge,
+                "magmom": self.magmom,
+                "iteration": self.iteration,
+                },
+            index=index,
+            )
+        df["element"] = df["atom_num"].map(self.elem_ind_dict)
+
+        return(df)
+        #__|
+
+    def tot_abs_df(self):
+        """Return DataFrame of total and absolute magnetization."""
+        #| - tot_abs_df
+        df_tot = pd.DataFrame(self.tot_mag, columns=["tot_mag"])
+        df_abs = pd.DataFrame(self.abs_mag, columns=["abs_mag"])
+
+        df = pd.concat([df_tot, df_abs], axis=1)
+
+        return(df)
+        #__|
+
+    #__| **********************************************************************
+
+
+class QELogParser():
+    """Line fed state machine parsing QE log files."""
+
+    #| - QELogParser **********************************************************
+
+    #| - Class Variables
+    # GrowingArray attributes, see to_dict
+    array_attrs = [
+        "atom_num",
+        "charge",
+        "magmom",
+        "iteration",
+        "tot_mag",
+        "abs_mag",
+        "scf_accuracy",
+        "total_energy",
+        ]
+
+    scalar_attrs = [
+        "mode",
+        "skip_lines",
+        "num_atoms",
+        "num_blocks",
+        "block_open",
+        "abs_pending",
+        "last_block_abs_mag",
+        ]
+    #__|
+
+    def __init__(self):
+        """Initialize QELogParser instance."""
+        #| - __init__
+        # "scan" | "cart_skip" | "cart" | "magn"
+        self.mode = "scan"
+        self.skip_lines = 0
+
+        self.num_atoms = None
+        self.elem_ind_dict = {}
+        self.cart_block = []
+
+        self.num_blocks = 0
+        self.block_open = False
+        self.abs_pending = False
+        self.last_block_abs_mag = None
+
+        self.atom_num = GrowingArray(dtype=int)
+        self.charge = GrowingArray()
+        self.magmom = GrowingArray()
+        self.iteration = GrowingArray(dtype=int)
+
+        self.tot_mag = GrowingArray()
+        self.abs_mag = GrowingArray()
+        self.scf_accuracy = GrowingArray()
+        self.total_energy = GrowingArray()
+        #__|
+
+    def to_dict(self):
+        """Return state dict, JSON serializable apart from numpy arrays.
+
+        See misc_modules.tail_parser, which saves it in the sidecar.
+        """
+        #| - to_dict
+        state = dict([(key, getattr(self, key)) for key in self.scalar_attrs])
+
+        # JSON object keys are strings
+        state["elem_ind_dict"] = [
+            [ind_i, elem_i] for ind_i, elem_i in self.elem_ind_dict.items()
+            ]
+        state["cart_block"] = [list(i) for i in self.cart_block]
+
+        for key in self.array_attrs:
+            state[key] = getattr(self, key).values()
+
+        return(state)
+        #__|
+
+    @classmethod
+    def from_dict(cls, state):
+        """Return QELogParser with state of to_dict.
+
+        Args:
+            state:
+        """
+        #| - from_dict
+        parser = cls()
+
+        for key in cls.scalar_attrs:
+            setattr(parser, key, state[key])
+
+        parser.elem_ind_dict = dict([
+            (int(ind_i), elem_i) for ind_i, elem_i in state["elem_ind_dict"]
+            ])
+        parser.cart_block = [
+            (int(ind_i), elem_i) for ind_i, elem_i in state["cart_block"]
+            ]
+
+        for key in cls.array_attrs:
+            setattr(parser, key, GrowingArray.from_values(state[key]))
+
+        return(parser)
+        #__|
+
+    def feed(self, line):
+        """Process single line of the log.
+
+        Args:
+            line:
+        """
+        #| - feed
+        mode = self.mode
+
+        if mode == "cart_skip":
+            # Blank line and column headers after "Cartesian axes"
+            self.skip_lines -= 1
+            if self.skip_lines == 0:
+                self.mode = "cart"
+            return(None)
+
+        elif mode == "cart":
+            if "tau(" in line:
+                self.__cart_line__(line)
+                return(None)
+
+            self.__close_cart_block__()
+
+        elif mode == "magn":
+            if "atom:" in line:
+                self.__magn_line__(line)
+                return(None)
+
+            self.__close_magn_block__()
+
+        self.__scan_line__(line)
+        #__|
+
+    def feed_lines(self, lines):
+        """Process iterable of lines.
+
+        Args:
+            lines:
+        """
+        #| - feed_lines
+        feed = self.feed
+        for line in lines:
+            feed(line)
+        #__|
+
+    def __scan_line__(self, line):
+        """Look for the start of blocks and the single line quantities."""
+        #| - __scan_line__
+        if "Cartesian axes" in line:
+            self.mode = "cart_skip"
+            self.skip_lines = 2
+            self.cart_block = []
+
+        elif "Magnetic moment per site" in line:
+            self.mode = "magn"
+            self.block_open = False
+
+        elif "magnetization" in line:
+            if "total magnetization" in line:
+                value = __line_value__(line, 3)
+                if value is not None:
+                    self.tot_mag.append(value)
+
+            elif "absolute magnetization" in line:
+                abs_mag = __line_value__(line, 3)
+                if abs_mag is None:
+                    return(None)
+
+                self.abs_mag.append(abs_mag)
+
+                if self.abs_pending:
+                    self.last_block_abs_mag = abs_mag
+                    self.abs_pending = False
+
+        elif "estimated scf accuracy" in line:
+            value = __line_value__(line, 4)
+            if value is not None:
+                self.scf_accuracy.append(value)
+
+        elif line.startswith("!") and "total energy" in line:
+            value = __line_value__(line, 4)
+            if value is not None:
+                self.total_energy.append(value)
+        #__|
+
+    def __cart_line__(self, line):
+        """Atom line of the Cartesian axes block."""
+        #| - __cart_line__
+        line_list = line.split()
+
+        try:
+            ind_i = int(line_list[0]) - 1  # "0" indexed
+            elem_i = "".join([i for i in line_list[1] if not i.isdigit()])
+        except (ValueError, IndexError):
+            return(None)
+
+        self.cart_block.append((ind_i, elem_i))
+        #__|
+
+    def __close_cart_block__(self):
+        """End of the Cartesian axes block."""
+        #| - __close_cart_block__
+        self.mode = "scan"
+
+        self.num_atoms = len(self.cart_block)
+        for ind_i, elem_i in self.cart_block:
+            self.elem_ind_dict[ind_i] = elem_i
+        #__|
+
+    def __magn_line__(self, line):
+        """Atom line of the magnetic moment block."""
+        #| - __magn_line__
+        line_list = line.split()
+
+        try:
+            atom_num = int(line_list[1]) - 1  # "0" indexed
+            charge = float(line_list[3])
+            magmom = float(line_list[5])
+        except (ValueError, IndexError):
+            return(None)
+
+        if not self.block_open:
+            self.block_open = True
+            self.num_blocks += 1
+
+        self.atom_num.append(atom_num)
+        self.charge.append(charge)
+        self.magmom.append(magmom)
+        self.iteration.append(self.num_blocks - 1)
+        #__|
+
+    def __close_magn_block__(self):
+        """End of the magnetic moment block."""
+        #| - __close_magn_block__
+        self.mode = "scan"
+
+        if self.block_open:
+            self.abs_pending = True
+            self.last_block_abs_mag = None
+        #__|
+
+    def finish(self):
+        """Close a block left open at the end of the file."""
+        #| - finish
+        if self.mode == "cart":
+            self.__close_cart_block__()
+        elif self.mode == "magn":
+            self.__close_magn_block__()
+        else:
+            # File cut in the Cartesian axes header, no atoms read yet
+            self.mode = "scan"
+        #__|
+
+    def result(self):
+        """Return QELogResult of the lines fed so far.
+
+        A block still open (file being written) is closed in a copy of the
+        parser, so feeding can resume afterwards.
+        """
+        #| - result
+        if self.mode != "scan":
+            parser = copy.deepcopy(self)
+            parser.finish()
+            return(parser.result())
+
+        result = QELogResult(
+            num_atoms=self.num_atoms,
+            elem_ind_dict=dict(self.elem_ind_dict),
+            atom_num=self.atom_num.values(),
+            charge=self.charge.values(),
+            magmom=self.magmom.values(),
+            iteration=self.iteration.values(),
+            tot_mag=self.tot_mag.values(),
+            abs_mag=self.abs_mag.values(),
+            scf_accuracy=self.scf_accuracy.values(),
+            total_energy=self.total_energy.values(),
+            last_block_abs_mag=self.last_block_abs_mag,
+            )
+
+        return(result)
+        #__|
+
+    #__| **********************************************************************
+
+
+#| - Methods
+
+def __line_value__(line, field):
+    """Return float of whitespace separated field of line, None if missing.
+
+    Lines of a log that is still being written can be cut short.
+    """
+    #| - __line_value__
+    try:
+        return(float(line.split()[field]))
+    except (ValueError, IndexError):
+        return(None)
+    #__|
+
+def parse_qe_log(file_name, use_cache=True, incremental=False):
+    """Parse QE log file, returns QELogResult.
+
+    Args:
+        file_name:
+        use_cache:
+            Reuse the result of a previous parse if the file's size and mtime
+            haven't changed
+        incremental:
+            Resume from the offset and parser state of the last call (kept in
+            memory and in a .<log>.tail.npz sidecar), for logs of running
+            jobs
+    """
+    #| - parse_qe_log
+    if incremental:
+        return(tail_parse(file_name, QELogParser).result())
+
+    stat = os.stat(file_name)
+    key = os.path.abspath(file_name)
+    stamp = (stat.st_size, stat.st_mtime)
+
+    if use_cache and key in __parse_cache:
+        cached_stamp, result = __parse_cache[key]
+        if cached_stamp == stamp:
+            # Reinserted as most recently used (no OrderedDict.move_to_end in
+            # python 2)
+            del __parse_cache[key]
+            __parse_cache[key] = (stamp, result)
+            return(result)
+
+    # An unterminated last line (log still being written) is ignored, like in
+    # the incremental parse
+    parser = QELogParser()
+    feed = parser.feed
+    with io.open(file_name, "r", errors="replace") as fle:
+        for line in fle:
+            if line[-1:] != "\n":
+                break
+            feed(line)
+    parser.finish()
+
+    result = parser.result()
+
+    if use_cache:
+        __parse_cache[key] = (stamp, result)
+        while len(__parse_cache) > CACHE_SIZE:
+            __parse_cache.popitem(last=False)
+
+    return(result)
+    #__|
+
+def clear_cache():
+    """Empty the parse_qe_log cache."""
+    #| - clear_cache
+    __parse_cache.clear()
+    #__|
+
+#__|
@@ -10,10 +10,31 @@ import os
 import pandas as pd
 
 import numpy as np
+
+from quantum_espresso.qe_log_parser import parse_qe_log
+from misc_modules.regex_scan import RegexScanner, ScanPattern
+#__|
+
+#| - Module Variables
+__scf_scanner__ = RegexScanner([
+    ScanPattern("scf", None, br"estimated scf accuracy\s+<\s+(\S+)"),
+    ScanPattern(
+        "ecutwfc",
+        b"kinetic-energy cutoff",
+        br"kinetic-energy cutoff\s*=\s*(\S+)",
+        mode="first",
+        ),
+    ])
 #__|
 
 #| - Log File Methods
 
+def __log_file__(path_i, log):
+    """Return path of log file."""
+    #| - __log_file__
+    return(os.path.join(path_i, log))
+    #__|
+
 def number_of_atoms(path_i=".", log="log"):
     """Return number of atoms from QE log file.
 
@@ -22,32 +43,9 @@ def number_of_atoms(path_i=".", log="log"):
         log:
     """
     #| - number_of_atoms
-    file_name = path_i + "/" + log
-    with open(file_name, "r") as fle:
-        fle.seek(0)  # just in case
-
-        while True:
-            line = fle.readline()
-
-            if "Cartesian axes" in line:
-                fle.readline().strip()  # Blank line
-                fle.readline()  # Column headers
-
-                atom_list = []
-                while True:
-                    data_line_i = fle.readline().strip()
+    result = parse_qe_log(__log_file__(path_i, log))
 
-                    if data_line_i == "":
-                        break
-
-                    atom_list.append(data_line_i)
-
-            if not line:
-                break
-
-    num_atoms = len(atom_list)
-
-    return(num_atoms)
+    return(result.num_atoms)
     #__|
 
 def tot_abs_magnetization(path_i=".", log="log"):
@@ -58,39 +56,9 @@ def tot_abs_magnetization(path_i=".", log="log"):
         log
     """
     #| - tot_abs_magnetization
-    fle = open(log, "r")
-    fle.seek(0)  # just in case
-
-    tot_mag_list = []
-    abs_mag_list = []
-    while True:
-        line = fle.readline()
-
-        # Break out of loop
-        if not line:
-            break
-
-        #| - Searching for Atomic Magmoms
-        if "total magnetization" in line:
-            line_list = line.strip().split(" ")
-            line = [i for i in line_list if i != ""]
-            tot_mag = float(line[3])
-            tot_mag_list.append(tot_mag)
+    result = parse_qe_log(__log_file__(path_i, log))
 
-        if "absolute magnetization" in line:
-            line_list = line.strip().split(" ")
-            line = [i for i in line_list if i != ""]
-            abs_mag = float(line[3])
-            abs_mag_list.append(abs_mag)
-
-        #__|
-
-    df_tot = pd.DataFrame(tot_mag_list, columns=["tot_mag"])
-    df_abs = pd.DataFrame(abs_mag_list, columns=["abs_mag"])
-
-    df = pd.concat([df_tot, df_abs], axis=1)
-
-    return(df)
+    return(result.tot_abs_df())
     #__|
 
 def element_index_dict(path_i=".", log="log"):
@@ -103,126 +71,31 @@ def element_index_dict(path_i=".", log="log"):
         log
     """
     #| - element_index_dict
-    elem_ind_dict = {}
-    file_name = path_i + "/" + log
-    with open(file_name, "r") as fle:
-
-        fle.seek(0)  # just in case
-        while True:
-            line = fle.readline()
-
-            # Break out of loop
-            if not line:
-                break
-
-            #| - Atom Index <---> Atom Type
-            if "Cartesian axes" in line:
-                fle.readline()  # Blank line
-                fle.readline()  # Column header line
-
-                # elem_ind_dict = {}
-                while True:
-                    line_i = fle.readline()
-                    if "tau(" in line_i:
-
-                        line_list = line_i.strip().split(" ")
-                        line_list = [i_ct for i_ct in line_list if i_ct != ""]
-
-                        ind_i = int(line_list[0]) - 1  # "0" indexed
-
-                        elem_i = line_list[1]
-                        elem_i = ''.join([i for i in elem_i if not i.isdigit()])
-
-                        elem_ind_dict[ind_i] = elem_i
-
-                    else:
-                        break
-
-            #__|
+    result = parse_qe_log(__log_file__(path_i, log))
 
-    return(elem_ind_dict)
+    return(dict(result.elem_ind_dict))
     #__|
 
-def magmom_charge_data(path_i=".", log="log"):
+def magmom_charge_data(path_i=".", log="log", incremental=False):
     """Return charge and magmom data per atom for all SCF iterations.
 
     Args:
         path_i
         log
+        incremental
+            Only parse the part of the log written since the last call
+            (running jobs)
     """
     #| - magmom_charge_data
+    result = parse_qe_log(__log_file__(path_i, log), incremental=incremental)
 
-    #| - Reading Log File
-    file_name = path_i + "/" + log
-
-    fle = open(file_name, "r")
-    fle.seek(0)  # just in case
-
-    master_list = []
-    while True:
-        line = fle.readline()
-
-        # Break out of loop
-        if not line:
-            break
-
-        #| - Searching for Atomic Magmoms
-        if "Magnetic moment per site" in line:
-
-            list_i = []
-            while True:
-                # print("ksjfksjfks - 3")
-                line_i = fle.readline()
-                if "atom:" in line_i:
-
-                    line_list = line_i.strip().split(" ")
-                    line_list = [i_cnt for i_cnt in line_list if i_cnt != ""]
-
-                    atom_num = int(line_list[1]) - 1  # "0" indexed
-                    charge = float(line_list[3])
-                    magmom = float(line_list[5])
-
-                    entry_dict = {
-                        "atom_num": atom_num,
-                        "charge": charge,
-                        "magmom": magmom,
-                        }
-
-                    list_i.append(entry_dict)
-                else:
-                    break
-
-            master_list.append(list_i)
-        #__|
-
-    #__|
-
-    #| - Creating Pandas DataFrame
-    if master_list == []:
+    df = result.magmom_charge_df()
+    if df is None:
         print("Magmom/charge data not found, ",
             "calculation probably not spin-polarized"
             )
         return(None)
 
-    elem_ind_dict = element_index_dict(path_i=path_i, log=log)
-
-    df_list = []
-    for i_cnt, iter_i in enumerate(master_list):
-        df_i = pd.DataFrame(iter_i)
-
-        df_list.append(df_i)
-        df_i["iteration"] = i_cnt
-
-    # Combining data frames
-    df = pd.concat(df_list)
-
-    # Creating element type column (mapping index <--> element)
-    df["element"] = df["atom_num"].map(elem_ind_dict)
-
-    # Resetting index
-    df.reset_index()
-    #__|
-
     return(df)
     #__|
 
@@ -241,74 +114,38 @@ def estimate_magmom(
     Estimate magmom from log file (based on charge spheres centered on atoms)
     and assign to atoms object to assist with calculation restart upon
     unexpected interruption.
+
+    The magmoms of the last "Magnetic moment per site" block are rescaled to
+    the absolute magnetization printed after it.
     """
     #| - estimate_magmom
-    num_atoms = number_of_atoms(path_i=path_i, log=log)
-    # print(num_atoms)
-
-    file_name = path_i + "/" + log
-
-    with open(file_name, "r") as fle:
-        lines = fle.readlines()
-
-    i = len(lines) - 1
-    while True:
-
-        #| - If magmom/charge data is not found in log file
-        # The calculation is probably not spin-polarized
-        if i == 0:
-            print("estimate_magmom - Could not find magmom/charge data \n",
-                "Calculation is probably not spin polarized"
-                )
-            return(None)
-            break
-            # raise IOError("Could not identify espresso magmoms")
-
-        #__|
-
-        line = lines[i].split()
-        if len(line) > 3:
-            if line[0] == "absolute":
-                abs_magmom = float(line[3])
-        if len(line) > 6:
-            if line[4] == "magn:":
-                i -= num_atoms - 1
-                break
-        i -= 1
-
-    magmom_list = []
-    charge_list = []
+    result = parse_qe_log(__log_file__(path_i, log))
+
+    #| - If magmom/charge data is not found in log file
+    # The calculation is probably not spin-polarized
+    abs_magmom = result.last_block_abs_mag
+    if result.num_iterations == 0 or abs_magmom is None:
+        print("estimate_magmom - Could not find magmom/charge data \n",
+            "Calculation is probably not spin polarized"
+            )
+        return(None)
+    #__|
+
+    atom_num, charges, magmoms = result.last_block()
 
     if abs_magmom < 1e-3:
         print("estimate_magmom | Absolute magnetism is near 0, setting "
             "initial atomic magmoms to 0"
             )
 
-        # for atom in atoms:
-        #     atom.magmom = 0
-
-        for atom in range(num_atoms):
-            magmom_list.append(0.)
+        magmom_list = np.zeros(len(magmoms))
+        charge_list = np.array([])
 
     else:
-        total_esp_magmom = 0
-        # for j in range(len(atoms)):
-        for j in range(num_atoms):
-            total_esp_magmom += np.abs(float(lines[i + j].split()[5]))
-
-        magmom_list = []
-        charge_list = []
-        # for j in range(len(atoms)):
-        for j in range(num_atoms):
-            charge_i = float(lines[i + j].split()[3])
-            magmom_i = float(lines[i + j].split()[5])
-            new_magmom_i = magmom_i * abs_magmom / total_esp_magmom
-            # atoms[j].magmom = new_magmom_i
-            magmom_list.append(new_magmom_i)
-            charge_list.append(charge_i)
-
-    magmom_list = np.array(magmom_list)
-    charge_list = np.array(charge_list)
+        total_esp_magmom = np.sum(np.abs(magmoms))
+
+        magmom_list = magmoms * abs_magmom / total_esp_magmom
+        charge_list = charges
 
     if atoms is not None:
         atoms.info.update({"qe_log_magmoms": magmom_list})
@@ -323,55 +160,25 @@ def scf_convergence(path_i=".", log="log"):
     Author: ???
     I didn't write this.
 
-    TODO: Not working well with python3.6, probably best to rewrite this
+    Returns (scf accuracy of every SCF iteration in eV, iteration numbers,
+    kinetic-energy cutoff in eV). Read in one pass with regex_scan, no grep
+    or temp files.
 
     Args:
+        path_i
         log
     """
     #| - scf_convergence
     rydberg = 13.6057  # rydberg to eV conversion
 
-    filename = os.path.join(
-        os.environ["HOME"],
-        "scf_temp.txt",
-        )
-
-    os.system("grep scf %s > %s" % (log, filename))
-
-    file = open(filename)
-    file.seek(0)  # just in case
-
-    lines = file.read().split("\n")
-    lines = filter(None, lines)
-
-    scf = []
-    iter = []
-    n = 0
-    for line in lines:
-        items = filter(None, line.split(" "))
-        try:
-            scf.append(float(items[4]) * rydberg)
-            n += 1
-            iter.append(n)
-        except:
-            continue
-
-    os.system("grep cpu log > %s" % filename)
-    file = open(filename)
-    lines = file.read().split("\n")
-    lines = filter(None, lines)
-    #time = float(lines[-1][40:50])/3600/48
-    file.close()
-
-    os.system('grep "kinetic-energy cutoff" %s > %s' % (log, filename))
-    file = open(filename)
-
-    # FIXME This is breaking in python3.6
-    # items = filter(None, file.read().split(" "))
-    items = list(filter(None, file.read().split(" ")))
-
-    pw = float(items[3]) * 13.606
-    os.system("rm %s" % filename)
+    out = __scf_scanner__.scan(os.path.join(path_i, log))
+
+    scf = (out["scf"] * rydberg).tolist()
+    iter = list(range(1, len(scf) + 1))
+
+    if len(out["ecutwfc"]) == 0:
+        raise ValueError("kinetic-energy cutoff not found in " + log)
+    pw = float(out["ecutwfc"][0]) * 13.606
 
     return(scf, iter, pw)
     #__|
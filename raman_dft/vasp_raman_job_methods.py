@@ -10,6 +10,8 @@ import numpy as np
 
 from plotly.graph_objs import Scatter
 import re
+
+from vasp.outcar_index import OutcarIndex, section_offset
 #__|
 
 #| - Methods from vasp_raman script (Github)
@@ -26,8 +28,11 @@ def get_modes_from_OUTCAR(outcar_fh, nat=None, free_nat=None, path_i="."):
         else:
             file_name = None
 
-        atoms = io.read(path_i + "/" + file_name)
-        nat = atoms.get_number_of_atoms()
+        # NIONS from the OUTCAR index, instead of parsing the whole file
+        nat = OutcarIndex(path_i + "/" + file_name).num_ions
+        if nat is None:
+            atoms = io.read(path_i + "/" + file_name)
+            nat = atoms.get_number_of_atoms()
 
         # nat = vp.num_of_atoms_OUTCAR(outcar_fh)
 
@@ -38,7 +43,8 @@ def get_modes_from_OUTCAR(outcar_fh, nat=None, free_nat=None, path_i="."):
     eigvecs = [ 0.0 for i in range(nat*3) ]
     norms   = [ 0.0 for i in range(nat*3) ]
 
-    outcar_fh.seek(0) # just in case
+    # Straight to the eigenvectors with the OUTCAR index (top if not indexed)
+    outcar_fh.seek(section_offset(outcar_fh, "eigenvectors"))
     while True:
         line = outcar_fh.readline()
 
@@ -162,7 +168,8 @@ def get_epsilon_from_OUTCAR(outcar_fh):
     #| - get_epsilon_from_OUTCAR
     epsilon = []
 
-    outcar_fh.seek(0) # just in case
+    # Straight to the dielectric tensor with the OUTCAR index
+    outcar_fh.seek(section_offset(outcar_fh, "dielectric"))
     while True:
         line = outcar_fh.readline()
         if not line:
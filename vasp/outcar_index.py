@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Byte offset index of the sections of a VASP OUTCAR.
+
+Author: Raul A. Flores
+
+The OUTCAR is scanned once (windows of an mmap, memory use doesn't depend on
+the file size) and the byte offset of the first line of every section below
+is recorded:
+
+    ion_position     | "ion  position" (nearest neighbor table)
+    ionic_steps      | First "Iteration N(" line of every ionic step N
+    positions_forces | "POSITION  TOTAL-FORCE" blocks
+    energy           | "free  energy   TOTEN" lines (values in energies)
+    dielectric       | "MACROSCOPIC STATIC DIELECTRIC TENSOR"
+    eigenvectors     | "Eigenvectors after division by SQRT(mass)"
+
+The index is saved next to the OUTCAR (.OUTCAR.index.json) and rebuilt when
+the size or mtime of the OUTCAR change.
+
+    index = OutcarIndex("OUTCAR")
+    index.block_lines("positions_forces", which=-1, num_lines=10)
+"""
+
+#| - Import Modules
+import os
+import re
+import json
+import mmap
+#__|
+
+#| - Module Variables
+INDEX_VERSION = 1
+
+SECTIONS = [
+    "ion_position",
+    "ionic_steps",
+    "positions_forces",
+    "energy",
+    "dielectric",
+    "eigenvectors",
+    ]
+
+# Literal marker -> section
+MARKERS = [
+    (b"ion  position", "ion_position"),
+    (b"TOTAL-FORCE", "positions_forces"),
+    (b"free  energy   TOTEN", "energy"),
+    (b"MACROSCOPIC STATIC DIELECTRIC TENSOR", "dielectric"),
+    (b"Eigenvectors after division by SQRT(mass)", "eigenvectors"),
+    (b"Iteration", "ionic_steps"),
+    ]
+
+# The file is scanned in windows of this size (bytes), the pages of a window
+# are released once it's done
+WINDOW_SIZE = 64 * 1024 ** 2
+
+__iteration_re = re.compile(br"Iteration\s+(\d+)\(")
+__nions_re = re.compile(br"NIONS\s*=\s*(\d+)")
+#__|
+
+#| - Methods
+
+def index_file_name(file_name):
+    """Return path of the sidecar index of file_name.
+
+    Args:
+        file_name:
+    """
+    #| - index_file_name
+    dir_name, base_name = os.path.split(os.path.abspath(file_name))
+
+    return(os.path.join(dir_name, "." + base_name + ".index.json"))
+    #__|
+
+def __line_bounds__(mm, pos):
+    """Return (start, end) of the line of mm containing pos."""
+    #| - __line_bounds__
+    line_start = mm.rfind(b"\n", 0, pos) + 1
+
+    line_end = mm.find(b"\n", pos)
+    if line_end == -1:
+        line_end = len(mm)
+
+    return(line_start, line_end)
+    #__|
+
+def __scan_window__(mm, index, start, end, state):
+    """Add the markers starting in mm[start:end] to index.
+
+    Args:
+        mm:
+        index:
+        start:
+        end:
+        state:
+            Scan state shared between windows (current ionic step)
+    """
+    #| - __scan_window__
+    for marker, section in MARKERS:
+        # Markers starting before end may extend past it
+        search_end = min(end + len(marker) - 1, len(mm))
+
+        pos = mm.find(marker, start, search_end)
+        while pos != -1:
+            line_start, line_end = __line_bounds__(mm, pos)
+
+            if section == "ionic_steps":
+                match = __iteration_re.match(mm, pos)
+                if match is not None:
+                    step = int(match.group(1))
+                    if step != state["ionic_step"]:
+                        state["ionic_step"] = step
+                        index[section].append(line_start)
+
+            elif section == "positions_forces":
+                if mm[line_start:pos].strip() == b"POSITION":
+                    index[section].append(line_start)
+
+            elif section == "energy":
+                # Truncated last line (OUTCAR still being written), skipped
+                line = mm[line_start:line_end].split()
+                try:
+                    energy = float(line[4])
+                except (ValueError, IndexError):
+                    energy = None
+
+                if energy is not None:
+                    index[section].append(line_start)
+                    index["energies"].append(energy)
+
+            else:
+                index[section].append(line_start)
+
+            pos = mm.find(marker, pos + len(marker), search_end)
+    #__|
+
+def scan_outcar(file_name):
+    """Build index dict of OUTCAR in one sequential pass.
+
+    Args:
+        file_name:
+    """
+    #| - scan_outcar
+    index = {
+        "version": INDEX_VERSION,
+        "num_ions": None,
+        "energies": [],
+        }
+    for section in SECTIONS:
+        index[section] = []
+
+    with open(file_name, "rb") as fle:
+        stat = os.fstat(fle.fileno())
+        index["size"] = stat.st_size
+        index["mtime"] = stat.st_mtime
+
+        if stat.st_size == 0:
+            return(index)
+
+        mm = mmap.mmap(fle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            pos = mm.find(b"NIONS")
+            if pos != -1:
+                match = __nions_re.match(mm, pos)
+                if match is not None:
+                    index["num_ions"] = int(match.group(1))
+
+            state = {"ionic_step": None}
+            for start in range(0, len(mm), WINDOW_SIZE):
+                end = min(start + WINDOW_SIZE, len(mm))
+                __scan_window__(mm, index, start, end, state)
+
+                # Keeps the resident memory flat (python >= 3.8)
+                if hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+                    page_start = start - start % mmap.PAGESIZE
+                    mm.madvise(mmap.MADV_DONTNEED, page_start, end - page_start)
+        finally:
+            mm.close()
+
+    return(index)
+    #__|
+
+def outcar_fh_index(outcar_fh):
+    """Return OutcarIndex of an open OUTCAR, None if it can't be indexed.
+
+    Args:
+        outcar_fh:
+            Open OUTCAR file object (the index is found through its name)
+    """
+    #| - outcar_fh_index
+    file_name = getattr(outcar_fh, "name", None)
+    if not isinstance(file_name, str) or not os.path.isfile(file_name):
+        return(None)
+
+    try:
+        index = OutcarIndex(file_name)
+    except (IOError, OSError, ValueError):
+        return(None)
+
+    return(index)
+    #__|
+
+def section_offsets(outcar_fh, section):
+    """Return offsets of section in an open OUTCAR, None if not indexable.
+
+    Args:
+        outcar_fh:
+        section:
+    """
+    #| - section_offsets
+    index = outcar_fh_index(outcar_fh)
+    if index is None:
+        return(None)
+
+    return(index.offsets(section))
+    #__|
+
+def section_offset(outcar_fh, section, which=0):
+    """Return offset of section in an open OUTCAR, for outcar_fh.seek.
+
+    Returns 0 (scan from the top) if the file can't be indexed and the end of
+    the file if it doesn't have the section.
+
+    Args:
+        outcar_fh:
+        section:
+        which:
+            Index of the occurrence
+    """
+    #| - section_offset
+    index = outcar_fh_index(outcar_fh)
+    if index is None:
+        return(0)
+
+    offsets = index.offsets(section)
+    if len(offsets) == 0 or which >= len(offsets) or which < -len(offsets):
+        return(index.size)
+
+    return(offsets[which])
+    #__|
+
+#__|
+
+
+class OutcarIndex():
+    """Section offsets of an OUTCAR, kept in a sidecar JSON file."""
+
+    #| - OutcarIndex **********************************************************
+    def __init__(self,
+        file_name="OUTCAR",
+        sidecar=True,
+        ):
+        """Initialize OutcarIndex instance.
+
+        Args:
+            file_name:
+            sidecar:
+                Read/write the index from/to the sidecar file. If the folder
+                isn't writable the index is only kept in memory.
+        """
+        #| - __init__
+        self.file_name = file_name
+        self.sidecar = sidecar
+        self.index_file = index_file_name(file_name)
+
+        self.index = self.__load_index__()
+        if self.index is None:
+            self.index = scan_outcar(file_name)
+            self.__save_index__()
+        #__|
+
+    def __load_index__(self):
+        """Return sidecar index if it is still valid, None otherwise."""
+        #| - __load_index__
+        if not self.sidecar or not os.path.isfile(self.index_file):
+            return(None)
+
+        try:
+            with open(self.index_file, "r") as fle:
+                index = json.load(fle)
+        except (IOError, OSError, ValueError):
+            return(None)
+
+        stat = os.stat(self.file_name)
+
+        valid = (
+            index.get("version", None) == INDEX_VERSION and
+            index.get("size", None) == stat.st_size and
+            index.get("mtime", None) == stat.st_mtime
+            )
+
+        if not valid:
+            return(None)
+
+        return(index)
+        #__|
+
+    def __save_index__(self):
+        """Write index to the sidecar file."""
+        #| - __save_index__
+        if not self.sidecar:
+            return(None)
+
+        tmp_file = self.index_file + "." + str(os.getpid()) + ".tmp"
+        try:
+            with open(tmp_file, "w") as fle:
+                json.dump(self.index, fle)
+            os.rename(tmp_file, self.index_file)
+        except (IOError, OSError):
+            if os.path.isfile(tmp_file):
+                os.remove(tmp_file)
+        #__|
+
+    @property
+    def size(self):
+        """Size of the indexed OUTCAR."""
+        #| - size
+        return(self.index["size"])
+        #__|
+
+    @property
+    def num_ions(self):
+        """NIONS of the OUTCAR header (None if missing)."""
+        #| - num_ions
+        return(self.index["num_ions"])
+        #__|
+
+    @property
+    def num_ionic_steps(self):
+        """Number of ionic steps."""
+        #| - num_ionic_steps
+        return(len(self.index["ionic_steps"]))
+        #__|
+
+    @property
+    def energies(self):
+        """free energy TOTEN of every ionic step (eV)."""
+        #| - energies
+        return(list(self.index["energies"]))
+        #__|
+
+    def offsets(self, section):
+        """Return list of byte offsets of section.
+
+        Args:
+            section:
+        """
+        #| - offsets
+        assert section in SECTIONS, "Unknown section: " + str(section)
+
+        return(list(self.index[section]))
+        #__|
+
+    def block_lines(self, section, which=0, num_lines=None, until_blank=False):
+        """Return lines of section, starting with its first line.
+
+        Args:
+            section:
+            which:
+                Index of the occurrence (-1 for the last one)
+            num_lines:
+                Number of lines to read, None to read up to the next blank
+                line (until_blank) or the end of the file
+            until_blank:
+                Stop at the first blank line after the section's first line
+        """
+        #| - block_lines
+        offsets = self.index[section]
+        if len(offsets) == 0:
+            return([])
+
+        lines = []
+        with open(self.file_name, "r") as fle:
+            fle.seek(offsets[which])
+
+            for line in fle:
+                if until_blank and len(lines) > 0 and line.strip() == "":
+                    break
+
+                lines.append(line)
+                if num_lines is not None and len(lines) >= num_lines:
+                    break
+
+        return(lines)
+        #__|
+
+    #__| **********************************************************************
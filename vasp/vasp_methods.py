@@ -1,5 +1,6 @@
 #| - IMPORT MODULES
 from raman_dft.vasp_raman_job_methods import get_modes_from_OUTCAR
+from vasp.outcar_index import section_offsets
 # from raman_dft.vasp_raman_job_methods import parse_poscar
 
 from ase_modules.ase_methods import create_gif_from_atoms_movies
@@ -13,10 +14,30 @@ import itertools
 
 def num_of_atoms_OUTCAR_tmp(outcar_fh):
     """Parses OUTCAR for number of atoms in atoms object
+
+    The "ion  position" blocks are found with the OUTCAR index
+    (vasp/outcar_index.py), files without a name are scanned from the top.
     """
     #| - num_of_atoms_OUTCAR
-    outcar_fh.seek(0)
     num_atoms = 0
+
+    offsets = section_offsets(outcar_fh, "ion_position")
+    if offsets is not None:
+        for offset in offsets:
+            outcar_fh.seek(offset)
+            outcar_fh.readline()  # "ion  position" line
+
+            while True:
+                next_line = outcar_fh.readline()
+
+                if next_line in ["\n", ""]:
+                    break
+
+                num_atoms += 1
+
+        return(num_atoms)
+
+    outcar_fh.seek(0)
     while True:
         line = outcar_fh.readline()
         if not line: